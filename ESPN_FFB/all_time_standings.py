@@ -1,33 +1,90 @@
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
+from ESPN_FFB import instrumentation
 from ESPN_FFB.axes_labels import AxesLabels
-from ESPN_FFB.url_info import URLInfo
+from ESPN_FFB.constants import FIGURE_SIZE
 from ESPN_FFB.league_info import LeagueInfo
-from ESPN_FFB.constants import ESPN_ID_TO_TEAM
-from ESPN_FFB.figure_options import FIGURE_OPTIONS
-
-def generate_all_time_graph(league_info: LeagueInfo, figure_option: int) -> bool:
-    url_info = URLInfo("mTeam", league_info)
-    if league_info.is_cache_empty():
-        league_info.cached_responses, success = url_info.get_formatted_espn_data()
-        if success is False:
-            return False
+from ESPN_FFB.figure_options import (FIGURE_OPTIONS, get_figure_title,
+                                     is_all_time_record_figure)
+
+def draw_all_time_graph(figure: Figure, league_info: LeagueInfo, figure_option: int,
+                        chart=None, first_season: int = None, last_season: int = None):
+    """ Draws a chart from already loaded history onto figure.
+        chart is the AllTimeChart currently on that figure, if any; it is updated
+        in place when it can be. Returns the chart now on the figure.
+        first_season and last_season limit the chart to an inclusive range of seasons.
+    """
     axes_labels = AxesLabels(figure_option)
+    figure_heights = league_info.get_figure_heights(figure_option, first_season, last_season)
+    team_names = list(league_info.get_team_names().values())
+    chart = get_all_time_chart(
+        figure, figure_option, figure_heights, axes_labels, team_names, chart)
+    chart.axes.set_title(get_figure_title(figure_option, first_season, last_season))
+    return chart
+
+class AllTimeChart:
+    """ A record or points chart whose artists are kept, so switching between the raw and
+        adjusted variants, or refreshing data, only moves bars and relabels them.
+    """
+
+    def __init__(self, figure: Figure, figure_option, figure_heights: list,
+                 axes_labels: AxesLabels, team_names: list):
+        self.family = _get_chart_family(figure_option)
+        self.team_names = list(team_names)
+        self.x_labels = list(axes_labels.x_labels)
+        x_ticks = np.arange(len(axes_labels.x_labels))
+        self.figure = figure
+        self.axes = figure.add_subplot()
+
+        assign_figure_attributes(
+            axes_labels, x_ticks, self.axes,
+            FIGURE_OPTIONS.get(figure_option))
+
+        self.bars, self.labels = prepare_figure_bars(
+            figure_heights, team_names, x_ticks, self.figure, self.axes)
 
-    figure_heights = league_info.get_figure_heights(figure_option)
-    prepare_figure(figure_option, figure_heights, axes_labels)
-    plt.show()
-    return True
+    def update(self, figure_option, figure_heights: list, axes_labels: AxesLabels,
+               team_names: list) -> bool:
+        """ Returns False if the chart's layout doesn't fit the new data and must be rebuilt. """
+        if _get_chart_family(figure_option) != self.family or \
+                list(team_names) != self.team_names or \
+                list(axes_labels.x_labels) != self.x_labels:
+            return False
+
+        for team_bars, team_labels, team_heights in zip(self.bars, self.labels, figure_heights):
+            for rect, label, height in zip(team_bars, team_labels, team_heights):
+                rect.set_height(height)
+                update_bar_label(label, rect)
+
+        self.axes.set_title(FIGURE_OPTIONS.get(figure_option))
+        self.axes.set_ylabel(axes_labels.y_label)
+        self.axes.relim()
+        self.axes.autoscale_view()
+        return True
 
-def prepare_figure(figure_option, figure_heights: list, axes_labels: AxesLabels):
-    x_ticks = np.arange(len(axes_labels.x_labels))
-    figure, axes = plt.subplots(figsize=(16, 6))
+def get_all_time_chart(figure: Figure, figure_option, figure_heights: list,
+                       axes_labels: AxesLabels, team_names: list,
+                       chart: AllTimeChart = None) -> AllTimeChart:
+    """ Returns chart updated in place if it is on figure and fits the new data.
+        Otherwise figure is cleared, releasing the old artists, and a new chart is drawn.
+    """
+    with instrumentation.span('render', 'render', figure_option=figure_option) as attributes:
+        if chart is not None and chart.figure is figure and \
+                chart.update(figure_option, figure_heights, axes_labels, team_names):
+            attributes['reused'] = True
+            return chart
 
-    assign_figure_attributes(
-        axes_labels, x_ticks, axes,
-        FIGURE_OPTIONS.get(figure_option))
+        figure.clear()
+        attributes['reused'] = False
+        return AllTimeChart(figure, figure_option, figure_heights, axes_labels, team_names)
 
-    prepare_figure_bars(figure_heights, x_ticks, figure, axes)
+def prepare_figure(figure_option, figure_heights: list, axes_labels: AxesLabels,
+                   team_names: list) -> Figure:
+    """ Builds a standalone figure that is not reused, e.g. for saving to a file. """
+    with instrumentation.span('render', 'render', figure_option=figure_option):
+        return AllTimeChart(
+            Figure(figsize=FIGURE_SIZE), figure_option, figure_heights, axes_labels,
+            team_names).figure
 
 def assign_figure_attributes(axes_labels: AxesLabels, x_ticks, axes, title: str):
     axes.set_ylabel(axes_labels.y_label)
@@ -35,41 +92,62 @@ def assign_figure_attributes(axes_labels: AxesLabels, x_ticks, axes, title: str)
     axes.set_xticks(x_ticks)
     axes.set_xticklabels(axes_labels.x_labels)
 
-def prepare_figure_bars(figure_heights: list, x_ticks, fig, axes, width: float = 0.075):
-    rects = generate_bars_per_team(figure_heights, x_ticks, axes, width)
-    add_bar_labels(axes, rects)
+def prepare_figure_bars(figure_heights: list, team_names: list, x_ticks, fig, axes,
+                        width: float = None):
+    rects = generate_bars_per_team(figure_heights, team_names, x_ticks, axes, width)
+    labels = add_bar_labels(axes, rects)
     axes.legend(fontsize='medium', shadow=True, title='Teams', title_fontsize='large')
     fig.tight_layout()
+    return rects, labels
 
-def generate_bars_per_team(figure_heights: list, x_ticks, axes, width: float = 0.075):
+def generate_bars_per_team(figure_heights: list, team_names: list, x_ticks, axes,
+                           width: float = None):
+    """ Draws one bar per team around each x tick, centered on the tick for any team count. """
+    if width is None:
+        width = get_bar_width(len(team_names))
     bars = []
-    i = width*-6
-    for team in ESPN_ID_TO_TEAM:
+    i = width * -(len(team_names) - 1) / 2
+    for team_heights, team_name in zip(figure_heights, team_names):
         bars.append(
             axes.bar(
                 x_ticks + i,
-                figure_heights[team - 1],
+                team_heights,
                 width,
-                label=ESPN_ID_TO_TEAM.get(team),
+                label=team_name,
                 linewidth=1,
                 edgecolor='black')
             )
         i += width
     return bars
 
-def add_bar_labels(axes, group_rects: list, vertical_offset: int = 3):
+def get_bar_width(team_count: int, group_width: float = 0.9) -> float:
+    """ Bars keep their 12 team width until a larger league has to squeeze into the group. """
+    return min(0.075, group_width / max(team_count, 1))
+
+def add_bar_labels(axes, group_rects: list, vertical_offset: int = 3) -> list:
+    """ Labels every bar. Labels of empty bars are hidden rather than skipped,
+        so they can be shown again when the heights change.
+    """
+    labels = []
     for rects in group_rects:
+        team_labels = []
         for rect in rects:
-            height = rect.get_height()
-            if height == 0:
-                continue
-            axes.annotate('{}'.format(height),
-                          xy=(rect.get_x() + rect.get_width() / 2, height),
-                          xytext=(0, vertical_offset),
-                          textcoords="offset points",
-                          ha='center', va='bottom')
-
-if __name__ == "__main__": #For Testing Purposes
-    TEST_JSON = list()
-    generate_all_time_graph(TEST_JSON, 3)
-    generate_all_time_graph(TEST_JSON, 1)
+            label = axes.annotate('',
+                                  xy=(0, 0),
+                                  xytext=(0, vertical_offset),
+                                  textcoords="offset points",
+                                  ha='center', va='bottom')
+            update_bar_label(label, rect)
+            team_labels.append(label)
+        labels.append(team_labels)
+    return labels
+
+def update_bar_label(label, rect):
+    height = rect.get_height()
+    label.xy = (rect.get_x() + rect.get_width() / 2, height)
+    label.set_text('{}'.format(height))
+    label.set_visible(height != 0)
+
+def _get_chart_family(figure_option) -> str:
+    """ Raw and adjusted variants of a chart share their bars. """
+    return 'record' if is_all_time_record_figure(figure_option) else 'points'
@@ -0,0 +1,134 @@
+from matplotlib.figure import Figure
+import numpy as np
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import AXES_LABELS, FIGURE_SIZE
+from ESPN_FFB.figure_options import FIGURE_OPTIONS, get_figure_title
+from ESPN_FFB.league_analytics import PlayoffSimulation, ScoreMatrix, get_playoff_odds
+from ESPN_FFB.league_info import LeagueInfo
+
+def draw_all_play_graph(figure: Figure, league_info: LeagueInfo,
+                        first_season: int = None, last_season: int = None) -> Figure:
+    """ Draws the chart from already loaded history onto figure, replacing what was there.
+        first_season and last_season limit the chart to an inclusive range of seasons.
+    """
+    figure.clear()
+    prepare_all_play_figure(
+        _get_score_matrix(league_info, first_season, last_season),
+        league_info.get_team_names(), figure)
+    figure.axes[0].set_title(get_figure_title(
+        FIGURE_OPTIONS.get("All-Play Record"), first_season, last_season))
+    return figure
+
+def draw_luck_graph(figure: Figure, league_info: LeagueInfo,
+                    first_season: int = None, last_season: int = None) -> Figure:
+    """ Draws the chart from already loaded history onto figure, replacing what was there.
+        first_season and last_season limit the chart to an inclusive range of seasons.
+    """
+    figure.clear()
+    prepare_luck_figure(
+        _get_score_matrix(league_info, first_season, last_season),
+        league_info.get_team_names(), figure)
+    figure.axes[0].set_title(get_figure_title(
+        FIGURE_OPTIONS.get("Luck"), first_season, last_season))
+    return figure
+
+def draw_playoff_odds_graph(figure: Figure, league_info: LeagueInfo,
+                            first_season: int = None, last_season: int = None) -> Figure:
+    """ Simulates the last picked season, or the newest season if every season is picked,
+        and draws the odds onto figure. first_season is ignored.
+    """
+    figure.clear()
+    prepare_playoff_odds_figure(*simulate_playoff_odds(league_info, last_season), figure)
+    return figure
+
+def simulate_playoff_odds(league_info: LeagueInfo, last_season: int = None) -> tuple:
+    """ The slow half of draw_playoff_odds_graph, for a worker thread. The schedule is
+        read under league_info.lock, which is released before simulating.
+        Returns (simulation, playoff_odds, team_names), see prepare_playoff_odds_figure.
+    """
+    with league_info.lock:
+        simulation = PlayoffSimulation.from_matchup_table(league_info.matchup_table, last_season)
+        team_names = league_info.get_team_names()
+    return simulation, get_playoff_odds(simulation), team_names
+
+def prepare_all_play_figure(score_matrix: ScoreMatrix, team_names: dict,
+                            figure: Figure = None) -> Figure:
+    """ Compares each team's all-play win % with its actual regular season win %.
+        A new standalone figure is created unless one is given.
+    """
+    figure_option = FIGURE_OPTIONS.get("All-Play Record")
+    with instrumentation.span('render', 'render', figure_option=figure_option):
+        if figure is None:
+            figure = Figure(figsize=FIGURE_SIZE)
+        records = score_matrix.get_all_play_records()
+        all_play_percentages = _get_win_percentages(
+            records[:, 0] + records[:, 2] / 2, records.sum(axis=1))
+        actual_percentages = _get_win_percentages(
+            score_matrix.get_actual_wins(), (~np.isnan(score_matrix.scores)).sum(axis=0))
+
+        axes, positions = _add_team_axes(figure, score_matrix.team_ids, team_names)
+        axes.bar(positions - 0.2, all_play_percentages, 0.4, label='All-Play')
+        axes.bar(positions + 0.2, actual_percentages, 0.4, label='Actual')
+        axes.set_title(FIGURE_OPTIONS.get(figure_option))
+        axes.set_ylabel(AXES_LABELS.get(2))
+        axes.set_ylim(0, 100)
+        axes.legend(fontsize='medium', shadow=True)
+        figure.tight_layout()
+        return figure
+
+def prepare_luck_figure(score_matrix: ScoreMatrix, team_names: dict,
+                        figure: Figure = None) -> Figure:
+    """ Bars of actual minus expected wins, green for lucky teams and red for unlucky ones.
+        A new standalone figure is created unless one is given.
+    """
+    figure_option = FIGURE_OPTIONS.get("Luck")
+    with instrumentation.span('render', 'render', figure_option=figure_option):
+        if figure is None:
+            figure = Figure(figsize=FIGURE_SIZE)
+        luck = score_matrix.get_luck()
+
+        axes, positions = _add_team_axes(figure, score_matrix.team_ids, team_names)
+        bars = axes.bar(
+            positions, luck, color=np.where(luck >= 0, 'tab:green', 'tab:red'))
+        axes.bar_label(bars, fmt='%+.1f')
+        axes.axhline(0, ls='--', color='gray')
+        axes.set_title(FIGURE_OPTIONS.get(figure_option))
+        axes.set_ylabel('Wins Above Expected')
+        figure.tight_layout()
+        return figure
+
+def prepare_playoff_odds_figure(simulation: PlayoffSimulation, playoff_odds: np.ndarray,
+                                team_names: dict, figure: Figure = None) -> Figure:
+    """ Bars of each team's chance of making the playoffs, best odds first.
+        A new standalone figure is created unless one is given.
+    """
+    figure_option = FIGURE_OPTIONS.get("Playoff Odds")
+    with instrumentation.span('render', 'render', figure_option=figure_option):
+        if figure is None:
+            figure = Figure(figsize=FIGURE_SIZE)
+        order = np.argsort(-playoff_odds, kind='stable')
+        team_ids = [simulation.team_ids[index] for index in order]
+
+        axes, positions = _add_team_axes(figure, team_ids, team_names)
+        bars = axes.bar(positions, playoff_odds[order])
+        axes.bar_label(bars, fmt='%.1f%%')
+        axes.set_title(get_figure_title(figure_option, simulation.season, simulation.season))
+        axes.set_ylabel('% of Simulations')
+        axes.set_ylim(0, 105)
+        figure.tight_layout()
+        return figure
+
+def _get_score_matrix(league_info: LeagueInfo, first_season: int,
+                      last_season: int) -> ScoreMatrix:
+    return ScoreMatrix.from_games(
+        league_info.matchup_table.get_season_range(first_season, last_season).games)
+
+def _add_team_axes(figure: Figure, team_ids: list, team_names: dict):
+    positions = np.arange(len(team_ids))
+    axes = figure.add_subplot()
+    axes.set_xticks(positions)
+    axes.set_xticklabels([team_names.get(team, f'Team {team}') for team in team_ids])
+    return axes, positions
+
+def _get_win_percentages(wins: np.ndarray, games: np.ndarray) -> np.ndarray:
+    return np.divide(wins * 100, games, out=np.zeros(len(wins)), where=games > 0)
@@ -0,0 +1,107 @@
+import queue
+import sys
+import threading
+import traceback
+
+class BackgroundTask:
+
+    def __init__(self, work, on_done=None, on_progress=None):
+        self.work = work
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+class BackgroundWorker:
+    """ Runs fetch and compute work on one daemon thread, in submission order, so the
+        Tk main loop never blocks on ESPN. Tk isn't thread safe, so progress and results
+        are queued and handed to their callbacks from the main thread by polling with after().
+    """
+
+    def __init__(self, root, poll_interval: int = 50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.current_task = None
+        self._tasks = queue.Queue()
+        self._events = queue.Queue()
+        self._pending_tasks = list()
+        self._pending_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, name='ffb-worker', daemon=True)
+        self._thread.start()
+        self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, work, on_done=None, on_progress=None) -> BackgroundTask:
+        """ Queues work(progress_callback, cancel_event) to run on the worker thread.
+            on_progress(completed, total) and on_done(result, error) run on the main thread.
+        """
+        task = BackgroundTask(work, on_done, on_progress)
+        with self._pending_lock:
+            self._pending_tasks.append(task)
+        self._tasks.put(task)
+        return task
+
+    def cancel_all(self):
+        with self._pending_lock:
+            for task in self._pending_tasks:
+                task.cancel()
+
+    def is_busy(self) -> bool:
+        with self._pending_lock:
+            return len(self._pending_tasks) > 0
+
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            self.current_task = task
+            result, error = None, None
+            if task.cancelled is False:
+                try:
+                    result = task.work(
+                        lambda completed, total: self._events.put(
+                            ('progress', task, (completed, total))),
+                        task.cancel_event)
+                except Exception as exception: #Reported to the main thread instead of lost
+                    error = exception
+            self.current_task = None
+            self._events.put(('done', task, (result, error)))
+
+    def _poll(self):
+        """ A callback that raises is reported and the rest are still dispatched, so one
+            failed chart never stops every later task from reporting back.
+        """
+        try:
+            while True:
+                try:
+                    event, task, arguments = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._dispatch(event, task, arguments)
+                except Exception:
+                    self._report_callback_exception()
+        finally:
+            self.root.after(self.poll_interval, self._poll)
+
+    def _report_callback_exception(self):
+        """ Tk's own handler if the root has one, which prints the traceback by default. """
+        report_callback_exception = getattr(self.root, 'report_callback_exception', None)
+        if report_callback_exception is not None:
+            report_callback_exception(*sys.exc_info())
+        else:
+            traceback.print_exc()
+
+    def _dispatch(self, event: str, task: BackgroundTask, arguments: tuple):
+        if event == 'done':
+            with self._pending_lock:
+                self._pending_tasks.remove(task)
+            if task.cancelled is False and task.on_done is not None:
+                task.on_done(*arguments)
+        elif task.cancelled is False and task.on_progress is not None:
+            task.on_progress(*arguments)
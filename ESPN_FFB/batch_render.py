@@ -0,0 +1,164 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_pdf import PdfPages
+from ESPN_FFB import instrumentation
+from ESPN_FFB.all_time_standings import prepare_figure
+from ESPN_FFB.analytics_charts import (prepare_all_play_figure, prepare_luck_figure,
+                                       prepare_playoff_odds_figure)
+from ESPN_FFB.axes_labels import AxesLabels
+from ESPN_FFB.figure_options import FIGURE_OPTIONS, get_all_time_figure_options
+from ESPN_FFB.head_to_head_heatmap import prepare_head_to_head_figure
+from ESPN_FFB.league_analytics import PlayoffSimulation, ScoreMatrix, get_playoff_odds
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.league_registry import LeagueRegistry, parse_league_argument
+from ESPN_FFB.win_loss_margin import prepare_margin_figure
+
+DEFAULT_FORMATS = ['png']
+SUPPORTED_FORMATS = ['png', 'svg']
+
+class RenderJob:
+    """ Everything a render worker needs. Holds plain lists so it pickles cheaply. """
+
+    def __init__(self, league_id: int, figure_heights: dict, team_names: dict,
+                 output_directory: str, formats: list, write_pdf: bool,
+                 margin_distributions: dict = None, head_to_head=None,
+                 score_matrix: ScoreMatrix = None,
+                 playoff_simulation: PlayoffSimulation = None, playoff_odds=None):
+        self.league_id = league_id
+        self.figure_heights = figure_heights
+        self.team_names = team_names
+        self.margin_distributions = margin_distributions
+        self.head_to_head = head_to_head
+        self.score_matrix = score_matrix
+        self.playoff_simulation = playoff_simulation
+        self.playoff_odds = playoff_odds
+        self.output_directory = output_directory
+        self.formats = formats
+        self.write_pdf = write_pdf
+
+def render_leagues(leagues: list, output_directory: str, formats: list = None,
+                   write_pdf: bool = False, max_workers: int = None) -> dict:
+    """ Renders every all time chart for each (league_id, first_year) pair.
+        Every league is fetched in one concurrent sweep and aggregated in this process;
+        only the finished figure heights are sent to the process pool that draws them.
+
+        Returns {league_id: [written file paths]}. Leagues whose history could not be
+        fetched map to an empty list.
+    """
+    formats = formats if formats is not None else DEFAULT_FORMATS
+    league_registry = LeagueRegistry()
+    for league_id, first_year in leagues:
+        league_registry.register(league_id, first_year)
+    refreshed = league_registry.refresh()
+
+    written_files = {league_id: list() for league_id in refreshed}
+    render_jobs = [
+        build_render_job(league_registry.get(league_id), output_directory, formats, write_pdf)
+        for league_id, success in refreshed.items() if success]
+    with ProcessPoolExecutor(max_workers, initializer=_use_headless_backend) as render_pool:
+        for league_id, files in render_pool.map(render_league, render_jobs):
+            written_files[league_id] = files
+    return written_files
+
+def build_render_job(league_info: LeagueInfo, output_directory: str, formats: list,
+                     write_pdf: bool) -> RenderJob:
+    league_id = league_info.league_id
+    figure_heights = {
+        figure_option: league_info.get_figure_heights(figure_option)
+        for figure_option in get_all_time_figure_options()}
+    margin_distributions, head_to_head = None, None
+    score_matrix, playoff_simulation, playoff_odds = None, None, None
+    matchup_table = league_info.matchup_table
+    if matchup_table is not None:
+        margin_distributions = matchup_table.get_margin_distributions()
+        head_to_head = matchup_table.get_head_to_head()
+        score_matrix = ScoreMatrix.from_games(matchup_table.games)
+        #Simulated here rather than in the render pool, which can't start a pool of its own
+        playoff_simulation = PlayoffSimulation.from_matchup_table(matchup_table)
+        playoff_odds = get_playoff_odds(playoff_simulation)
+    return RenderJob(
+        league_id, figure_heights, league_info.get_team_names(),
+        os.path.join(output_directory, str(league_id)), formats, write_pdf,
+        margin_distributions, head_to_head, score_matrix, playoff_simulation, playoff_odds)
+
+def render_league(job: RenderJob):
+    os.makedirs(job.output_directory, exist_ok=True)
+    written_files = list()
+    almanac = None
+    if job.write_pdf:
+        almanac_path = os.path.join(job.output_directory, 'almanac.pdf')
+        almanac = PdfPages(almanac_path)
+        written_files.append(almanac_path)
+
+    try:
+        for figure_option, figure in _prepare_figures(job):
+            file_name = _get_file_name(FIGURE_OPTIONS.get(figure_option))
+            for file_format in job.formats:
+                path = os.path.join(job.output_directory, f'{file_name}.{file_format}')
+                with instrumentation.span('save', 'render', path=path):
+                    figure.savefig(path, format=file_format)
+                written_files.append(path)
+            if almanac is not None:
+                almanac.savefig(figure)
+    finally:
+        if almanac is not None:
+            almanac.close()
+    return job.league_id, written_files
+
+def _prepare_figures(job: RenderJob):
+    """ Yields (figure option, figure) one at a time, so only one figure is open at once. """
+    team_names = list(job.team_names.values())
+    for figure_option, figure_heights in job.figure_heights.items():
+        yield figure_option, prepare_figure(
+            figure_option, figure_heights, AxesLabels(figure_option), team_names)
+
+    if job.margin_distributions is not None:
+        yield FIGURE_OPTIONS.get("Win/Loss Margins"), prepare_margin_figure(
+            job.margin_distributions, job.team_names)
+    if job.head_to_head is not None:
+        yield FIGURE_OPTIONS.get("Head-to-Head"), prepare_head_to_head_figure(
+            job.head_to_head, job.team_names)
+    if job.score_matrix is not None:
+        yield FIGURE_OPTIONS.get("All-Play Record"), prepare_all_play_figure(
+            job.score_matrix, job.team_names)
+        yield FIGURE_OPTIONS.get("Luck"), prepare_luck_figure(job.score_matrix, job.team_names)
+    if job.playoff_simulation is not None:
+        yield FIGURE_OPTIONS.get("Playoff Odds"), prepare_playoff_odds_figure(
+            job.playoff_simulation, job.playoff_odds, job.team_names)
+
+def _use_headless_backend():
+    matplotlib.use('Agg')
+
+def _get_file_name(title: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Render every all time chart for one or more ESPN leagues without a GUI.')
+    parser.add_argument(
+        'leagues', nargs='+', type=parse_league_argument, metavar='LEAGUE_ID:FIRST_YEAR')
+    parser.add_argument('-o', '--output-directory', default='charts')
+    parser.add_argument(
+        '-f', '--format', dest='formats', action='append', choices=SUPPORTED_FORMATS,
+        help='Image format to write. Can be repeated. Defaults to png.')
+    parser.add_argument(
+        '--pdf', action='store_true', help='Also write a multi-page PDF almanac per league.')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parsed = parser.parse_args(arguments)
+
+    written_files = render_leagues(
+        parsed.leagues, parsed.output_directory, parsed.formats, parsed.pdf, parsed.workers)
+
+    exit_code = 0
+    for league_id, files in written_files.items():
+        if len(files) == 0:
+            print(f'League {league_id}: unable to retrieve full league history', file=sys.stderr)
+            exit_code = 1
+        else:
+            print(f'League {league_id}: wrote {len(files)} files')
+    return exit_code
@@ -0,0 +1,77 @@
+from tkinter import BOTH, BOTTOM, X
+from tkinter.ttk import Frame
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+from ESPN_FFB.all_time_standings import draw_all_time_graph
+from ESPN_FFB.analytics_charts import (draw_all_play_graph, draw_luck_graph,
+                                       prepare_playoff_odds_figure)
+from ESPN_FFB.head_to_head_heatmap import draw_head_to_head_graph
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.win_loss_margin import draw_win_loss_margin_graph
+
+class ChartPanel:
+    """ One figure and canvas embedded in the window that every chart is drawn into.
+        Switching charts clears the figure instead of opening a new window, so a long
+        session holds one figure's worth of artists.
+    """
+
+    def __init__(self, master):
+        self.frame = Frame(master)
+        self.figure = Figure(layout='tight') #Re-laid out whenever the window is resized
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame, pack_toolbar=False)
+        self.toolbar.pack(side=BOTTOM, fill=X)
+        self.canvas.get_tk_widget().pack(fill=BOTH, expand=True)
+        self.all_time_chart = None #Kept so switching record <-> adjusted only moves bars
+
+    def show_all_time(self, league_info: LeagueInfo, figure_option: int,
+                      first_season: int = None, last_season: int = None):
+        with league_info.lock: #Every number on a chart comes from the same refresh
+            self.all_time_chart = draw_all_time_graph(
+                self.figure, league_info, figure_option, self.all_time_chart,
+                first_season, last_season)
+        self.redraw()
+
+    def show_win_loss_margin(self, league_info: LeagueInfo, first_season: int = None,
+                             last_season: int = None):
+        self.all_time_chart = None
+        with league_info.lock:
+            draw_win_loss_margin_graph(self.figure, league_info, first_season, last_season)
+        self.redraw()
+
+    def show_head_to_head(self, league_info: LeagueInfo, first_season: int = None,
+                          last_season: int = None):
+        self.all_time_chart = None
+        with league_info.lock:
+            draw_head_to_head_graph(self.figure, league_info, first_season, last_season)
+        self.redraw()
+
+    def show_all_play(self, league_info: LeagueInfo, first_season: int = None,
+                      last_season: int = None):
+        self.all_time_chart = None
+        with league_info.lock:
+            draw_all_play_graph(self.figure, league_info, first_season, last_season)
+        self.redraw()
+
+    def show_luck(self, league_info: LeagueInfo, first_season: int = None,
+                  last_season: int = None):
+        self.all_time_chart = None
+        with league_info.lock:
+            draw_luck_graph(self.figure, league_info, first_season, last_season)
+        self.redraw()
+
+    def show_playoff_odds(self, simulation, playoff_odds, team_names: dict):
+        """ Draws odds already simulated on the worker thread, see simulate_playoff_odds. """
+        self.all_time_chart = None
+        self.figure.clear()
+        prepare_playoff_odds_figure(simulation, playoff_odds, team_names, self.figure)
+        self.redraw()
+
+    def clear(self):
+        self.all_time_chart = None
+        self.figure.clear()
+        self.redraw()
+
+    def redraw(self):
+        self.toolbar.update() #Resets the zoom/pan history kept for the previous chart
+        self.canvas.draw_idle()
@@ -1,3 +1,6 @@
+DEFAULT_LEAGUE_ID = 368182
+DEFAULT_FIRST_YEAR = 2014
+
 ESPN_ID_TO_TEAM = { #ESPN's team id : team
     1: "DJ",
     2: "Nick",
@@ -32,5 +35,12 @@ STATS_IDS = {
 AXES_LABELS = {
     0: "Games",
     1: "Points",
-    2: "% of Games"
+    2: "% of Games",
+    3: "Point Margin"
 }
+
+REGULAR_SEASON_WEEKS = 14 #Used when ESPN doesn't tag playoff games
+
+FIGURE_SIZE = (16, 6) #inches, for figures saved to files rather than embedded in the window
+
+PLAYOFF_TEAM_COUNT = 4 #Used for playoff odds; ESPN's league settings aren't fetched
@@ -0,0 +1,184 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from ESPN_FFB import instrumentation
+
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_MAX_BACKOFF_SECONDS = 30.0 #Longest wait between attempts, whatever Retry-After asks
+DEFAULT_TIMEOUT = (5, 30) #(connect, read) seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+CANCEL_POLL_SECONDS = 0.1
+
+class FetchCancelled(Exception):
+    pass
+
+class SeasonRequest:
+
+    def __init__(self, season: int, url: str, params=None, headers: dict = None,
+                 cookies: dict = None, parser=None):
+        """ parser(response), if given, runs on the fetch thread while the body streams in
+            for 200 responses. Its return value becomes FetchResult.payload.
+        """
+        self.season = season
+        self.url = url
+        self.params = params
+        self.headers = headers
+        self.cookies = cookies
+        self.parser = parser
+
+class FetchResult:
+
+    def __init__(self, season: int, url: str, response=None, error: Exception = None,
+                 payload=None):
+        self.season = season
+        self.url = url
+        self.response = response
+        self.error = error
+        self.payload = payload
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.response is not None
+
+class ESPNFetcher:
+    """ Fetches many season URLs concurrently over one keep-alive session.
+        Each request is retried with exponential backoff on connection errors, 429 and 5xx,
+        and every season reports its own FetchResult so one failure doesn't sink the rest.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+                 timeout=DEFAULT_TIMEOUT,
+                 max_backoff_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='espn-fetch')
+
+    def fetch(self, season_requests: list, on_result=None,
+              cancel_event: threading.Event = None) -> list:
+        """ Returns one FetchResult per SeasonRequest, in the same order.
+            on_result(result) is called as each season finishes. Once cancel_event is set,
+            queued requests are dropped and report a FetchCancelled error.
+        """
+        futures = {
+            self._executor.submit(self.fetch_single, season_request): index
+            for index, season_request in enumerate(season_requests)}
+        results = [None] * len(season_requests)
+
+        remaining = set(futures)
+        while len(remaining) > 0 and not _is_cancelled(cancel_event):
+            finished, remaining = wait(
+                remaining, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                results[futures[future]] = result
+                if on_result is not None:
+                    on_result(result)
+
+        for future in remaining:
+            future.cancel()
+            season_request = season_requests[futures[future]]
+            results[futures[future]] = FetchResult(
+                season_request.season, season_request.url, error=FetchCancelled())
+        return results
+
+    def fetch_single(self, season_request: SeasonRequest) -> FetchResult:
+        with instrumentation.span(
+                'request', 'fetch', season=season_request.season,
+                url=season_request.url) as attributes:
+            result = self._fetch_with_retries(season_request, attributes)
+            if result.response is not None:
+                attributes['status'] = result.response.status_code
+                attributes['bytes'] = _get_bytes_read(result.response)
+            instrumentation.count('fetch.bytes', attributes.get('bytes', 0))
+        return result
+
+    def _fetch_with_retries(self, season_request: SeasonRequest, attributes: dict) -> FetchResult:
+        error = None
+        for attempt in range(self.max_retries + 1):
+            attributes['attempts'] = attempt + 1
+            try:
+                response = self.session.get(
+                    season_request.url,
+                    params=season_request.params,
+                    headers=season_request.headers,
+                    cookies=season_request.cookies,
+                    timeout=self.timeout,
+                    stream=season_request.parser is not None)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exception:
+                error = exception
+                response = None
+
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                return self._parse_response(season_request, response)
+            if response is not None:
+                error = requests.exceptions.HTTPError(
+                    f'ESPN responded with {response.status_code}', response=response)
+                response.close() #A streamed body would hold its connection until read
+
+            if attempt < self.max_retries:
+                instrumentation.count('fetch.retries')
+                time.sleep(self._get_backoff(attempt, response))
+        return FetchResult(season_request.season, season_request.url, error=error)
+
+    def _parse_response(self, season_request: SeasonRequest, response) -> FetchResult:
+        payload, error = None, None
+        if season_request.parser is not None:
+            try:
+                if response.status_code == 200:
+                    with instrumentation.span('parse', 'parse', season=season_request.season):
+                        payload = season_request.parser(response)
+            except (ValueError, requests.exceptions.RequestException) as exception:
+                error = exception
+            finally:
+                response.close()
+        return FetchResult(season_request.season, season_request.url, response, error, payload)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _get_backoff(self, attempt: int, response) -> float:
+        """ Honors ESPN's Retry-After header when it sends one, up to max_backoff_seconds. """
+        backoff = self.backoff_seconds * (2 ** attempt)
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                backoff = float(retry_after)
+        return min(backoff, self.max_backoff_seconds)
+
+def _get_bytes_read(response) -> int:
+    """ Bytes as they came over the wire, before any gzip was undone. """
+    try:
+        return response.raw.tell()
+    except AttributeError:
+        return len(response.content or b'')
+
+def _is_cancelled(cancel_event: threading.Event) -> bool:
+    return cancel_event is not None and cancel_event.is_set()
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+def get_default_fetcher() -> ESPNFetcher:
+    """ Returns the fetcher shared by the whole process, so every refresh reuses
+        the same worker threads and open connections.
+    """
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = ESPNFetcher()
+        return _default_fetcher
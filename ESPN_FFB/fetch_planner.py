@@ -0,0 +1,282 @@
+""" Fetches every view a league needs with one request per season.
+
+ESPN accepts several view parameters on one URL and answers with the union of their
+fields. FetchPlanner works out, season by season, which views the season cache can't
+serve, asks for exactly those in a single request, and splits the combined body back
+into one cache entry per view. A full refresh therefore costs one request per season
+however many views are registered.
+
+Every (league, season, view) being fetched is claimed in a process-wide SingleFlight.
+A planner that finds a season and view already in flight waits for that fetch rather
+than requesting it again, so concurrent refreshes of a league cost one sweep of ESPN.
+"""
+import threading
+from functools import partial
+from ESPN_FFB import instrumentation
+from ESPN_FFB.espn_fetcher import ESPNFetcher, SeasonRequest
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.matchup_info import MatchupTable
+from ESPN_FFB.payload_projection import get_registered_views, get_view_fields_hash, parse_views
+from ESPN_FFB.season_cache import SeasonCache, conditional_headers
+from ESPN_FFB.single_flight import SingleFlight, wait_for
+from ESPN_FFB.url_info import URLInfo, _get_season_end, _is_active_season
+
+_in_flight = SingleFlight() #(league_id, season, view) : payload, or None if the fetch failed
+_claim_lock = threading.Lock()
+
+class FetchPlanner:
+
+    def __init__(self, league_info: LeagueInfo, views: list = None,
+                 season_cache: SeasonCache = None, fetcher: ESPNFetcher = None,
+                 api_host: str = None, cookies: list = None):
+        """ views defaults to every view a consumer registered fields for.
+            The other arguments are passed on to URLInfo.
+        """
+        self.views = list(views) if views is not None else get_registered_views()
+        self.url_info = URLInfo(
+            self.views[0], league_info, season_cache, fetcher, api_host, cookies)
+        self.league_id = league_info.league_id
+        self.seasons = self.url_info.seasons
+        self.season_cache = self.url_info.season_cache
+        self.fetcher = self.url_info.fetcher
+        self.failed_seasons = list()
+        self._claimed = list() #(season index, view) this planner fetches for everyone
+        self._shared = list() #(season index, view, Future) another planner is fetching
+
+    def get_formatted_espn_data(self, progress_callback=None, cancel_event=None):
+        """ Returns ({view: [payload per season, newest first]}, success).
+            progress_callback(completed, total) is called once per finished season.
+        """
+        with instrumentation.span(
+                'fetch', 'stage', league_id=self.league_id,
+                view=','.join(self.views)) as attributes:
+            pending_requests = self.get_pending_requests()
+            total = len(self.seasons)
+            completed = [total - len(pending_requests)]
+
+            def on_result(_):
+                completed[0] += 1
+                progress_callback(completed[0], total)
+
+            if progress_callback is not None:
+                progress_callback(completed[0], total)
+            fetch_results = list()
+            try:
+                if len(pending_requests) > 0:
+                    fetch_results = self.fetcher.fetch(
+                        pending_requests, on_result if progress_callback is not None else None,
+                        cancel_event)
+                responses, success = self.collect_responses(fetch_results, cancel_event)
+            finally:
+                self.release()
+            attributes['seasons'] = total
+            attributes['requests'] = len(pending_requests)
+            attributes['failed_seasons'] = len(self.failed_seasons)
+        return responses, success
+
+    def get_pending_requests(self) -> list:
+        """ Returns one SeasonRequest per season that is missing any view, asking for
+            only the missing views that no other planner is already fetching.
+            Hand the results to collect_responses in order. Views claimed here are only
+            released by collect_responses or release(), so call one of them even when
+            the fetch fails, or other planners wait on the claim forever.
+        """
+        self._payloads = {view: [None] * len(self.seasons) for view in self.views}
+        self._pending = list() #(season index, views requested, cached entries)
+        self._claimed = list()
+        self._shared = list()
+        pending_requests = list()
+
+        for index, season in enumerate(self.seasons):
+            stale_views = list()
+            cached_entries = dict()
+            with _claim_lock: #All of a season's views, or a planner could claim half of them
+                for view in self.views:
+                    entry = self.season_cache.get(
+                        self.league_id, season, view, get_view_fields_hash(view))
+                    if self.season_cache.is_fresh(
+                            entry, _is_active_season(season), _get_season_end(season)):
+                        instrumentation.count('cache.hit')
+                        self._payloads[view][index] = entry.payload
+                        continue
+                    instrumentation.count('cache.miss')
+                    key = (self.league_id, season, view)
+                    future, is_owner = _in_flight.claim(key)
+                    if is_owner:
+                        entry = self.season_cache.get(
+                            self.league_id, season, view, get_view_fields_hash(view))
+                        if self.season_cache.is_fresh(
+                                entry, _is_active_season(season), _get_season_end(season)):
+                            #Another planner stored it between the first look and the claim
+                            self._payloads[view][index] = entry.payload
+                            _in_flight.resolve(key, entry.payload)
+                            continue
+                        self._claimed.append((index, view))
+                        stale_views.append(view)
+                        cached_entries[view] = entry
+                    else:
+                        instrumentation.count('fetch.shared')
+                        self._shared.append((index, view, future))
+            if len(stale_views) > 0:
+                self._pending.append((index, stale_views, cached_entries))
+                pending_requests.append(
+                    self._build_season_request(index, stale_views, cached_entries))
+        return pending_requests
+
+    def fetch_active_season(self, cancel_event=None):
+        """ Revalidates every view of only the newest season with one conditional request,
+            even if its cache entries are still inside the TTL. Historical seasons are never
+            touched. A view another planner is already fetching is waited on instead.
+
+            Returns ({view: payload} for the views ESPN sent a different payload for,
+            success). success is False if any view's payload couldn't be had.
+        """
+        if len(self.seasons) == 0 or _is_active_season(self.seasons[0]) is False:
+            return dict(), True
+
+        season = self.seasons[0]
+        self._payloads = {view: [None] * len(self.seasons) for view in self.views}
+        self._claimed = list()
+        self._shared = list()
+        cached_entries = dict()
+        with _claim_lock:
+            for view in self.views:
+                cached_entries[view] = self.season_cache.get(
+                    self.league_id, season, view, get_view_fields_hash(view))
+                future, is_owner = _in_flight.claim((self.league_id, season, view))
+                if is_owner:
+                    self._claimed.append((0, view))
+                else:
+                    instrumentation.count('fetch.shared')
+                    self._shared.append((0, view, future))
+
+        views = [view for _, view in self._claimed]
+        try:
+            if len(views) > 0:
+                owned_entries = {view: cached_entries[view] for view in views}
+                fetch_result = self.fetcher.fetch_single(
+                    self._build_season_request(0, views, owned_entries))
+                if fetch_result.success:
+                    for view, payload in self._store_response(
+                            season, views, fetch_result, owned_entries).items():
+                        self._payloads[view][0] = payload
+        finally:
+            self.release()
+        for _, view, future in self._shared:
+            self._payloads[view][0] = wait_for(future, cancel_event)
+
+        changed_payloads = {
+            view: payloads[0] for view, payloads in self._payloads.items()
+            if payloads[0] is not None and (
+                cached_entries[view] is None or payloads[0] != cached_entries[view].payload)}
+        self.failed_seasons = [season] if any(
+            payloads[0] is None for payloads in self._payloads.values()) else list()
+        return changed_payloads, len(self.failed_seasons) == 0
+
+    def collect_responses(self, fetch_results: list, cancel_event=None):
+        self.store_responses(fetch_results)
+        return self.wait_for_shared(cancel_event)
+
+    def store_responses(self, fetch_results: list):
+        """ Stores this planner's results and hands them to any planner waiting on them. """
+        try:
+            for (index, views, cached_entries), fetch_result in zip(
+                    self._pending, fetch_results):
+                if fetch_result.success:
+                    for view, payload in self._store_response(
+                            self.seasons[index], views, fetch_result, cached_entries).items():
+                        self._payloads[view][index] = payload
+        finally:
+            self.release()
+
+    def wait_for_shared(self, cancel_event=None):
+        """ Waits for the views other planners were fetching, then returns
+            ({view: [payload per season, newest first]}, success). A shared view whose
+            fetch failed, or that stopped being waited on when cancel_event was set,
+            counts as failed. Call store_responses first.
+        """
+        for index, view, future in self._shared:
+            self._payloads[view][index] = wait_for(future, cancel_event)
+
+        self.failed_seasons = [
+            season for index, season in enumerate(self.seasons)
+            if any(self._payloads[view][index] is None for view in self.views)]
+        responses = {
+            view: [payload for payload in payloads if payload is not None]
+            for view, payloads in self._payloads.items()}
+        return responses, len(self.failed_seasons) == 0
+
+    def release(self):
+        """ Hands what this planner fetched, or None for what it didn't, to every planner
+            waiting on its claims. Safe to call more than once.
+        """
+        claimed, self._claimed = self._claimed, list()
+        for index, view in claimed:
+            _in_flight.resolve(
+                (self.league_id, self.seasons[index], view), self._payloads[view][index])
+
+    def _build_season_request(self, index: int, views: list,
+                              cached_entries: dict) -> SeasonRequest:
+        url = self.url_info.urls[index]
+        return SeasonRequest(
+            self.seasons[index],
+            url,
+            params={"view": views},
+            headers=_get_shared_conditional_headers(views, cached_entries),
+            cookies={"SWID": self.url_info.swid,
+                     "espn_s2": self.url_info.espn_s2},
+            parser=partial(parse_views, views=views, is_list='leagueHistory' in url))
+
+    def _store_response(self, season: int, views: list, fetch_result,
+                        cached_entries: dict) -> dict:
+        """ Returns {view: payload}, writing one season cache entry per view. """
+        response = fetch_result.response
+        if response.status_code == 304:
+            instrumentation.count('cache.revalidated')
+            return {
+                view: self.season_cache.touch(self.league_id, season, view, entry).payload
+                for view, entry in cached_entries.items()}
+        if response.status_code != 200:
+            return dict()
+
+        for view, payload in fetch_result.payload.items():
+            self.season_cache.put(
+                self.league_id, season, view, payload,
+                response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                get_view_fields_hash(view))
+        return fetch_result.payload
+
+def apply_responses(league_info: LeagueInfo, responses: dict):
+    """ Hands each view's payloads to the part of league_info built from that view.
+        Tables are built first and swapped in together, so readers holding
+        league_info.lock never see one view refreshed and the other not.
+    """
+    matchup_table = None
+    if "mMatchup" in responses:
+        matchup_table = MatchupTable.from_responses(responses["mMatchup"])
+    with league_info.lock:
+        if matchup_table is not None:
+            league_info.matchup_table = matchup_table
+        if "mTeam" in responses:
+            league_info.cached_responses = responses["mTeam"]
+
+def get_missing_views(league_info: LeagueInfo, views: list = None) -> list:
+    """ The views, of those given or every registered view, league_info hasn't loaded. """
+    views = views if views is not None else get_registered_views()
+    loaded_views = set()
+    if league_info.is_cache_empty() is False:
+        loaded_views.add("mTeam")
+    if league_info.matchup_table is not None:
+        loaded_views.add("mMatchup")
+    return [view for view in views if view not in loaded_views]
+
+def _get_shared_conditional_headers(views: list, cached_entries: dict) -> dict:
+    """ An ETag belongs to the combined body it came with, so it is only sent when every
+        requested view was last stored from that same body. A 304 then covers them all.
+    """
+    entries = [cached_entries.get(view) for view in views]
+    headers = [conditional_headers(entry) for entry in entries]
+    if any(entry is None for entry in entries) or any(
+            header != headers[0] for header in headers):
+        return dict()
+    return headers[0]
@@ -1,45 +1,96 @@
 from tkinter import *
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from tkinter.ttk import *
 import os
-from ESPN_FFB.all_time_standings import  generate_all_time_graph
+import threading
+from ESPN_FFB import instrumentation
+from ESPN_FFB.background_worker import BackgroundWorker
 from ESPN_FFB.figure_options import FIGURE_OPTIONS
-from ESPN_FFB.league_info import LeagueInfo
 from functools import partial
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from ESPN_FFB.league_info import LeagueInfo
+#matplotlib, numpy and requests are only imported once a chart or fetch needs them,
+#so the window can open before they load. See ESPN_FFB.startup_timing.
 
-def start_application():
+def start_application(startup_time: float = None):
     """ Creates main window for the user to interact with.
+        If startup_time (a time.perf_counter() value) is given, reports how long it took
+        the window to appear and what each module cost to import.
     """
     application_window = generate_window()
+    if startup_time is not None:
+        application_window.after_idle(
+            partial(report_startup_time, application_window, startup_time))
     application_window.mainloop()
 
+def report_startup_time(window: Tk, startup_time: float):
+    from ESPN_FFB.startup_timing import print_startup_report
+    window.update()
+    print_startup_report(startup_time)
+
 def generate_window() -> Tk:
     window = ApplicationWindow()
-    window.geometry('1000x700')
+    window.geometry('1600x700')
     window.title('Fumbled From Birth')
     Grid.rowconfigure(window, 0, weight=1)
     Grid.columnconfigure(window, 0, weight=1)
+    Grid.columnconfigure(window, 1, weight=3)
     return window
 
 class ApplicationWindow(Tk):
 
     def __init__(self):
         super().__init__()
-        self.league_info = LeagueInfo()
+        self._league_info = None
+        self._league_info_lock = threading.Lock()
+        self._chart_panel = None
+        self.redraw_chart = None #Draws the displayed chart again, e.g. for a new season range
+        self.live_season_poller = None
+        self._live_season_job = None
+        self.worker = BackgroundWorker(self)
         self.generate_frame()
+        self.generate_chart_frame()
         self.set_icon()
         self.generate_commands()
         self.generate_buttons()
+        self.generate_season_range_selector()
+        self.generate_progress_bar()
         self.generate_advanced_options()
+        self.after_idle(self.prefetch_league_history)
+
+    @property
+    def league_info(self):
+        """ Created on first use, which is on the worker thread during prefetch,
+            so numpy is never imported before the window shows.
+        """
+        with self._league_info_lock:
+            if self._league_info is None:
+                from ESPN_FFB.league_info import LeagueInfo
+                self._league_info = LeagueInfo()
+            return self._league_info
+
+    @property
+    def chart_panel(self):
+        """ Created when the first chart is drawn, which is when matplotlib is imported. """
+        if self._chart_panel is None:
+            from ESPN_FFB.chart_panel import ChartPanel
+            self._chart_panel = ChartPanel(self.chart_frame)
+            self._chart_panel.frame.pack(fill=BOTH, expand=True)
+        return self._chart_panel
 
     def generate_frame(self):
         self.layout_frame = Frame(self)
         self.layout_frame.grid(row=0, column=0, sticky=N+S+E+W)
-        for x in range(2):
+        for x in range(5):
             Grid.rowconfigure(self.layout_frame, x, weight=1)
         for y in range(2):
             Grid.columnconfigure(self.layout_frame, y, weight=1)
 
+    def generate_chart_frame(self):
+        self.chart_frame = Frame(self)
+        self.chart_frame.grid(row=0, column=1, sticky=N+S+E+W)
+
     def set_icon(self):
         photo = self.get_icon()
         self.iconphoto(False, photo)
@@ -51,25 +102,51 @@ class ApplicationWindow(Tk):
     def generate_commands(self):
         self.all_time_record_command = partial(
             on_click_all_time,
-            self.league_info,
+            self,
             FIGURE_OPTIONS.get("All Time Record"))
 
         self.all_time_record_adjusted_command = partial(
             on_click_all_time,
-            self.league_info,
+            self,
             FIGURE_OPTIONS.get("All Time Record - Adjusted (%)"))
 
         self.all_time_points_command = partial(
             on_click_all_time,
-            self.league_info,
+            self,
             FIGURE_OPTIONS.get("All Time Points"))
 
         self.all_time_points_adjusted_command = partial(
             on_click_all_time,
-            self.league_info,
+            self,
             FIGURE_OPTIONS.get("All Time Points - Adjusted (Per Game)"))
 
-        self.clear_cache_command = partial(on_click_clear_cache_button, self.league_info)
+        self.win_loss_margin_command = partial(on_click_win_loss_margin, self)
+
+        self.head_to_head_command = partial(on_click_head_to_head, self)
+
+        self.all_play_command = partial(on_click_all_play, self)
+
+        self.luck_command = partial(on_click_luck, self)
+
+        self.playoff_odds_command = partial(on_click_playoff_odds, self)
+
+        self.season_range_command = partial(on_select_season_range, self)
+
+        self.cancel_command = partial(on_click_cancel_button, self)
+
+        self.clear_cache_command = partial(on_click_clear_league, self)
+
+        self.clear_seasons_command = partial(on_click_clear_seasons, self)
+
+        self.clear_all_leagues_command = partial(on_click_clear_all_leagues, self)
+
+        self.cache_stats_command = on_click_cache_stats
+
+        self.record_trace_command = partial(on_click_record_trace, self)
+
+        self.export_trace_command = on_click_export_trace
+
+        self.live_updates_command = partial(on_click_live_updates, self)
 
     def generate_buttons(self):
         self.all_time_record_button = Button(
@@ -92,6 +169,31 @@ class ApplicationWindow(Tk):
             command=self.all_time_points_adjusted_command,
             text="All Time Points - Adjusted (Per Game)")
 
+        self.win_loss_margin_button = Button(
+            self.layout_frame,
+            command=self.win_loss_margin_command,
+            text="Win/Loss Margins")
+
+        self.head_to_head_button = Button(
+            self.layout_frame,
+            command=self.head_to_head_command,
+            text="Head-to-Head")
+
+        self.all_play_button = Button(
+            self.layout_frame,
+            command=self.all_play_command,
+            text="All-Play Record")
+
+        self.luck_button = Button(
+            self.layout_frame,
+            command=self.luck_command,
+            text="Luck")
+
+        self.playoff_odds_button = Button(
+            self.layout_frame,
+            command=self.playoff_odds_command,
+            text="Playoff Odds")
+
         self.assign_buttons_to_grid()
 
     def assign_buttons_to_grid(self):
@@ -99,13 +201,186 @@ class ApplicationWindow(Tk):
         self.all_time_record_adjusted_button.grid(column=1, row=0, sticky=N+S+E+W)
         self.all_time_points_button.grid(column=0, row=1, sticky=N+S+E+W)
         self.all_time_points_adjusted_button.grid(column=1, row=1, sticky=N+S+E+W)
+        self.win_loss_margin_button.grid(column=0, row=2, sticky=N+S+E+W)
+        self.head_to_head_button.grid(column=1, row=2, sticky=N+S+E+W)
+        self.all_play_button.grid(column=0, row=3, sticky=N+S+E+W)
+        self.luck_button.grid(column=1, row=3, sticky=N+S+E+W)
+        self.playoff_odds_button.grid(column=0, row=4, columnspan=2, sticky=N+S+E+W)
+
+    def generate_season_range_selector(self):
+        self.season_options = list()
+        self.season_range_frame = Frame(self.layout_frame)
+        self.season_range_frame.grid(column=0, row=5, columnspan=2, pady=5)
+
+        self.season_range_label = Label(self.season_range_frame, text='Seasons')
+        self.first_season_box = Combobox(self.season_range_frame, state='readonly', width=8)
+        self.season_range_separator = Label(self.season_range_frame, text='to')
+        self.last_season_box = Combobox(self.season_range_frame, state='readonly', width=8)
+        for season_box in (self.first_season_box, self.last_season_box):
+            season_box.bind('<<ComboboxSelected>>', lambda _: self.season_range_command())
+
+        self.season_range_label.grid(column=0, row=0, padx=5)
+        self.first_season_box.grid(column=1, row=0)
+        self.season_range_separator.grid(column=2, row=0, padx=5)
+        self.last_season_box.grid(column=3, row=0)
+
+    def update_season_range_options(self):
+        """ Offers the loaded seasons. A new league resets the range to every season. """
+        seasons = self.league_info.get_seasons()
+        if seasons == self.season_options:
+            return
+        self.season_options = seasons
+        self.first_season_box.config(values=seasons)
+        self.last_season_box.config(values=seasons)
+        if len(seasons) > 0:
+            self.first_season_box.set(seasons[0])
+            self.last_season_box.set(seasons[-1])
+
+    def get_season_range(self) -> tuple:
+        """ Returns (first season, last season) picked in the selector, or (None, None)
+            when every season is picked.
+        """
+        seasons = self.season_options
+        if len(seasons) == 0:
+            return None, None
+        first_season, last_season = sorted((
+            int(self.first_season_box.get()), int(self.last_season_box.get())))
+        if first_season == seasons[0] and last_season == seasons[-1]:
+            return None, None
+        return first_season, last_season
+
+    def generate_progress_bar(self):
+        self.status_frame = Frame(self)
+        self.status_frame.grid(row=1, column=0, columnspan=2, sticky=E+W)
+        Grid.columnconfigure(self.status_frame, 1, weight=1)
+
+        self.status_label = Label(self.status_frame, text='Ready', width=30)
+        self.progress_bar = Progressbar(self.status_frame, mode='determinate')
+        self.cancel_button = Button(
+            self.status_frame,
+            command=self.cancel_command,
+            text="Cancel",
+            state=DISABLED)
+
+        self.status_label.grid(column=0, row=0, padx=5, pady=5)
+        self.progress_bar.grid(column=1, row=0, sticky=E+W, pady=5)
+        self.cancel_button.grid(column=2, row=0, padx=5, pady=5)
+
+    def prefetch_league_history(self):
+        """ Loads the default league as soon as the window opens, so the first click
+            draws from memory.
+        """
+        self.run_in_background(_load_league_history, None, report_errors=False)
+
+    def run_in_background(self, load_history, on_loaded, report_errors: bool = True):
+        """ Runs load_history(league_info, progress_callback, cancel_event) on the worker
+            thread, then on_loaded() on the main thread if every season was retrieved.
+        """
+        self.status_label.config(text='Loading league history')
+        self.cancel_button.config(state=NORMAL)
+        self.worker.submit(
+            lambda progress_callback, cancel_event: load_history(
+                self.league_info, progress_callback, cancel_event),
+            on_done=partial(self.on_background_done, on_loaded, report_errors),
+            on_progress=self.on_background_progress)
+
+    def on_background_progress(self, completed: int, total: int):
+        self.progress_bar.config(maximum=max(total, 1), value=completed)
+        self.status_label.config(text=f'Loaded {completed} of {total} seasons')
+
+    def on_background_done(self, on_loaded, report_errors: bool, loaded: bool, error: Exception):
+        if self.worker.is_busy() is False:
+            self.set_idle('Ready')
+
+        if error is None and loaded is True:
+            self.update_season_range_options()
+            if on_loaded is not None:
+                on_loaded()
+        elif report_errors:
+            show_request_error()
+        else:
+            self.set_idle('Unable to load league history')
+
+    def start_live_updates(self):
+        if self._live_season_job is None:
+            self._live_season_job = self.after_idle(self.poll_live_season)
+
+    def stop_live_updates(self):
+        if self._live_season_job is not None:
+            self.after_cancel(self._live_season_job)
+            self._live_season_job = None
+
+    def poll_live_season(self):
+        """ Revalidates the active season on the worker thread. Waits for its next turn
+            while a load is running or before any history is loaded.
+        """
+        self._live_season_job = None
+        if self.worker.is_busy() or self._league_info is None:
+            self.schedule_live_season_poll()
+            return
+        self.worker.submit(
+            lambda _, cancel_event: _poll_live_season(self, cancel_event),
+            on_done=self.on_live_season_polled)
+
+    def on_live_season_polled(self, changed: bool, error: Exception):
+        if self.live_updates_variable.get() is False:
+            return
+        if error is None and changed:
+            self.update_season_range_options()
+            self.status_label.config(text='Live season updated')
+            if self.redraw_chart is not None:
+                self.redraw_chart()
+        self.schedule_live_season_poll()
+
+    def schedule_live_season_poll(self):
+        if self._live_season_job is not None: #Already scheduled, e.g. toggled off and on
+            return
+        if self.live_season_poller is None:
+            seconds = 1
+        else:
+            seconds = self.live_season_poller.get_next_interval()
+        self._live_season_job = self.after(int(seconds * 1000), self.poll_live_season)
+
+    def set_idle(self, status: str):
+        self.status_label.config(text=status)
+        self.progress_bar.config(value=0)
+        self.cancel_button.config(state=DISABLED)
 
     def generate_advanced_options(self):
         self.advanced_options_menu = Menu(self)
         self.clear_cache_item = Menu(self.advanced_options_menu, tearoff=0)
-        self.clear_cache_item.add_command(
-            label='Clear cached data',
+        self.clear_scope_menu = Menu(self.clear_cache_item, tearoff=0)
+        self.clear_scope_menu.add_command(
+            label='Selected seasons',
+            command=self.clear_seasons_command)
+        self.clear_scope_menu.add_command(
+            label='This league',
             command=self.clear_cache_command)
+        self.clear_scope_menu.add_command(
+            label='All leagues',
+            command=self.clear_all_leagues_command)
+        self.clear_cache_item.add_cascade(
+            label='Clear cached data',
+            menu=self.clear_scope_menu)
+        self.clear_cache_item.add_command(
+            label='Cache statistics...',
+            command=self.cache_stats_command)
+
+        self.live_updates_variable = BooleanVar(self, value=False)
+        self.clear_cache_item.add_checkbutton(
+            label='Live season updates',
+            variable=self.live_updates_variable,
+            command=self.live_updates_command)
+
+        self.record_trace_variable = BooleanVar(self, value=instrumentation.is_enabled())
+        self.clear_cache_item.add_separator()
+        self.clear_cache_item.add_checkbutton(
+            label='Record performance trace',
+            variable=self.record_trace_variable,
+            command=self.record_trace_command)
+        self.clear_cache_item.add_command(
+            label='Export performance trace...',
+            command=self.export_trace_command)
 
         self.advanced_options_menu.add_cascade(
             label='Advanced Options',
@@ -113,15 +388,198 @@ class ApplicationWindow(Tk):
 
         self.config(menu=self.advanced_options_menu)
 
-def on_click_all_time(league_info: LeagueInfo, figure_option: int):
-    """ Command to execute when a button related to All Time stats is clicked. """
-    if generate_all_time_graph(league_info, figure_option) is False:
-        messagebox.showerror(
-            'Unable to retrieve full league history',
-            'One or more requests to ESPN failed. Verify you have a stable internet connection.')
+def on_click_all_time(window: ApplicationWindow, figure_option: int):
+    """ Command to execute when a button related to All Time stats is clicked.
+        History loads in the background and the chart is drawn once it is ready.
+    """
+    window.run_in_background(
+        _load_league_history,
+        partial(show_all_time_graph, window, figure_option))
+
+def on_click_win_loss_margin(window: ApplicationWindow):
+    """ Command to execute when the Win/Loss Margins button is clicked. """
+    window.run_in_background(
+        _load_schedule_history,
+        partial(show_win_loss_margin_graph, window))
+
+def on_click_head_to_head(window: ApplicationWindow):
+    """ Command to execute when the Head-to-Head button is clicked. """
+    window.run_in_background(
+        _load_schedule_history,
+        partial(show_head_to_head_graph, window))
+
+def on_click_all_play(window: ApplicationWindow):
+    """ Command to execute when the All-Play Record button is clicked. """
+    window.run_in_background(
+        _load_schedule_history,
+        partial(show_all_play_graph, window))
 
-def on_click_clear_cache_button(league_info: LeagueInfo):
+def on_click_luck(window: ApplicationWindow):
+    """ Command to execute when the Luck button is clicked. """
+    window.run_in_background(
+        _load_schedule_history,
+        partial(show_luck_graph, window))
+
+def on_click_playoff_odds(window: ApplicationWindow):
+    """ Command to execute when the Playoff Odds button is clicked. """
+    window.run_in_background(
+        _load_schedule_history,
+        partial(show_playoff_odds_graph, window))
+
+def on_select_season_range(window: ApplicationWindow):
+    """ Redraws the displayed chart for the picked seasons. Range totals come from
+        prefix sums, so this is cheap enough to run on every selection.
+    """
+    if window.redraw_chart is not None:
+        window.redraw_chart()
+
+def on_click_cancel_button(window: ApplicationWindow):
+    """ Stops any in-flight refresh. Seasons that already arrived stay in the season cache. """
+    window.worker.cancel_all()
+    window.set_idle('Cancelled')
+    if window.live_updates_variable.get():
+        window.start_live_updates() #A cancelled poll never schedules the next one
+
+def show_request_error():
+    messagebox.showerror(
+        'Unable to retrieve full league history',
+        'One or more requests to ESPN failed. Verify you have a stable internet connection.')
+
+def on_click_clear_cache_button(league_info: 'LeagueInfo', league_cache=None,
+                                seasons: list = None):
     """ Clears any cached data from previous requests. Will force new requests to be triggered
-        the next time we try to create any graphs.
+        the next time we try to create any graphs. Only league_info's league is cleared from
+        league_cache, and only the given seasons of it if there are any.
     """
     league_info.clear_cache()
+    if league_cache is not None:
+        for season in seasons if seasons is not None else [None]:
+            league_cache.clear(league_info.league_id, season)
+
+def on_click_clear_league(window: ApplicationWindow):
+    from ESPN_FFB.league_cache import get_default_league_cache
+    on_click_clear_cache_button(window.league_info, get_default_league_cache())
+
+def on_click_clear_seasons(window: ApplicationWindow):
+    """ Clears the seasons picked in the season range selector. Other seasons are
+        reloaded from memory the next time a chart is drawn.
+    """
+    from ESPN_FFB.league_cache import get_default_league_cache
+    first_season, last_season = window.get_season_range()
+    seasons = [
+        season for season in window.league_info.get_seasons()
+        if (first_season is None or season >= first_season)
+        and (last_season is None or season <= last_season)]
+    on_click_clear_cache_button(window.league_info, get_default_league_cache(), seasons)
+
+def on_click_clear_all_leagues(window: ApplicationWindow):
+    from ESPN_FFB.league_cache import get_default_league_cache
+    window.league_info.clear_cache()
+    get_default_league_cache().clear()
+
+def on_click_cache_stats():
+    from ESPN_FFB.league_cache import get_default_league_cache
+    messagebox.showinfo(
+        'Cache statistics', format_cache_stats(get_default_league_cache().get_stats()))
+
+def format_cache_stats(stats: dict) -> str:
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] * 100 / lookups if lookups > 0 else 0.0
+    return '\n'.join((
+        f"Hits: {stats['hits']} ({hit_rate:.1f}%)",
+        f"Misses: {stats['misses']}",
+        f"Leagues evicted: {stats['evictions']}",
+        f"Leagues in memory: {stats['leagues']} ({stats['entries']} entries)",
+        f"Memory used: {stats['size'] / 2 ** 20:.1f} of {stats['memory_budget'] / 2 ** 20:.0f} MB"))
+
+def on_click_live_updates(window: ApplicationWindow):
+    """ Starts or stops polling the active season. Only the newest season is requested,
+        so this never throws away history the way clearing cached data does.
+    """
+    if window.live_updates_variable.get():
+        window.start_live_updates()
+    else:
+        window.stop_live_updates()
+
+def on_click_record_trace(window: ApplicationWindow):
+    """ Starts or stops recording spans for fetch, parse, aggregate and render.
+        Starting a new recording drops the previous one.
+    """
+    if window.record_trace_variable.get():
+        instrumentation.get_recorder().clear()
+        instrumentation.enable()
+    else:
+        instrumentation.disable()
+
+def on_click_export_trace():
+    path = filedialog.asksaveasfilename(
+        title='Export performance trace',
+        defaultextension='.json',
+        filetypes=[('Chrome trace', '*.json'), ('JSON lines', '*.jsonl')])
+    if path:
+        instrumentation.export(path)
+
+def _load_league_history(league_info, progress_callback, cancel_event) -> bool:
+    from ESPN_FFB.league_history import load_league_history
+    return load_league_history(league_info, progress_callback, cancel_event)
+
+def _load_schedule_history(league_info, progress_callback, cancel_event) -> bool:
+    from ESPN_FFB.league_history import load_schedule_history
+    return load_schedule_history(league_info, progress_callback, cancel_event)
+
+def _simulate_playoff_odds(league_info, last_season: int) -> tuple:
+    from ESPN_FFB.analytics_charts import simulate_playoff_odds
+    return simulate_playoff_odds(league_info, last_season)
+
+def _poll_live_season(window: ApplicationWindow, cancel_event) -> bool:
+    """ Runs on the worker thread, which is also where the poller is first created. """
+    if window.live_season_poller is None:
+        from ESPN_FFB.live_season import LiveSeasonPoller
+        window.live_season_poller = LiveSeasonPoller(window.league_info)
+    return window.live_season_poller.poll(cancel_event)
+
+def show_all_time_graph(window: ApplicationWindow, figure_option: int):
+    """ Draws into the window's chart panel. Must run on the main thread. """
+    window.redraw_chart = partial(show_all_time_graph, window, figure_option)
+    window.chart_panel.show_all_time(
+        window.league_info, figure_option, *window.get_season_range())
+
+def show_win_loss_margin_graph(window: ApplicationWindow):
+    """ Draws into the window's chart panel. Must run on the main thread. """
+    window.redraw_chart = partial(show_win_loss_margin_graph, window)
+    window.chart_panel.show_win_loss_margin(window.league_info, *window.get_season_range())
+
+def show_head_to_head_graph(window: ApplicationWindow):
+    """ Draws into the window's chart panel. Must run on the main thread. """
+    window.redraw_chart = partial(show_head_to_head_graph, window)
+    window.chart_panel.show_head_to_head(window.league_info, *window.get_season_range())
+
+def show_all_play_graph(window: ApplicationWindow):
+    """ Draws into the window's chart panel. Must run on the main thread. """
+    window.redraw_chart = partial(show_all_play_graph, window)
+    window.chart_panel.show_all_play(window.league_info, *window.get_season_range())
+
+def show_luck_graph(window: ApplicationWindow):
+    """ Draws into the window's chart panel. Must run on the main thread. """
+    window.redraw_chart = partial(show_luck_graph, window)
+    window.chart_panel.show_luck(window.league_info, *window.get_season_range())
+
+def show_playoff_odds_graph(window: ApplicationWindow):
+    """ Simulates on the worker thread, then draws into the window's chart panel.
+        Must run on the main thread.
+    """
+    window.redraw_chart = partial(show_playoff_odds_graph, window)
+    _, last_season = window.get_season_range()
+    window.status_label.config(text='Simulating playoff odds')
+    window.worker.submit(
+        lambda *_: _simulate_playoff_odds(window.league_info, last_season),
+        on_done=partial(on_playoff_odds_simulated, window))
+
+def on_playoff_odds_simulated(window: ApplicationWindow, result: tuple, error: Exception):
+    """ Draws the odds unless another chart was picked while they were simulated. """
+    if window.worker.is_busy() is False:
+        window.set_idle('Ready')
+    if error is not None:
+        window.set_idle('Unable to simulate playoff odds')
+    elif getattr(window.redraw_chart, 'func', None) is show_playoff_odds_graph:
+        window.chart_panel.show_playoff_odds(*result)
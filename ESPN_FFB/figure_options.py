@@ -3,10 +3,20 @@ FIGURE_OPTIONS = {
     "All Time Record - Adjusted (%)": 1,
     "All Time Points": 2,
     "All Time Points - Adjusted (Per Game)": 3,
+    "Win/Loss Margins": 4,
+    "Head-to-Head": 5,
+    "All-Play Record": 6,
+    "Luck": 7,
+    "Playoff Odds": 8,
     0: "All Time Record",
     1: "All Time Record - Adjusted (%)",
     2: "All Time Points",
-    3: "All Time Points - Adjusted (Per Game)"
+    3: "All Time Points - Adjusted (Per Game)",
+    4: "Win/Loss Margins",
+    5: "Head-to-Head",
+    6: "All-Play Record",
+    7: "Luck",
+    8: "Playoff Odds"
 }
 
 def is_all_time_point_figure(figure) -> bool:
@@ -35,9 +45,59 @@ def is_all_time_record_figure(figure) -> bool:
     else:
         return False
 
+def is_win_loss_margin_figure(figure) -> bool:
+    """ Returns True if a given figure option is the Win/Loss Margins box plot.
+        Expects either string or int from dictionary FIGURE_FIGURE_OPTIONS.
+    """
+    return figure in [FIGURE_OPTIONS.get("Win/Loss Margins"), FIGURE_OPTIONS.get(4)]
+
+def is_head_to_head_figure(figure) -> bool:
+    """ Returns True if a given figure option is the Head-to-Head heatmap.
+        Expects either string or int from dictionary FIGURE_FIGURE_OPTIONS.
+    """
+    return figure in [FIGURE_OPTIONS.get("Head-to-Head"), FIGURE_OPTIONS.get(5)]
+
+def is_all_play_figure(figure) -> bool:
+    """ Returns True if a given figure option is the All-Play Record chart.
+        Expects either string or int from dictionary FIGURE_FIGURE_OPTIONS.
+    """
+    return figure in [FIGURE_OPTIONS.get("All-Play Record"), FIGURE_OPTIONS.get(6)]
+
+def is_luck_figure(figure) -> bool:
+    """ Returns True if a given figure option is the Luck chart.
+        Expects either string or int from dictionary FIGURE_FIGURE_OPTIONS.
+    """
+    return figure in [FIGURE_OPTIONS.get("Luck"), FIGURE_OPTIONS.get(7)]
+
+def is_playoff_odds_figure(figure) -> bool:
+    """ Returns True if a given figure option is the simulated Playoff Odds chart.
+        Expects either string or int from dictionary FIGURE_FIGURE_OPTIONS.
+    """
+    return figure in [FIGURE_OPTIONS.get("Playoff Odds"), FIGURE_OPTIONS.get(8)]
+
+def is_matchup_figure(figure) -> bool:
+    """ Returns True if a given figure option is drawn from the mMatchup schedules. """
+    return is_win_loss_margin_figure(figure) or is_head_to_head_figure(figure) \
+        or is_all_play_figure(figure) or is_luck_figure(figure) \
+        or is_playoff_odds_figure(figure)
+
 def is_adjusted_figure_option(figure: int) -> bool:
     if figure == FIGURE_OPTIONS.get("All Time Points - Adjusted (Per Game)"):
         return True
     elif figure == FIGURE_OPTIONS.get("All Time Record - Adjusted (%)"):
         return True
     return False
+
+def get_figure_title(figure, first_season: int = None, last_season: int = None) -> str:
+    """ The figure option's name, followed by the seasons it covers if not every season. """
+    title = FIGURE_OPTIONS.get(figure)
+    if first_season is None and last_season is None:
+        return title
+    if first_season == last_season:
+        return f'{title} ({first_season})'
+    return f"{title} ({first_season or ''}-{last_season or ''})"
+
+def get_all_time_figure_options() -> list:
+    """ Returns every int figure option that is drawn from all time team totals. """
+    return [figure for figure in FIGURE_OPTIONS if isinstance(figure, int)
+            and (is_all_time_record_figure(figure) or is_all_time_point_figure(figure))]
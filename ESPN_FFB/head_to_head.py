@@ -0,0 +1,114 @@
+import numpy as np
+
+HEAD_TO_HEAD_STATS = ['wins', 'losses', 'ties', 'point_differential']
+REGULAR, PLAYOFF = 0, 1 #First axis of HeadToHead.results
+
+class HeadToHead:
+    """ Teams x teams results over every finished game, split into regular season and
+        playoffs. results[game type, row team, column team] holds the row team's wins,
+        losses, ties and point differential against the column team, so any pair is
+        a single lookup. Seasons can be swapped in place as new weeks finish, on a copy
+        if others may be reading.
+    """
+
+    def __init__(self, team_ids: list = None):
+        self.team_ids = list()
+        self._team_indexes = dict()
+        self.results = np.zeros((2, 0, 0, len(HEAD_TO_HEAD_STATS)))
+        self._season_games = dict() #season : games currently counted for it
+        self._set_teams(set(team_ids or list()))
+
+    @classmethod
+    def from_games(cls, games: np.ndarray):
+        """ Builds the matrix from MatchupTable rows. """
+        head_to_head = cls(np.union1d(games['home_id'], games['away_id']).tolist())
+        for season in np.unique(games['season']).tolist():
+            head_to_head.update_season(season, games[games['season'] == season])
+        return head_to_head
+
+    def update_season(self, season: int, games: np.ndarray):
+        """ Replaces the games counted for a season with games. """
+        self._set_teams(set(games['home_id'].tolist()).union(games['away_id'].tolist()))
+        previous_games = self._season_games.get(season)
+        if previous_games is not None:
+            self._add_games(previous_games, -1)
+        self._add_games(games, 1)
+        self._season_games[season] = games
+
+    def copy(self):
+        head_to_head = HeadToHead()
+        head_to_head.team_ids = list(self.team_ids)
+        head_to_head._team_indexes = dict(self._team_indexes)
+        head_to_head.results = self.results.copy()
+        head_to_head._season_games = dict(self._season_games)
+        return head_to_head
+
+    def get_record(self, team_id: int, opponent_id: int, playoff: bool = None) -> dict:
+        """ team_id's results against opponent_id. playoff=None counts every game. """
+        row = self._team_indexes.get(team_id)
+        column = self._team_indexes.get(opponent_id)
+        if row is None or column is None:
+            values = np.zeros(len(HEAD_TO_HEAD_STATS))
+        elif playoff is None:
+            values = self.results[:, row, column].sum(axis=0)
+        else:
+            values = self.results[PLAYOFF if playoff else REGULAR, row, column]
+        record = {stat: int(value) for stat, value in zip(HEAD_TO_HEAD_STATS, values[:3])}
+        record['point_differential'] = round(float(values[3]), 2)
+        return record
+
+    def get_matrix(self, stat: str, playoff: bool = None) -> np.ndarray:
+        """ Teams x teams values of one of HEAD_TO_HEAD_STATS, in team_ids order. """
+        return self._get_results(playoff)[:, :, HEAD_TO_HEAD_STATS.index(stat)]
+
+    def get_games_played(self, playoff: bool = None) -> np.ndarray:
+        return self._get_results(playoff)[:, :, :3].sum(axis=2)
+
+    def get_win_percentages(self, playoff: bool = None) -> np.ndarray:
+        """ Row team's win % against the column team, ties counting as half a win.
+            NaN where two teams never played.
+        """
+        results = self._get_results(playoff)
+        games_played = results[:, :, :3].sum(axis=2)
+        wins = results[:, :, 0] + results[:, :, 2] / 2
+        return np.divide(
+            wins * 100, games_played,
+            out=np.full(games_played.shape, np.nan), where=games_played > 0)
+
+    def _get_results(self, playoff: bool) -> np.ndarray:
+        if playoff is None:
+            return self.results.sum(axis=0)
+        return self.results[PLAYOFF if playoff else REGULAR]
+
+    def _add_games(self, games: np.ndarray, sign: int):
+        """ Counts every game twice, once from each team's side. """
+        home_rows = self._get_rows(games['home_id'])
+        away_rows = self._get_rows(games['away_id'])
+        game_types = games['is_playoff'].astype(np.intp)
+        margins = (games['home_points'] - games['away_points']).astype(float)
+
+        rows = np.concatenate((home_rows, away_rows))
+        columns = np.concatenate((away_rows, home_rows))
+        game_types = np.concatenate((game_types, game_types))
+        margins = np.concatenate((margins, -margins))
+
+        values = np.stack((margins > 0, margins < 0, margins == 0, margins), axis=1) * sign
+        np.add.at(self.results, (game_types, rows, columns), values)
+
+    def _get_rows(self, team_ids: np.ndarray) -> np.ndarray:
+        return np.array([self._team_indexes[team_id] for team_id in team_ids.tolist()],
+                        dtype=np.intp)
+
+    def _set_teams(self, team_ids: set):
+        """ Grows both team axes when new team ids show up. """
+        if team_ids.issubset(self._team_indexes):
+            return
+
+        old_team_ids = self.team_ids
+        self.team_ids = sorted(team_ids.union(old_team_ids))
+        self._team_indexes = {team_id: index for index, team_id in enumerate(self.team_ids)}
+        new_rows = [self._team_indexes[team_id] for team_id in old_team_ids]
+
+        results = np.zeros((2, len(self.team_ids), len(self.team_ids), len(HEAD_TO_HEAD_STATS)))
+        results[np.ix_([REGULAR, PLAYOFF], new_rows, new_rows)] = self.results
+        self.results = results
@@ -0,0 +1,64 @@
+from matplotlib.figure import Figure
+import numpy as np
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import FIGURE_SIZE
+from ESPN_FFB.figure_options import FIGURE_OPTIONS, get_figure_title
+from ESPN_FFB.head_to_head import HeadToHead
+from ESPN_FFB.league_info import LeagueInfo
+
+def draw_head_to_head_graph(figure: Figure, league_info: LeagueInfo,
+                            first_season: int = None, last_season: int = None) -> Figure:
+    """ Draws the heatmap from already loaded history onto figure, replacing what was there.
+        first_season and last_season limit the heatmap to an inclusive range of seasons.
+    """
+    figure.clear()
+    matchup_table = league_info.matchup_table
+    if first_season is not None or last_season is not None:
+        matchup_table = matchup_table.get_season_range(first_season, last_season)
+    prepare_head_to_head_figure(
+        matchup_table.get_head_to_head(), league_info.get_team_names(), figure)
+    figure.axes[0].set_title(get_figure_title(
+        FIGURE_OPTIONS.get("Head-to-Head"), first_season, last_season))
+    return figure
+
+def prepare_head_to_head_figure(head_to_head: HeadToHead, team_names: dict,
+                                figure: Figure = None) -> Figure:
+    """ Colors each cell by the row team's all time win % against the column team
+        and writes the record in it. A new standalone figure is created unless one is given.
+    """
+    figure_option = FIGURE_OPTIONS.get("Head-to-Head")
+    with instrumentation.span('render', 'render', figure_option=figure_option):
+        if figure is None:
+            figure = Figure(figsize=FIGURE_SIZE)
+        _draw_heatmap(figure, head_to_head, team_names)
+        return figure
+
+def _draw_heatmap(figure: Figure, head_to_head: HeadToHead, team_names: dict):
+    names = [team_names.get(team_id, f'Team {team_id}') for team_id in head_to_head.team_ids]
+    positions = np.arange(len(names))
+    axes = figure.add_subplot()
+
+    image = axes.imshow(
+        np.ma.masked_invalid(head_to_head.get_win_percentages()),
+        cmap='RdYlGn', vmin=0, vmax=100)
+    add_record_labels(axes, head_to_head)
+
+    axes.set_title(FIGURE_OPTIONS.get("Head-to-Head"))
+    axes.set_xticks(positions)
+    axes.set_xticklabels(names, rotation=45, ha='right')
+    axes.set_yticks(positions)
+    axes.set_yticklabels(names)
+    axes.set_xlabel('Opponent')
+    figure.colorbar(image, ax=axes, label='Win %')
+    figure.tight_layout()
+
+def add_record_labels(axes, head_to_head: HeadToHead):
+    """ Writes "wins-losses" in every cell of teams that have played, plus ties if any. """
+    wins = head_to_head.get_matrix('wins')
+    losses = head_to_head.get_matrix('losses')
+    ties = head_to_head.get_matrix('ties')
+    for row, column in zip(*np.nonzero(wins + losses + ties)):
+        record = f'{wins[row, column]:.0f}-{losses[row, column]:.0f}'
+        if ties[row, column] > 0:
+            record += f'-{ties[row, column]:.0f}'
+        axes.text(column, row, record, ha='center', va='center', fontsize='small')
@@ -0,0 +1,153 @@
+""" Timed spans and counters for the fetch, parse, aggregate and render stages.
+
+Recording is off by default. Turn it on from the Advanced Options menu, or for headless
+runs set FFB_TRACE to a file path; the trace is written there when the process exits.
+Paths ending in .jsonl get JSON lines, anything else gets Chrome trace-event JSON, which
+loads in chrome://tracing and Perfetto.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_ENVIRONMENT_VARIABLE = 'FFB_TRACE'
+
+class Span:
+
+    def __init__(self, name: str, category: str, start: float, duration: float,
+                 thread_id: int, thread_name: str, attributes: dict):
+        """ start and duration are in seconds; start is a time.perf_counter() value. """
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.thread_id = thread_id
+        self.thread_name = thread_name
+        self.attributes = attributes
+
+    def to_dict(self) -> dict:
+        return {
+            'type': 'span', 'name': self.name, 'category': self.category,
+            'start_ms': self.start * 1000, 'duration_ms': self.duration * 1000,
+            'thread': self.thread_name, 'attributes': self.attributes}
+
+class Recorder:
+    """ Collects spans and counters from any thread. """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = list()
+        self.counters = dict()
+        self._counter_events = list() #(timestamp, name, running value)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str, **attributes):
+        """ Times the with block. Yields the attributes dict so the block can add to it,
+            e.g. a byte count that is only known once the body has been read.
+        """
+        if self.enabled is False:
+            yield attributes
+            return
+
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            duration = time.perf_counter() - start
+            thread = threading.current_thread()
+            with self._lock:
+                self.spans.append(Span(
+                    name, category, start, duration, thread.ident, thread.name, attributes))
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled is False:
+            return
+        with self._lock:
+            value = self.counters.get(name, 0) + amount
+            self.counters[name] = value
+            self._counter_events.append((time.perf_counter(), name, value))
+
+    def clear(self):
+        with self._lock:
+            self.spans = list()
+            self.counters = dict()
+            self._counter_events = list()
+
+    def export(self, path: str):
+        """ Picks the format from the file extension, see the module docstring. """
+        if path.endswith('.jsonl'):
+            self.export_jsonl(path)
+        else:
+            self.export_chrome_trace(path)
+
+    def export_jsonl(self, path: str):
+        """ One span per line, then one line per counter with its final value. """
+        with self._lock:
+            spans, counters = list(self.spans), dict(self.counters)
+        with open(path, 'w') as trace_file:
+            for span in spans:
+                trace_file.write(json.dumps(span.to_dict()) + '\n')
+            for name, value in counters.items():
+                trace_file.write(
+                    json.dumps({'type': 'counter', 'name': name, 'value': value}) + '\n')
+
+    def export_chrome_trace(self, path: str):
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': self.get_trace_events()}, trace_file)
+
+    def get_trace_events(self) -> list:
+        """ Spans become complete ("X") events and counters become counter ("C") events. """
+        process_id = os.getpid()
+        with self._lock:
+            spans, counter_events = list(self.spans), list(self._counter_events)
+
+        trace_events = list()
+        for thread_id, thread_name in {(span.thread_id, span.thread_name) for span in spans}:
+            trace_events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': process_id, 'tid': thread_id,
+                'args': {'name': thread_name}})
+        for span in spans:
+            trace_events.append({
+                'name': span.name, 'cat': span.category, 'ph': 'X',
+                'ts': span.start * 1e6, 'dur': span.duration * 1e6,
+                'pid': process_id, 'tid': span.thread_id, 'args': span.attributes})
+        for timestamp, name, value in counter_events:
+            trace_events.append({
+                'name': name, 'ph': 'C', 'ts': timestamp * 1e6, 'pid': process_id,
+                'args': {name: value}})
+        return trace_events
+
+_recorder = Recorder()
+
+def get_recorder() -> Recorder:
+    return _recorder
+
+def span(name: str, category: str, **attributes):
+    return _recorder.span(name, category, **attributes)
+
+def count(name: str, amount: int = 1):
+    _recorder.count(name, amount)
+
+def enable():
+    _recorder.enabled = True
+
+def disable():
+    _recorder.enabled = False
+
+def is_enabled() -> bool:
+    return _recorder.enabled
+
+def export(path: str):
+    _recorder.export(path)
+
+def configure_from_environment():
+    """ Starts recording if FFB_TRACE is set and writes the trace there at exit. """
+    path = os.environ.get(TRACE_ENVIRONMENT_VARIABLE)
+    if path:
+        enable()
+        atexit.register(export, path)
+
+configure_from_environment()
@@ -0,0 +1,242 @@
+""" All-play records, luck and simulated playoff odds from mMatchup schedules.
+
+Everything works on a score matrix: one row per (season, week), one column per team,
+NaN where a team didn't play. All-play scores every team against every other team of
+the same week, and luck is actual wins minus the wins all-play says a team should have
+expected. Playoff odds simulate the rest of a season's schedule in batches. Large runs
+are spread over one process pool shared by the whole process, whose workers are started
+fresh rather than forked, since the GUI and server call this with threads running.
+"""
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import PLAYOFF_TEAM_COUNT
+from ESPN_FFB.matchup_info import MatchupTable
+
+DEFAULT_SIMULATIONS = 10000
+DEFAULT_BATCH_SIZE = DEFAULT_SIMULATIONS // 4 #Simulations per batch
+POOL_MIN_SIMULATIONS = 5000 #Fewer run quicker in this process than on the pool
+DEFAULT_SEED = 0
+DEFAULT_SCORE_MEAN, DEFAULT_SCORE_DEVIATION = 100.0, 25.0 #Before anyone has played
+
+class ScoreMatrix:
+    """ Weekly regular season scores. scores[row, column] is team_ids[column]'s score in
+        weeks[row], a (season, week) pair.
+    """
+
+    def __init__(self, team_ids: list, weeks: list, scores: np.ndarray, wins: np.ndarray):
+        self.team_ids = team_ids
+        self.weeks = weeks
+        self.scores = scores
+        self.wins = wins #Actual wins in the same layout, ties counting as half a win
+
+    @classmethod
+    def from_games(cls, games: np.ndarray):
+        games = games[~games['is_playoff']]
+        team_ids = np.union1d(games['home_id'], games['away_id'])
+        week_keys = games['season'].astype(np.int64) * 100 + games['week']
+        unique_keys, rows = np.unique(week_keys, return_inverse=True)
+
+        scores = np.full((len(unique_keys), len(team_ids)), np.nan)
+        wins = np.zeros(scores.shape)
+        home_columns = np.searchsorted(team_ids, games['home_id'])
+        away_columns = np.searchsorted(team_ids, games['away_id'])
+        home_points = games['home_points'].astype(float)
+        away_points = games['away_points'].astype(float)
+        scores[rows, home_columns] = home_points
+        scores[rows, away_columns] = away_points
+        wins[rows, home_columns] = _get_win_shares(home_points, away_points)
+        wins[rows, away_columns] = _get_win_shares(away_points, home_points)
+
+        weeks = [(int(key // 100), int(key % 100)) for key in unique_keys]
+        return cls(team_ids.tolist(), weeks, scores, wins)
+
+    def get_all_play_records(self) -> np.ndarray:
+        """ Teams x (wins, losses, ties) against every other team that played the same week. """
+        scores = self.scores
+        played = ~np.isnan(scores)
+        higher = scores[:, :, None] > scores[:, None, :] #[week, team, opponent]
+        lower = scores[:, :, None] < scores[:, None, :]
+        both_played = played[:, :, None] & played[:, None, :]
+        ties = (scores[:, :, None] == scores[:, None, :]) & both_played
+        ties[:, np.arange(len(self.team_ids)), np.arange(len(self.team_ids))] = False
+        return np.stack((
+            higher.sum(axis=(0, 2)), lower.sum(axis=(0, 2)), ties.sum(axis=(0, 2))), axis=1)
+
+    def get_expected_wins(self) -> np.ndarray:
+        """ Each week's all-play win share, summed: the wins a team would average if
+            it had faced a random opponent every week.
+        """
+        scores = self.scores
+        played = ~np.isnan(scores)
+        higher = (scores[:, :, None] > scores[:, None, :]).sum(axis=2)
+        equal = (scores[:, :, None] == scores[:, None, :]).sum(axis=2) - played
+        opponents = played.sum(axis=1, keepdims=True) - 1
+        shares = np.divide(
+            higher + equal / 2, opponents,
+            out=np.zeros(scores.shape), where=played & (opponents > 0))
+        return shares.sum(axis=0)
+
+    def get_actual_wins(self) -> np.ndarray:
+        return self.wins.sum(axis=0)
+
+    def get_luck(self) -> np.ndarray:
+        """ Actual minus expected wins. Positive means a team won more than its scores earned. """
+        return self.get_actual_wins() - self.get_expected_wins()
+
+class PlayoffSimulation:
+    """ One season's standings so far plus its remaining schedule. Each remaining game
+        draws both scores from a normal distribution fitted to that team's season so far.
+        Holds only small arrays, so it pickles cheaply to pool workers.
+    """
+
+    def __init__(self, season: int, team_ids: list, wins: np.ndarray, points_for: np.ndarray,
+                 score_means: np.ndarray, score_deviations: np.ndarray,
+                 home_columns: np.ndarray, away_columns: np.ndarray,
+                 playoff_team_count: int = PLAYOFF_TEAM_COUNT):
+        self.season = season
+        self.team_ids = team_ids
+        self.wins = wins
+        self.points_for = points_for
+        self.score_means = score_means
+        self.score_deviations = score_deviations
+        self.home_columns = home_columns
+        self.away_columns = away_columns
+        self.playoff_team_count = min(playoff_team_count, len(team_ids))
+
+    @classmethod
+    def from_matchup_table(cls, matchup_table: MatchupTable, season: int = None,
+                           playoff_team_count: int = PLAYOFF_TEAM_COUNT):
+        """ Uses the newest season unless one is given. """
+        games, remaining_games = matchup_table.games, matchup_table.remaining_games
+        if season is None:
+            seasons = np.union1d(games['season'], remaining_games['season'])
+            season = int(seasons[-1]) if len(seasons) > 0 else 0
+        games = games[(games['season'] == season) & ~games['is_playoff']]
+        remaining_games = remaining_games[remaining_games['season'] == season]
+
+        team_ids = np.union1d(
+            np.union1d(games['home_id'], games['away_id']),
+            np.union1d(remaining_games['home_id'], remaining_games['away_id']))
+        score_matrix = ScoreMatrix.from_games(games)
+        columns = np.searchsorted(team_ids, score_matrix.team_ids)
+        scores = np.full((len(score_matrix.weeks), len(team_ids)), np.nan)
+        scores[:, columns] = score_matrix.scores
+        wins = np.zeros(len(team_ids))
+        wins[columns] = score_matrix.get_actual_wins()
+
+        score_means, score_deviations = _fit_scores(scores)
+        return cls(
+            season, team_ids.tolist(), wins, np.nansum(scores, axis=0),
+            score_means, score_deviations,
+            np.searchsorted(team_ids, remaining_games['home_id']),
+            np.searchsorted(team_ids, remaining_games['away_id']),
+            playoff_team_count)
+
+    def run(self, simulations: int, seed_sequence: np.random.SeedSequence) -> np.ndarray:
+        """ Returns how many of the simulated seasons each team made the playoffs. """
+        generator = np.random.default_rng(seed_sequence)
+        team_count = len(self.team_ids)
+        game_count = len(self.home_columns)
+
+        home_scores = generator.normal(
+            self.score_means[self.home_columns], self.score_deviations[self.home_columns],
+            (simulations, game_count))
+        away_scores = generator.normal(
+            self.score_means[self.away_columns], self.score_deviations[self.away_columns],
+            (simulations, game_count))
+
+        #Games x teams one-hot matrices turn per game results into per team totals
+        home_teams = np.eye(team_count)[self.home_columns]
+        away_teams = np.eye(team_count)[self.away_columns]
+        home_wins = _get_win_shares(home_scores, away_scores)
+        wins = self.wins + home_wins @ home_teams + (1 - home_wins) @ away_teams
+        points_for = self.points_for + home_scores @ home_teams + away_scores @ away_teams
+
+        #Wins first, then points for as the tiebreaker, like ESPN's default
+        standings = np.lexsort((points_for, wins), axis=1)
+        playoff_teams = standings[:, team_count - self.playoff_team_count:]
+        return np.bincount(playoff_teams.ravel(), minlength=team_count)
+
+def get_playoff_odds(simulation: PlayoffSimulation, simulations: int = DEFAULT_SIMULATIONS,
+                     seed: int = DEFAULT_SEED, batch_size: int = DEFAULT_BATCH_SIZE,
+                     max_workers: int = None) -> np.ndarray:
+    """ Returns each team's chance, in %, of making the playoffs, in simulation.team_ids order.
+        Every batch gets its own child of the seed, so the same seed and batch_size give
+        the same odds no matter how many workers run them. max_workers=1, a single batch
+        or fewer than POOL_MIN_SIMULATIONS simulate in this process.
+    """
+    batch_sizes = [batch_size] * (simulations // batch_size)
+    if simulations % batch_size > 0:
+        batch_sizes.append(simulations % batch_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+
+    with instrumentation.span(
+            'simulate', 'aggregate', season=simulation.season, simulations=simulations,
+            batches=len(batch_sizes)):
+        if len(batch_sizes) <= 1 or max_workers == 1 or simulations < POOL_MIN_SIMULATIONS:
+            counts = map(simulation.run, batch_sizes, seed_sequences)
+        else:
+            counts = get_simulation_pool(max_workers).map(
+                _run_simulation_batch, [simulation] * len(batch_sizes), batch_sizes,
+                seed_sequences)
+        playoff_counts = sum(counts, np.zeros(len(simulation.team_ids), dtype=np.int64))
+    return playoff_counts * 100 / max(simulations, 1)
+
+_simulation_pools = dict() #max_workers : ProcessPoolExecutor
+_simulation_pools_lock = threading.Lock()
+
+def get_simulation_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """ Returns the process's pool of max_workers workers, creating it on first use.
+        Workers come from forkserver, or spawn where there is none, never a fork of a
+        process running Tk, asyncio or worker threads. Pools are shut down at exit.
+    """
+    with _simulation_pools_lock:
+        simulation_pool = _simulation_pools.get(max_workers)
+        if simulation_pool is None:
+            start_method = 'forkserver' \
+                if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            simulation_pool = ProcessPoolExecutor(
+                max_workers, mp_context=multiprocessing.get_context(start_method))
+            _simulation_pools[max_workers] = simulation_pool
+        return simulation_pool
+
+def _shutdown_simulation_pools():
+    with _simulation_pools_lock:
+        for simulation_pool in _simulation_pools.values():
+            simulation_pool.shutdown(cancel_futures=True)
+        _simulation_pools.clear()
+
+atexit.register(_shutdown_simulation_pools)
+
+def _run_simulation_batch(simulation: PlayoffSimulation, simulations: int,
+                          seed_sequence: np.random.SeedSequence) -> np.ndarray:
+    return simulation.run(simulations, seed_sequence)
+
+def _fit_scores(scores: np.ndarray):
+    """ Per team mean and standard deviation of weekly scores. Teams with fewer than two
+        games borrow the league's, and a league with no games yet gets a flat guess.
+    """
+    played = ~np.isnan(scores)
+    games_played = played.sum(axis=0)
+    if played.sum() > 1:
+        league_mean, league_deviation = scores[played].mean(), scores[played].std()
+    else:
+        league_mean, league_deviation = DEFAULT_SCORE_MEAN, DEFAULT_SCORE_DEVIATION
+
+    filled_scores = np.where(played, scores, 0.0)
+    means = np.divide(
+        filled_scores.sum(axis=0), games_played,
+        out=np.full(len(games_played), league_mean), where=games_played > 1)
+    squared_errors = np.where(played, (scores - means) ** 2, 0.0)
+    deviations = np.sqrt(np.divide(
+        squared_errors.sum(axis=0), games_played,
+        out=np.full(len(games_played), league_deviation ** 2), where=games_played > 1))
+    return means, deviations
+
+def _get_win_shares(points: np.ndarray, opponent_points: np.ndarray) -> np.ndarray:
+    """ 1 for a win, 0.5 for a tie, 0 for a loss. """
+    return (points > opponent_points) + (points == opponent_points) / 2
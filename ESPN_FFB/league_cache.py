@@ -0,0 +1,149 @@
+""" Memory-bounded tier in front of the on-disk SeasonCache.
+
+LeagueCache keeps recently used entries in memory, grouped by league, and measures
+every entry when it is stored. Once the entries outgrow the memory budget whole leagues
+are evicted, least recently used first, so switching back to a recent league costs no
+disk reads and no JSON parsing, while serving many leagues never grows without limit.
+It has the same interface as SeasonCache, so URLInfo, FetchPlanner and LeagueRegistry
+use either one.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from ESPN_FFB.season_cache import CacheEntry, SeasonCache
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024 #Bytes
+
+class LeagueCache:
+
+    def __init__(self, season_cache: SeasonCache = None, memory_budget: int = None):
+        """ memory_budget is in bytes. A single league larger than the budget is still
+            kept, as the only league in memory.
+        """
+        if memory_budget is None:
+            memory_budget = int(os.environ.get('FFB_MEMORY_BUDGET', DEFAULT_MEMORY_BUDGET))
+        self.season_cache = season_cache if season_cache is not None else SeasonCache()
+        self.memory_budget = memory_budget
+        self._leagues = OrderedDict() #league_id : {(season, view): (entry, size)}, LRU first
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        return self.season_cache.directory
+
+    def get(self, league_id: int, season: int, view: str, fields_hash: str = None) -> CacheEntry:
+        """ Returns the entry from memory, or from disk on a miss, or None. """
+        with self._lock:
+            league = self._leagues.get(league_id)
+            stored = league.get((season, view)) if league is not None else None
+            if stored is not None and stored[0].matches_fields(fields_hash):
+                self._hits += 1
+                self._leagues.move_to_end(league_id)
+                return stored[0]
+            self._misses += 1
+
+        entry = self.season_cache.get(league_id, season, view, fields_hash)
+        if entry is not None:
+            self._store(league_id, season, view, entry)
+        return entry
+
+    def put(self, league_id: int, season: int, view: str, payload,
+            etag: str = None, last_modified: str = None, fields_hash: str = None) -> CacheEntry:
+        entry = self.season_cache.put(
+            league_id, season, view, payload, etag, last_modified, fields_hash)
+        self._store(league_id, season, view, entry)
+        return entry
+
+    def touch(self, league_id: int, season: int, view: str, entry: CacheEntry) -> CacheEntry:
+        entry = self.season_cache.touch(league_id, season, view, entry)
+        self._store(league_id, season, view, entry)
+        return entry
+
+    def get_seasons(self, league_id: int, view: str) -> list:
+        return self.season_cache.get_seasons(league_id, view)
+
+    def is_fresh(self, entry: CacheEntry, is_active_season: bool,
+                 season_end: float = None) -> bool:
+        return self.season_cache.is_fresh(entry, is_active_season, season_end)
+
+    def clear(self, league_id: int = None, season: int = None):
+        """ Removes entries from memory and disk: every league's if league_id is None,
+            otherwise one league's, or only one season of it if season is given.
+        """
+        with self._lock:
+            if league_id is None:
+                self._leagues.clear()
+                self._size = 0
+            elif league_id in self._leagues:
+                league = self._leagues[league_id]
+                for key in [key for key in league if season is None or key[0] == season]:
+                    self._size -= league.pop(key)[1]
+                if len(league) == 0:
+                    del self._leagues[league_id]
+        self.season_cache.clear(league_id, season)
+
+    def get_stats(self) -> dict:
+        """ Hits and misses of get, leagues evicted, and what is held in memory now. """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'leagues': len(self._leagues),
+                'entries': sum(len(league) for league in self._leagues.values()),
+                'size': self._size,
+                'memory_budget': self.memory_budget
+            }
+
+    def get_league_size(self, league_id: int) -> int:
+        with self._lock:
+            return sum(size for _, size in self._leagues.get(league_id, dict()).values())
+
+    def _store(self, league_id: int, season: int, view: str, entry: CacheEntry):
+        size = get_payload_size(entry.payload) #Measured outside the lock
+        with self._lock:
+            league = self._leagues.setdefault(league_id, dict())
+            previous = league.get((season, view))
+            if previous is not None:
+                self._size -= previous[1]
+            league[(season, view)] = (entry, size)
+            self._size += size
+            self._leagues.move_to_end(league_id)
+            self._evict()
+
+    def _evict(self):
+        """ Drops least recently used leagues until the rest fit, never the newest. """
+        while self._size > self.memory_budget and len(self._leagues) > 1:
+            _, league = self._leagues.popitem(last=False)
+            self._size -= sum(size for _, size in league.values())
+            self._evictions += 1
+
+def get_payload_size(payload) -> int:
+    """ Approximate bytes held by a parsed JSON payload: every dict, list, key and value. """
+    size = 0
+    pending = [payload]
+    while len(pending) > 0:
+        value = pending.pop()
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+        elif isinstance(value, list):
+            pending.extend(value)
+    return size
+
+_default_league_cache = None
+_default_league_cache_lock = threading.Lock()
+
+def get_default_league_cache() -> LeagueCache:
+    """ Returns the cache shared by the whole process, in front of the default SeasonCache. """
+    global _default_league_cache
+    with _default_league_cache_lock:
+        if _default_league_cache is None:
+            _default_league_cache = LeagueCache()
+        return _default_league_cache
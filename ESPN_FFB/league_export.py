@@ -0,0 +1,198 @@
+""" Streams normalized league history to CSV, Parquet or Arrow IPC files.
+
+    python -m ESPN_FFB.league_export DIRECTORY LEAGUE_ID:FIRST_YEAR [...] [-f FORMAT]
+
+Three tables are exported per league:
+    team_seasons  one row per team per season, with a column per STATS_IDS stat
+    matchups      one row per finished game, with the MATCHUP_DTYPE columns
+    teams         the team map, one (season, team_id, team) row per team per season
+
+Every season of every table is its own file, DIRECTORY/LEAGUE_ID/TABLE/SEASON.EXTENSION,
+so a season's rows are built, written and dropped before the next season is read. A
+later export only writes seasons that have no files yet, plus the active season, which
+can still change. Most tools read a directory of files as one table, e.g.
+pyarrow.dataset.dataset(path) or DuckDB's read_csv('matchups/*.csv').
+"""
+import argparse
+import csv
+import os
+import sys
+import numpy as np
+try:
+    import pyarrow #Optional: only the parquet and arrow formats need it
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import STATS_IDS
+from ESPN_FFB.league_info import LeagueInfo, _format_all_teams_single_season, _format_team_names
+from ESPN_FFB.league_registry import parse_league_argument
+from ESPN_FFB.matchup_info import MATCHUP_DTYPE, _format_season_games
+from ESPN_FFB.season_cache import SeasonCache
+from ESPN_FFB.url_info import _is_active_season
+
+EXPORT_FORMATS = { #format : file extension
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+EXPORT_TABLES = ('team_seasons', 'matchups', 'teams')
+RECORD_STAT_COUNT = 3 #wins, losses and ties are whole numbers
+
+class ExportError(Exception):
+    pass
+
+def export_league(league_info: LeagueInfo, directory: str, export_format: str = 'csv',
+                  overwrite: bool = False) -> list:
+    """ Exports a loaded league, including one restored from a snapshot.
+        Returns the paths written.
+    """
+    def get_tables(season: int) -> dict:
+        index = season_indexes[season]
+        team_ids = league_info.get_season_team_ids(season)
+        rows = [team_rows[team_id] for team_id in team_ids]
+        games = np.zeros(0, dtype=MATCHUP_DTYPE)
+        if league_info.matchup_table is not None:
+            games = league_info.matchup_table.get_season_range(season, season).games
+        return get_season_tables(
+            season, team_ids, league_info.get_season_stats()[rows, index],
+            league_info.get_season_team_names(season), games)
+
+    seasons = league_info.get_seasons()
+    season_indexes = {season: index for index, season in enumerate(seasons)}
+    team_rows = {team_id: row for row, team_id in enumerate(league_info.get_team_ids())}
+    return _export_seasons(
+        league_info.league_id, seasons, get_tables, directory, export_format, overwrite)
+
+def export_cached_league(league_id: int, first_year: int, directory: str,
+                         export_format: str = 'csv', season_cache: SeasonCache = None,
+                         overwrite: bool = False) -> list:
+    """ Exports a league straight from the season cache, reading one season's responses
+        at a time; nothing is fetched. Returns the paths written. Raises ExportError if a
+        season's mTeam entry can't be read.
+    """
+    season_cache = season_cache if season_cache is not None else SeasonCache()
+
+    def get_tables(season: int) -> dict:
+        team_entry = season_cache.get(league_id, season, "mTeam")
+        if team_entry is None or team_entry.payload is None:
+            raise ExportError(
+                f'League {league_id} season {season} has an unreadable mTeam cache entry')
+        team_response = team_entry.payload
+        matchup_entry = season_cache.get(league_id, season, "mMatchup")
+        team_ids, team_stats = _format_all_teams_single_season(team_response)
+        games = np.zeros(0, dtype=MATCHUP_DTYPE)
+        if matchup_entry is not None:
+            games = _format_season_games(matchup_entry.payload)
+        return get_season_tables(
+            season, team_ids, team_stats, _format_team_names(team_response), games)
+
+    seasons = [
+        season for season in season_cache.get_seasons(league_id, "mTeam")
+        if season >= first_year]
+    return _export_seasons(league_id, seasons, get_tables, directory, export_format, overwrite)
+
+def get_season_tables(season: int, team_ids: list, team_stats: np.ndarray,
+                      team_names: dict, games: np.ndarray) -> dict:
+    """ Returns {table: {column: values}} for one season. team_stats is teams x STATS_IDS,
+        in team_ids order, and games are MATCHUP_DTYPE rows.
+    """
+    team_stats = np.asarray(team_stats, dtype=float).reshape(len(team_ids), len(STATS_IDS))
+    season_column = np.full(len(team_ids), season, dtype=MATCHUP_DTYPE['season'])
+    team_id_column = np.asarray(team_ids, dtype=MATCHUP_DTYPE['home_id'])
+    names = [team_names.get(team_id, f'Team {team_id}') for team_id in team_ids]
+
+    team_seasons = {'season': season_column, 'team_id': team_id_column, 'team': names}
+    for stat in STATS_IDS:
+        values = team_stats[:, stat]
+        team_seasons[STATS_IDS.get(stat)] = np.rint(values).astype(np.int64) \
+            if stat < RECORD_STAT_COUNT else np.round(values, 2)
+
+    matchups = dict()
+    for name in MATCHUP_DTYPE.names:
+        values = games[name]
+        #float32 points are widened with their float32 noise rounded away
+        matchups[name] = np.round(values.astype(np.float64), 2) \
+            if values.dtype.kind == 'f' else values
+
+    return {
+        'team_seasons': team_seasons,
+        'matchups': matchups,
+        'teams': {'season': season_column, 'team_id': team_id_column, 'team': names}}
+
+def get_table_path(directory: str, league_id: int, table: str, season: int,
+                   export_format: str) -> str:
+    return os.path.join(
+        directory, str(league_id), table, f'{season}{EXPORT_FORMATS.get(export_format)}')
+
+def _export_seasons(league_id: int, seasons: list, get_tables, directory: str,
+                    export_format: str, overwrite: bool) -> list:
+    _check_format(export_format)
+    written_paths = list()
+    with instrumentation.span(
+            'export', 'stage', league_id=league_id, format=export_format) as attributes:
+        for season in seasons:
+            paths = {
+                table: get_table_path(directory, league_id, table, season, export_format)
+                for table in EXPORT_TABLES}
+            if overwrite is False and _is_active_season(season) is False and \
+                    all(os.path.exists(path) for path in paths.values()):
+                continue
+            for table, columns in get_tables(season).items():
+                _write_table(paths[table], columns, export_format)
+                written_paths.append(paths[table])
+        attributes['files'] = len(written_paths)
+    return written_paths
+
+def _check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f'Unknown export format "{export_format}"')
+    if export_format != 'csv' and pyarrow is None:
+        raise ExportError(f'Exporting to {export_format} needs pyarrow installed')
+
+def _write_table(path: str, columns: dict, export_format: str):
+    """ Writes one table file, replacing it atomically. """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    if export_format == 'csv':
+        with open(temporary_path, 'w', newline='') as table_file:
+            writer = csv.writer(table_file)
+            writer.writerow(columns)
+            writer.writerows(zip(*(_to_list(values) for values in columns.values())))
+    else:
+        table = pyarrow.table(columns)
+        if export_format == 'parquet':
+            pyarrow.parquet.write_table(table, temporary_path)
+        else:
+            with pyarrow.ipc.new_file(temporary_path, table.schema) as writer:
+                writer.write_table(table)
+    os.replace(temporary_path, path)
+
+def _to_list(values) -> list:
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument(
+        'leagues', nargs='+', type=parse_league_argument, metavar='LEAGUE_ID:FIRST_YEAR')
+    parser.add_argument(
+        '-f', '--format', dest='export_format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument(
+        '--overwrite', action='store_true', help='Rewrite seasons that were already exported.')
+    parsed = parser.parse_args(arguments)
+
+    try:
+        for league_id, first_year in parsed.leagues:
+            written_paths = export_cached_league(
+                league_id, first_year, parsed.directory, parsed.export_format,
+                overwrite=parsed.overwrite)
+            print(f'League {league_id}: wrote {len(written_paths)} files')
+    except ExportError as error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+from functools import partial
+from ESPN_FFB.espn_fetcher import SeasonRequest
+from ESPN_FFB.fetch_planner import FetchPlanner, apply_responses, get_missing_views
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.payload_projection import get_fields_hash, parse_fields
+from ESPN_FFB.player_store import BOX_SCORE_FIELDS, PlayerStore
+from ESPN_FFB.url_info import URLInfo, _get_season_end, _is_active_season
+
+def load_league_history(league_info: LeagueInfo, progress_callback=None,
+                        cancel_event=None) -> bool:
+    """ Fetches every season of every registered view into league_info, unless it is
+        already loaded. Views are fetched together, one request per season, so the
+        first chart of any kind also loads what every other chart needs.
+    """
+    views = get_missing_views(league_info)
+    if len(views) > 0:
+        fetch_planner = FetchPlanner(league_info, views)
+        responses, success = fetch_planner.get_formatted_espn_data(
+            progress_callback, cancel_event)
+        if success is False:
+            return False
+        apply_responses(league_info, responses)
+    return True
+
+def load_schedule_history(league_info: LeagueInfo, progress_callback=None,
+                          cancel_event=None) -> bool:
+    """ For charts drawn from schedules. Team names come from mTeam, so both views
+        are needed.
+    """
+    return load_league_history(league_info, progress_callback, cancel_event)
+
+def load_player_history(league_info: LeagueInfo, player_store: PlayerStore,
+                        url_info: URLInfo = None, progress_callback=None,
+                        cancel_event=None) -> bool:
+    """ Ingests every week's box score of every season into player_store. Weeks come from
+        the schedule, so league history is loaded first. Each season's weeks are fetched
+        together and ingested as they are parsed, so only one season of box scores is
+        ever held at once. Weeks the store already has are skipped, except in the active
+        season, and even there a week is only ingested again if its box score changed.
+        url_info supplies URLs, cookies, the season cache and the fetcher.
+    """
+    if load_schedule_history(league_info, cancel_event=cancel_event) is False:
+        return False
+    url_info = url_info if url_info is not None else URLInfo("mBoxscore", league_info)
+    stored_weeks = set(player_store.get_weeks())
+    season_weeks = _get_season_weeks(league_info)
+    total = sum(len(weeks) for weeks in season_weeks.values())
+    completed = 0
+
+    success = True
+    for index, season in enumerate(url_info.seasons):
+        weeks = [
+            week for week in season_weeks.get(season, list())
+            if (season, week) not in stored_weeks or _is_active_season(season)]
+        completed += len(season_weeks.get(season, list())) - len(weeks)
+        payloads = _get_box_scores(url_info, index, weeks, cancel_event)
+        for week, (payload, is_changed) in zip(weeks, payloads):
+            if payload is None:
+                success = False
+            elif is_changed or (season, week) not in stored_weeks:
+                player_store.ingest_box_score(payload, season, week)
+            completed += 1
+        if progress_callback is not None:
+            progress_callback(completed, total)
+    return success
+
+def _get_box_scores(url_info: URLInfo, index: int, weeks: list, cancel_event=None):
+    """ Yields (parsed box score, changed) per week, or (None, False) for weeks that
+        couldn't be fetched, serving any week the season cache has. changed is False when
+        the box score is the one already in the season cache.
+    """
+    season = url_info.seasons[index]
+    url = url_info.urls[index]
+    views = [f'mBoxscore_{week}' for week in weeks] #Season cache key per week
+    fields_hash = get_fields_hash(BOX_SCORE_FIELDS)
+    cached_entries = [
+        url_info.season_cache.get(url_info.league_id, season, view, fields_hash)
+        for view in views]
+    pending_weeks = [
+        week for week, entry in zip(weeks, cached_entries)
+        if url_info.season_cache.is_fresh(
+            entry, _is_active_season(season), _get_season_end(season)) is False]
+
+    fetch_results = dict()
+    if len(pending_weeks) > 0:
+        season_requests = [
+            SeasonRequest(
+                season, url,
+                params={"view": "mBoxscore", "scoringPeriodId": week},
+                cookies={"SWID": url_info.swid, "espn_s2": url_info.espn_s2},
+                parser=partial(
+                    parse_fields, fields=BOX_SCORE_FIELDS, is_list='leagueHistory' in url))
+            for week in pending_weeks]
+        fetch_results = dict(zip(
+            pending_weeks, url_info.fetcher.fetch(season_requests, cancel_event=cancel_event)))
+
+    for week, view, entry in zip(weeks, views, cached_entries):
+        fetch_result = fetch_results.get(week)
+        if fetch_result is None:
+            yield entry.payload, False
+        elif fetch_result.success and fetch_result.response.status_code == 200:
+            url_info.season_cache.put(
+                url_info.league_id, season, view, fetch_result.payload, fields_hash=fields_hash)
+            yield fetch_result.payload, entry is None or entry.payload != fetch_result.payload
+        else:
+            yield None, False
+
+def _get_season_weeks(league_info: LeagueInfo) -> dict:
+    """ {season: every week with a finished game}, from the schedule. """
+    games = league_info.matchup_table.games
+    return {
+        season: sorted(set(games['week'][games['season'] == season].tolist()))
+        for season in league_info.matchup_table.get_seasons()}
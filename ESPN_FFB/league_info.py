@@ -1,105 +1,330 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from functools import wraps
+import threading
 import numpy as np
-from ESPN_FFB.constants import ESPN_ID_TO_TEAM, STATS_IDS
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import DEFAULT_FIRST_YEAR, DEFAULT_LEAGUE_ID, STATS_IDS
 from ESPN_FFB.figure_options import (is_all_time_point_figure, is_all_time_record_figure,
                                      is_adjusted_figure_option)
+from ESPN_FFB.payload_projection import register_view_fields
+
+RECORD_STATS = slice(0, 3) #wins, losses, ties
+POINT_STATS = slice(3, 5) #pointsFor, pointsAgainst
+
+register_view_fields("mTeam", [
+    'seasonId',
+    'members[].id', 'members[].firstName', 'members[].lastName',
+    'teams[].id', 'teams[].primaryOwner', 'teams[].location', 'teams[].nickname'
+] + [f'teams[].record.overall.{STATS_IDS.get(stat)}' for stat in STATS_IDS])
+
+def _synchronized(method):
+    """ Runs the method holding the instance's lock. """
+    @wraps(method)
+    def synchronized(self, *arguments, **keyword_arguments):
+        with self.lock:
+            return method(self, *arguments, **keyword_arguments)
+    return synchronized
 
 class LeagueInfo:
+    """ Every method is safe to call from any thread, and a season is always applied as a
+        whole. Hold lock to read several things that must come from the same refresh,
+        e.g. figure heights and team names for one chart. Writers replace
+        cached_responses and matchup_table rather than changing them in place, so a
+        reference taken earlier stays a consistent snapshot.
+    """
 
-    def __init__(self, league_id: int = 368182, first_year: int = 2014):
+    def __init__(self, league_id: int = DEFAULT_LEAGUE_ID, first_year: int = DEFAULT_FIRST_YEAR):
+        self.lock = threading.RLock()
+        self._reset_aggregates()
         self.cached_responses = list()
+        self.matchup_table = None
         self.league_id = league_id
         self.first_year = first_year
 
+    @property
+    def cached_responses(self) -> list:
+        return self._cached_responses
+
+    @cached_responses.setter
+    @_synchronized
+    def cached_responses(self, responses: list):
+        """ Only seasons that were added, replaced or dropped touch the running totals. """
+        self._cached_responses = responses
+        latest_responses = {
+            _get_season_id(response, index): response
+            for index, response in enumerate(responses)}
+
+        with instrumentation.span('aggregate', 'aggregate', seasons=len(responses)):
+            for season in list(self._season_responses):
+                if season not in latest_responses:
+                    self._remove_season(season)
+            for season, response in latest_responses.items():
+                if self._season_responses.get(season) is not response:
+                    self._apply_season(season, response)
+
+    @_synchronized
     def set_league(self, league_id: int, first_year: int):
+        self._reset_aggregates()
         self.cached_responses = list()
+        self.matchup_table = None
         self.league_id = league_id
         self.first_year = first_year
 
+    @_synchronized
     def clear_cache(self):
-        self.cached_responses.clear()
+        self._reset_aggregates()
+        self.cached_responses = list()
+        self.matchup_table = None
 
+    @_synchronized
     def is_cache_empty(self):
-        return len(self.cached_responses) == 0
+        return len(self._season_contributions) == 0
+
+    @_synchronized
+    def update_season(self, response: dict) -> bool:
+        """ Adds or replaces a single season's response.
+            Returns True if the all time totals changed.
+        """
+        season = _get_season_id(response, len(self._cached_responses))
+        responses = list(self._cached_responses) #Readers may still hold the old list
+        for index, cached_response in enumerate(responses):
+            if _get_season_id(cached_response, index) == season:
+                responses[index] = response
+                break
+        else:
+            responses.append(response)
+        self._cached_responses = responses
+        with instrumentation.span('aggregate', 'aggregate', season=season):
+            return self._apply_season(season, response)
+
+    @_synchronized
+    def get_figure_heights(self, figure_option, first_season: int = None,
+                           last_season: int = None) -> list:
+        """ Returns one list of bar heights per team, in team id order.
+            first_season and last_season limit the totals to an inclusive range of seasons.
+        """
+        with instrumentation.span('figure_heights', 'aggregate', figure_option=figure_option):
+            all_time_stats = self._get_all_time_stats(first_season, last_season)
+            figure_heights = all_time_stats[:, _get_relevant_slice(figure_option)]
+
+            if is_adjusted_figure_option(figure_option):
+                figure_heights = _adjust_per_game(figure_heights, all_time_stats, figure_option)
+            return figure_heights.tolist()
+
+    @_synchronized
+    def get_team_ids(self) -> list:
+        return list(self._team_ids)
+
+    @_synchronized
+    def get_team_names(self) -> dict:
+        """ Returns {team id: name} from the mTeam responses. Owners' first names are
+            preferred and the newest season wins when a team changes hands.
+        """
+        team_names = dict()
+        for season in self.get_seasons():
+            team_names.update(self._season_team_names[season])
+        return {team_id: team_names.get(team_id, f'Team {team_id}') for team_id in self._team_ids}
 
-    def get_figure_heights(self, figure_option) -> list:
-        all_team_stats = self._format_response_as_dict()
+    @_synchronized
+    def get_team_count(self) -> int:
+        return len(self._team_ids)
 
-        figure_heights = _strip_irrelevant_figure_heights(figure_option, all_team_stats)
+    @_synchronized
+    def get_seasons(self) -> list:
+        return sorted(self._season_contributions)
 
-        figure_heights = self._adjust_per_game_if_necessary(
-            figure_heights, all_team_stats, figure_option)
-        return figure_heights
+    @_synchronized
+    def get_season_team_ids(self, season: int) -> list:
+        """ The teams that played in a season, in the order ESPN listed them. """
+        return list(self._season_team_ids.get(season, list()))
 
-    def _format_response_as_dict(self) -> dict:
-        formatted_response = dict()
+    @_synchronized
+    def get_season_team_names(self, season: int) -> dict:
+        return dict(self._season_team_names.get(season, dict()))
 
-        for request in self.cached_responses:
-            formatted_response = _format_all_teams_single_season(request, formatted_response)
+    @_synchronized
+    def restore_seasons(self, seasons: list, team_ids: list, season_stats: np.ndarray,
+                        season_team_ids: dict, season_team_names: dict):
+        """ Loads seasons that were already aggregated, e.g. from a snapshot, without
+            their responses. season_stats is laid out like get_season_stats() for the
+            given team_ids and ascending seasons, and may be a read-only memory map.
+            A later refresh replaces restored seasons like any other.
+        """
+        self._reset_aggregates()
+        self._cached_responses = list()
+        self._team_ids = list(team_ids)
+        self._team_indexes = {team_id: index for index, team_id in enumerate(self._team_ids)}
+        for index, season in enumerate(seasons):
+            self._season_responses[season] = None
+            self._season_team_ids[season] = list(season_team_ids[season])
+            self._season_team_names[season] = dict(season_team_names[season])
+            self._season_contributions[season] = season_stats[:, index]
+        self._all_time_totals = season_stats.sum(axis=1)
+        self._season_stats = season_stats
 
-        formatted_response = _round_formatted_response(formatted_response)
-        return formatted_response
+    def _get_all_time_stats(self, first_season: int = None,
+                            last_season: int = None) -> np.ndarray:
+        """ Teams x stats totals, rounded to whole numbers like ESPN displays them. """
+        if first_season is None and last_season is None:
+            totals = self._all_time_totals
+        else:
+            totals = self._get_season_range_totals(first_season, last_season)
+        return np.rint(totals).astype(np.int64)
 
-    def _adjust_per_game_if_necessary(self, figure_heights: list, all_team_stats: dict, figure_option: int):
-        if is_adjusted_figure_option(figure_option) is False:
-            return figure_heights
+    def _get_season_range_totals(self, first_season: int = None,
+                                 last_season: int = None) -> np.ndarray:
+        """ Teams x stats totals of an inclusive range of seasons, as the difference of
+            two prefix sums. Costs O(teams) however many seasons the range spans.
+        """
+        prefix_sums = self._get_season_prefix_sums()
+        seasons = self.get_seasons()
+        start = 0 if first_season is None else bisect_left(seasons, first_season)
+        end = len(seasons) if last_season is None else bisect_right(seasons, last_season)
+        if end <= start:
+            return np.zeros(self._all_time_totals.shape)
+        return prefix_sums[:, end] - prefix_sums[:, start]
 
-        for team in ESPN_ID_TO_TEAM:
-            games_played = self._all_time_total_games_played(team, all_team_stats)
-            figure_heights[team - 1] = self._adjust_per_game(team, figure_heights, games_played)
-        return figure_heights
+    def _get_season_prefix_sums(self) -> np.ndarray:
+        """ Teams x (seasons + 1) x STATS_IDS running totals. Column i holds the totals of
+            the first i seasons in ascending order, so column 0 is all zeros.
+        """
+        if self._season_prefix_sums is None:
+            season_stats = self.get_season_stats()
+            prefix_sums = np.zeros(
+                (season_stats.shape[0], season_stats.shape[1] + 1, len(STATS_IDS)))
+            np.cumsum(season_stats, axis=1, out=prefix_sums[:, 1:])
+            self._season_prefix_sums = prefix_sums
+        return self._season_prefix_sums
 
-    def _all_time_total_games_played(self, team: int, all_team_stats: dict):
-        return sum(all_team_stats.get(team)[:3])
+    @_synchronized
+    def get_season_stats(self) -> np.ndarray:
+        """ Dense teams x seasons x STATS_IDS array, seasons in ascending order. """
+        if self._season_stats is None:
+            contributions = [self._season_contributions[season] for season in self.get_seasons()]
+            if len(contributions) == 0:
+                self._season_stats = np.zeros((len(self._team_ids), 0, len(STATS_IDS)))
+            else:
+                self._season_stats = np.stack(contributions, axis=1)
+        return self._season_stats
 
-    def _adjust_per_game(self, team: int, figure_heights: list, games_played: int) -> list:
-        team_stats = figure_heights[team - 1]
+    def _reset_aggregates(self):
+        self._team_ids = list()
+        self._team_indexes = dict()
+        self._season_responses = dict()
+        self._season_team_ids = dict()
+        self._season_team_names = dict()
+        self._season_contributions = dict()
+        self._all_time_totals = np.zeros((0, len(STATS_IDS)))
+        self._invalidate_season_index()
 
-        for stat in range(len(team_stats)):
-            team_stat_value = team_stats[stat] / games_played
-            team_stat_value = convert_to_percent_if_record_stats(team_stats, team_stat_value)
+    def _apply_season(self, season: int, response: dict) -> bool:
+        """ Swaps a season's old contribution to the running totals for its new one. """
+        self._season_responses[season] = response
+        team_ids, team_stats = _format_all_teams_single_season(response)
+        self._season_team_ids[season] = team_ids
+        self._season_team_names[season] = _format_team_names(response)
+        self._set_teams(set(team_ids).union(self._team_ids))
 
-            team_stats[stat] = round(team_stat_value, 1)
-        return team_stats
+        contribution = np.zeros(self._all_time_totals.shape)
+        contribution[[self._team_indexes[team_id] for team_id in team_ids]] = team_stats
 
-def _format_all_teams_single_season(request: dict, formatted_response: dict) -> dict:
-    for team in request['teams']:
-        formatted_response = _format_team_single_season(formatted_response, team)
-    return formatted_response
+        previous_contribution = self._season_contributions.get(season)
+        if previous_contribution is not None:
+            if np.array_equal(previous_contribution, contribution):
+                return False
+            self._all_time_totals -= previous_contribution
 
-def _format_team_single_season(formatted_response: dict, team: dict) -> dict:
-    running_record = formatted_response.get(team['id'], [0] * len(STATS_IDS))
-    new_record_addition = [0] * len(STATS_IDS)
+        self._all_time_totals += contribution
+        self._season_contributions[season] = contribution
+        self._invalidate_season_index()
+        return True
 
-    for stat in STATS_IDS:
-        stat_this_season = team['record']['overall'][str(STATS_IDS.get(stat))]
-        new_record_addition[stat] = stat_this_season
+    def _remove_season(self, season: int):
+        self._season_responses.pop(season)
+        self._season_team_ids.pop(season)
+        self._season_team_names.pop(season)
+        self._all_time_totals -= self._season_contributions.pop(season)
+        self._invalidate_season_index()
+        self._set_teams(set().union(*self._season_team_ids.values()))
 
-    running_record = np.add(running_record, new_record_addition)
-    formatted_response.update({team['id']: running_record.tolist()})
-    return formatted_response
+    def _invalidate_season_index(self):
+        """ Drops the per-season arrays; they are rebuilt on the next range query. """
+        self._season_stats = None
+        self._season_prefix_sums = None
 
-def _round_formatted_response(formatted_response: dict) -> dict:
-    for team in formatted_response:
-        formatted_response.update({team: [round(x) for x in formatted_response.get(team)]})
-    return formatted_response
+    def _set_teams(self, team_ids: set):
+        """ Resizes every per-team array when seasons add or drop team ids. """
+        if team_ids == set(self._team_indexes):
+            return
 
-def _strip_irrelevant_figure_heights(figure_option: int, all_team_stats: dict) -> list:
-    figure_heights = list()
+        kept_team_ids = [team_id for team_id in self._team_ids if team_id in team_ids]
+        old_rows = [self._team_indexes[team_id] for team_id in kept_team_ids]
+        self._team_ids = sorted(team_ids)
+        self._team_indexes = {team_id: index for index, team_id in enumerate(self._team_ids)}
+        new_rows = [self._team_indexes[team_id] for team_id in kept_team_ids]
 
-    relevant_slice = _get_relevant_slice(figure_option)
-    for team in ESPN_ID_TO_TEAM:
-        figure_heights.insert(team, all_team_stats.get(team)[
-            relevant_slice[0]:relevant_slice[1]])
-    return figure_heights
+        def resize(old_array: np.ndarray) -> np.ndarray:
+            new_array = np.zeros((len(self._team_ids), len(STATS_IDS)))
+            new_array[new_rows] = old_array[old_rows]
+            return new_array
+
+        self._invalidate_season_index()
+        self._all_time_totals = resize(self._all_time_totals)
+        for season in self._season_contributions:
+            self._season_contributions[season] = resize(self._season_contributions[season])
+
+def _get_season_id(response: dict, default: int) -> int:
+    return response.get('seasonId', default)
+
+def _format_all_teams_single_season(response: dict):
+    team_ids = [team['id'] for team in response['teams']]
+    team_stats = np.array(
+        [_format_team_single_season(team) for team in response['teams']],
+        dtype=float).reshape(len(team_ids), len(STATS_IDS))
+    return team_ids, team_stats
+
+def _format_team_names(response: dict) -> dict:
+    owners = {member['id']: member for member in response.get('members', list())}
+    first_names = dict()
+    for team in response['teams']:
+        owner = owners.get(team.get('primaryOwner'), dict())
+        first_names[team['id']] = (_capitalize(owner.get('firstName', '')),
+                                   _capitalize(owner.get('lastName', '')))
+
+    name_counts = Counter(first_name for first_name, _ in first_names.values())
+    team_names = dict()
+    for team in response['teams']:
+        first_name, last_name = first_names.get(team['id'])
+        if name_counts.get(first_name) > 1 and last_name:
+            first_name = f'{first_name} {last_name[0]}.'
+        if not first_name:
+            first_name = f"{team.get('location', '')} {team.get('nickname', '')}".strip()
+        team_names[team['id']] = first_name or f"Team {team['id']}"
+    return team_names
+
+def _capitalize(name: str) -> str:
+    name = name.strip()
+    return name[:1].upper() + name[1:]
+
+def _format_team_single_season(team: dict) -> list:
+    overall_record = team['record']['overall']
+    return [overall_record[STATS_IDS.get(stat)] for stat in STATS_IDS]
+
+def _adjust_per_game(figure_heights: np.ndarray, all_time_stats: np.ndarray,
+                     figure_option: int) -> np.ndarray:
+    games_played = all_time_stats[:, RECORD_STATS].sum(axis=1, keepdims=True)
+    adjusted_heights = np.divide(
+        figure_heights, games_played,
+        out=np.zeros(figure_heights.shape), where=games_played > 0)
 
-def _get_relevant_slice(figure_option: int):
     if is_all_time_record_figure(figure_option):
-        relevant_slice = [0, 3]
-    elif is_all_time_point_figure(figure_option):
-        relevant_slice = [3, 5]
-    return relevant_slice
+        adjusted_heights *= 100
+    return np.round(adjusted_heights, 1)
 
-def convert_to_percent_if_record_stats(team_stats: list, team_stat_value: float):
-    if len(team_stats) == 3:
-        team_stat_value *= 100
-    return team_stat_value
+def _get_relevant_slice(figure_option: int) -> slice:
+    if is_all_time_record_figure(figure_option):
+        return RECORD_STATS
+    elif is_all_time_point_figure(figure_option):
+        return POINT_STATS
+    raise ValueError(f'Figure option {figure_option} has no all time stats.')
@@ -0,0 +1,92 @@
+import argparse
+from ESPN_FFB.constants import DEFAULT_FIRST_YEAR
+from ESPN_FFB.espn_fetcher import ESPNFetcher, get_default_fetcher
+from ESPN_FFB.fetch_planner import FetchPlanner, apply_responses
+from ESPN_FFB.league_cache import get_default_league_cache
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.season_cache import SeasonCache
+
+class LeagueRegistry:
+    """ Holds a LeagueInfo per league and refreshes any number of them in one sweep.
+        Every league's missing seasons go to the fetcher together, so ten leagues cost
+        one round of concurrent requests rather than ten back to back.
+    """
+
+    def __init__(self, season_cache: SeasonCache = None, fetcher: ESPNFetcher = None,
+                 api_host: str = None, cookies: list = None):
+        """ api_host and cookies are passed on to URLInfo. """
+        self.season_cache = season_cache if season_cache is not None \
+            else get_default_league_cache()
+        self.fetcher = fetcher if fetcher is not None else get_default_fetcher()
+        self.api_host = api_host
+        self.cookies = cookies
+        self.leagues = dict()
+
+    def register(self, league_id: int, first_year: int = DEFAULT_FIRST_YEAR) -> LeagueInfo:
+        """ Returns the league's LeagueInfo, creating it if the league is new. """
+        league_info = self.leagues.get(league_id)
+        if league_info is None:
+            league_info = LeagueInfo(league_id, first_year)
+            self.leagues[league_id] = league_info
+        elif league_info.first_year != first_year:
+            league_info.set_league(league_id, first_year)
+        return league_info
+
+    def unregister(self, league_id: int):
+        self.leagues.pop(league_id, None)
+
+    def get(self, league_id: int) -> LeagueInfo:
+        return self.leagues.get(league_id)
+
+    def get_league_ids(self) -> list:
+        return list(self.leagues)
+
+    def refresh(self, league_ids: list = None, views: list = None) -> dict:
+        """ Brings the given leagues (every league if None) up to date in the given views
+            (every registered view if None), with one request per season that is missing any.
+            Returns {league_id: True if every season was retrieved}.
+        """
+        if league_ids is None:
+            league_ids = self.get_league_ids()
+
+        fetch_planners = {
+            league_id: FetchPlanner(
+                self.leagues[league_id], views, self.season_cache, self.fetcher,
+                self.api_host, self.cookies)
+            for league_id in league_ids}
+        pending_requests = {
+            league_id: fetch_planner.get_pending_requests()
+            for league_id, fetch_planner in fetch_planners.items()}
+
+        all_requests = [
+            season_request for league_requests in pending_requests.values()
+            for season_request in league_requests]
+
+        try:
+            fetch_results = self.fetcher.fetch(all_requests) if len(all_requests) > 0 else list()
+            offset = 0
+            for league_id, fetch_planner in fetch_planners.items():
+                request_count = len(pending_requests[league_id])
+                fetch_planner.store_responses(fetch_results[offset:offset + request_count])
+                offset += request_count
+        finally:
+            for fetch_planner in fetch_planners.values():
+                fetch_planner.release()
+
+        #Only once every claim here is released, or two refreshes could wait on each other
+        refreshed = dict()
+        for league_id, fetch_planner in fetch_planners.items():
+            responses, success = fetch_planner.wait_for_shared()
+            if success:
+                apply_responses(self.leagues[league_id], responses)
+            refreshed[league_id] = success
+        return refreshed
+
+def parse_league_argument(argument: str) -> tuple:
+    """ Parses a "LEAGUE_ID:FIRST_YEAR" command line argument. """
+    try:
+        league_id, first_year = argument.split(':')
+        return int(league_id), int(first_year)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'Expected LEAGUE_ID:FIRST_YEAR, got "{argument}"')
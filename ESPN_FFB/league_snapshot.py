@@ -0,0 +1,298 @@
+""" Versioned binary snapshots of normalized league history.
+
+    python -m ESPN_FFB.league_snapshot build SNAPSHOT LEAGUE_ID:FIRST_YEAR [...]
+    python -m ESPN_FFB.league_snapshot verify SNAPSHOT
+
+A snapshot holds any number of leagues. Each league is stored as typed columns (team
+stats per season, which teams played each season, and every finished game) plus its
+team-name map. Opening a snapshot reads only the small JSON header; columns are memory
+mapped, so only the pages a caller touches are read from disk.
+
+Layout, little-endian:
+    8 bytes   SNAPSHOT_MAGIC
+    uint32    format version
+    uint32    header length in bytes
+    header    UTF-8 JSON describing every league and where its columns are
+    columns   raw array data, each starting on a COLUMN_ALIGNMENT boundary
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import numpy as np
+from numpy.lib.format import descr_to_dtype, dtype_to_descr
+from ESPN_FFB.figure_options import get_all_time_figure_options
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.league_registry import parse_league_argument
+from ESPN_FFB.matchup_info import MATCHUP_DTYPE, MatchupTable
+from ESPN_FFB.season_cache import SeasonCache
+
+SNAPSHOT_MAGIC = b'FFBSNAP\x00'
+SNAPSHOT_VERSION = 2 #2 added remaining_matchups
+PREAMBLE = struct.Struct('<8sII') #magic, version, header length
+COLUMN_ALIGNMENT = 64
+
+class SnapshotError(Exception):
+    pass
+
+class LeagueSnapshot:
+    """ Read-only view of a snapshot file. Use as a context manager, or call close(). """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            try:
+                self._buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: #An empty file can't be mapped
+                raise SnapshotError('File is too short to be a snapshot')
+        is_opened = False
+        try:
+            self.header = _read_header(self._buffer)
+            self._data_offset = _align(PREAMBLE.size + self.header['length'])
+            self.leagues = {league['league_id']: league for league in self.header['leagues']}
+            is_opened = True
+        finally:
+            if is_opened is False:
+                self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """ Arrays handed out keep the mapping alive; it is unmapped once the last is freed. """
+        try:
+            self._buffer.close()
+        except BufferError:
+            pass
+
+    def get_league_ids(self) -> list:
+        return list(self.leagues)
+
+    def get_column(self, league_id: int, name: str) -> np.ndarray:
+        """ Returns a read-only array backed by the file; nothing is read until it is used. """
+        column = self._get_league(league_id)['columns'][name]
+        dtype = descr_to_dtype(_to_descr(column['dtype']))
+        count = int(np.prod(column['shape']))
+        if count == 0:
+            return np.zeros(column['shape'], dtype)
+        return np.frombuffer(
+            self._buffer, dtype, count, self._data_offset + column['offset']
+        ).reshape(column['shape'])
+
+    def load_league(self, league_id: int, league_info: LeagueInfo = None) -> LeagueInfo:
+        """ Restores a league's aggregates, and its matchups if the snapshot has them. """
+        league = self._get_league(league_id)
+        if league_info is None:
+            league_info = LeagueInfo(league_id, league['first_year'])
+        else:
+            league_info.set_league(league_id, league['first_year'])
+
+        seasons = league['seasons']
+        team_ids = league['team_ids']
+        season_team_mask = self.get_column(league_id, 'season_team_mask')
+        season_team_ids = {
+            season: [team_ids[row] for row in np.flatnonzero(season_team_mask[:, index])]
+            for index, season in enumerate(seasons)}
+        season_team_names = {
+            season: {int(team_id): name for team_id, name in names.items()}
+            for season, names in zip(seasons, league['team_names'])}
+        league_info.restore_seasons(
+            seasons, team_ids, self.get_column(league_id, 'season_stats'),
+            season_team_ids, season_team_names)
+
+        if 'matchups' in league['columns']:
+            league_info.matchup_table = MatchupTable(
+                self.get_column(league_id, 'matchups'),
+                self.get_column(league_id, 'remaining_matchups'))
+        return league_info
+
+    def _get_league(self, league_id: int) -> dict:
+        league = self.leagues.get(league_id)
+        if league is None:
+            raise SnapshotError(f'League {league_id} is not in {self.path}')
+        return league
+
+def write_snapshot(path: str, league_infos: list):
+    """ Writes every league to path, replacing it atomically. """
+    leagues = list()
+    columns = list()
+    offset = 0
+    for league_info in league_infos:
+        league, league_columns = _describe_league(league_info)
+        for name, array in league_columns.items():
+            offset = _align(offset)
+            league['columns'][name] = {
+                'dtype': dtype_to_descr(array.dtype), 'shape': list(array.shape),
+                'offset': offset}
+            columns.append((offset, array))
+            offset += array.nbytes
+        leagues.append(league)
+
+    header = json.dumps({'leagues': leagues}).encode()
+    data_offset = _align(PREAMBLE.size + len(header))
+
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        snapshot_file.write(header)
+        for column_offset, array in columns:
+            snapshot_file.seek(data_offset + column_offset)
+            snapshot_file.write(np.ascontiguousarray(array).tobytes())
+        #An empty last column starts past the last byte written, so pad up to its offset
+        snapshot_file.truncate(data_offset + offset)
+    os.replace(temporary_path, path)
+
+def build_snapshot(path: str, leagues: dict, season_cache: SeasonCache = None) -> list:
+    """ Builds a snapshot of {league_id: first_year} from responses already in the season
+        cache; nothing is fetched. Returns the LeagueInfo written for each league.
+    """
+    season_cache = season_cache if season_cache is not None else SeasonCache()
+    league_infos = [
+        load_cached_league(league_id, first_year, season_cache)
+        for league_id, first_year in leagues.items()]
+    write_snapshot(path, league_infos)
+    return league_infos
+
+def load_cached_league(league_id: int, first_year: int,
+                       season_cache: SeasonCache) -> LeagueInfo:
+    """ Aggregates a league from the JSON responses in the season cache. """
+    league_info = LeagueInfo(league_id, first_year)
+    league_info.cached_responses = _get_cached_payloads(
+        league_id, first_year, "mTeam", season_cache)
+    matchup_responses = _get_cached_payloads(league_id, first_year, "mMatchup", season_cache)
+    if len(matchup_responses) > 0:
+        league_info.matchup_table = MatchupTable.from_responses(matchup_responses)
+    return league_info
+
+def verify_snapshot(path: str, season_cache: SeasonCache = None) -> list:
+    """ Compares every league in a snapshot with the same league aggregated from the
+        season cache's JSON. Returns a description of each difference found.
+    """
+    season_cache = season_cache if season_cache is not None else SeasonCache()
+    differences = list()
+    with LeagueSnapshot(path) as snapshot:
+        for league_id in snapshot.get_league_ids():
+            restored = snapshot.load_league(league_id)
+            expected = load_cached_league(league_id, restored.first_year, season_cache)
+            differences.extend(
+                f'League {league_id}: {difference}'
+                for difference in _compare_leagues(restored, expected))
+    return differences
+
+def _describe_league(league_info: LeagueInfo):
+    seasons = league_info.get_seasons()
+    team_ids = league_info.get_team_ids()
+    team_rows = {team_id: row for row, team_id in enumerate(team_ids)}
+    season_team_mask = np.zeros((len(team_ids), len(seasons)), dtype=np.bool_)
+    for index, season in enumerate(seasons):
+        rows = [team_rows[team_id] for team_id in league_info.get_season_team_ids(season)]
+        season_team_mask[rows, index] = True
+
+    league = {
+        'league_id': league_info.league_id,
+        'first_year': league_info.first_year,
+        'seasons': seasons,
+        'team_ids': team_ids,
+        'team_names': [league_info.get_season_team_names(season) for season in seasons],
+        'columns': dict()}
+    columns = {
+        'season_stats': np.asarray(league_info.get_season_stats(), dtype='<f8'),
+        'season_team_mask': season_team_mask}
+    if league_info.matchup_table is not None:
+        columns['matchups'] = league_info.matchup_table.games.astype(MATCHUP_DTYPE)
+        columns['remaining_matchups'] = \
+            league_info.matchup_table.remaining_games.astype(MATCHUP_DTYPE)
+    return league, columns
+
+def _compare_leagues(restored: LeagueInfo, expected: LeagueInfo) -> list:
+    differences = list()
+    if restored.get_seasons() != expected.get_seasons():
+        differences.append(
+            f'seasons {restored.get_seasons()} != {expected.get_seasons()}')
+    if restored.get_team_names() != expected.get_team_names():
+        differences.append('team names differ')
+    for figure_option in get_all_time_figure_options():
+        if restored.get_figure_heights(figure_option) != \
+                expected.get_figure_heights(figure_option):
+            differences.append(f'figure option {figure_option} differs')
+
+    restored_games = _get_games(restored)
+    expected_games = _get_games(expected)
+    if not np.array_equal(restored_games, expected_games):
+        differences.append(
+            f'{len(restored_games)} matchups in the snapshot, {len(expected_games)} cached')
+    return differences
+
+def _get_games(league_info: LeagueInfo) -> np.ndarray:
+    if league_info.matchup_table is None:
+        return np.zeros(0, dtype=MATCHUP_DTYPE)
+    return league_info.matchup_table.games
+
+def _get_cached_payloads(league_id: int, first_year: int, view: str,
+                         season_cache: SeasonCache) -> list:
+    payloads = list()
+    for season in season_cache.get_seasons(league_id, view):
+        entry = season_cache.get(league_id, season, view)
+        if season >= first_year and entry is not None:
+            payloads.append(entry.payload)
+    return payloads
+
+def _read_header(buffer) -> dict:
+    if len(buffer) < PREAMBLE.size:
+        raise SnapshotError('File is too short to be a snapshot')
+    magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError('File is not a league snapshot')
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f'Snapshot version {version} is not supported')
+    try:
+        header = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + header_length])
+        if not isinstance(header, dict) or not isinstance(header.get('leagues'), list) or \
+                not all('league_id' in league for league in header['leagues']):
+            raise ValueError('no list of leagues')
+    except (ValueError, TypeError) as error: #UnicodeDecodeError is a ValueError too
+        raise SnapshotError(f'Snapshot header is corrupt or truncated: {error!r}') from error
+    header['length'] = header_length
+    return header
+
+def _to_descr(descr):
+    """ JSON turns the tuples of a structured dtype's descr into lists. """
+    if isinstance(descr, str):
+        return descr
+    return [tuple(field) for field in descr]
+
+def _align(offset: int) -> int:
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser(
+        'build', help='Write a snapshot from responses in the season cache.')
+    build_parser.add_argument('snapshot')
+    build_parser.add_argument(
+        'leagues', nargs='+', type=parse_league_argument, metavar='LEAGUE_ID:FIRST_YEAR')
+    verify_parser = commands.add_parser(
+        'verify', help='Check a snapshot against the season cache.')
+    verify_parser.add_argument('snapshot')
+    parsed = parser.parse_args(arguments)
+
+    if parsed.command == 'build':
+        for league_info in build_snapshot(parsed.snapshot, dict(parsed.leagues)):
+            print(f'League {league_info.league_id}: {len(league_info.get_seasons())} seasons')
+        return 0
+
+    differences = verify_snapshot(parsed.snapshot)
+    for difference in differences:
+        print(difference, file=sys.stderr)
+    print('Snapshot matches the season cache' if len(differences) == 0
+          else f'{len(differences)} differences found')
+    return 0 if len(differences) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+""" Keeps the active season current while games are being played.
+
+Only the newest season's URL is requested, once for every loaded view, always with the
+ETag or Last-Modified from the season cache, so an unchanged week costs ESPN a 304 and
+us nothing. Historical seasons stay frozen. Polls happen every FFB_POLL_INTERVAL seconds
+during game windows and every FFB_IDLE_POLL_INTERVAL seconds outside them.
+"""
+import datetime
+import os
+from zoneinfo import ZoneInfo
+from ESPN_FFB.espn_fetcher import ESPNFetcher
+from ESPN_FFB.fetch_planner import FetchPlanner
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.season_cache import SeasonCache
+
+DEFAULT_POLL_INTERVAL = 60
+DEFAULT_IDLE_POLL_INTERVAL = 60 * 60
+NFL_TIME_ZONE = ZoneInfo('America/New_York')
+GAME_WINDOWS = [ #(weekday, first hour, end hour) in NFL_TIME_ZONE, Monday == 0
+    (3, 20, 24), #Thursday night
+    (6, 9, 24), #Sunday, from London games to Sunday night
+    (0, 0, 1), #Sunday night overtime
+    (0, 19, 24), #Monday night
+    (1, 0, 1) #Monday night overtime
+]
+
+class LiveSeasonPoller:
+    """ Refreshes the active season of an already loaded league in place. """
+
+    def __init__(self, league_info: LeagueInfo, season_cache: SeasonCache = None,
+                 fetcher: ESPNFetcher = None, api_host: str = None, cookies: list = None,
+                 poll_interval: float = None, idle_poll_interval: float = None):
+        if poll_interval is None:
+            poll_interval = float(os.environ.get('FFB_POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+        if idle_poll_interval is None:
+            idle_poll_interval = float(
+                os.environ.get('FFB_IDLE_POLL_INTERVAL', DEFAULT_IDLE_POLL_INTERVAL))
+        self.league_info = league_info
+        self.season_cache = season_cache
+        self.fetcher = fetcher
+        self.api_host = api_host
+        self.cookies = cookies
+        self.poll_interval = poll_interval
+        self.idle_poll_interval = idle_poll_interval
+        self.failures = 0 #Consecutive failed polls
+
+    def poll(self, cancel_event=None) -> bool:
+        """ Revalidates the active season of every view already loaded, mTeam and mMatchup,
+            in one request. Returns True if standings or matchups changed, i.e. an open
+            chart is out of date.
+        """
+        views = self.get_loaded_views()
+        if len(views) == 0 or (cancel_event is not None and cancel_event.is_set()):
+            return False
+
+        planner = FetchPlanner(
+            self.league_info, views, self.season_cache, self.fetcher, self.api_host,
+            self.cookies)
+        changed_payloads, success = planner.fetch_active_season(cancel_event)
+        for view, payload in changed_payloads.items():
+            self._apply_payload(view, payload)
+
+        self.failures = 0 if success else self.failures + 1
+        return len(changed_payloads) > 0
+
+    def get_loaded_views(self) -> list:
+        views = list()
+        if self.league_info.is_cache_empty() is False:
+            views.append("mTeam")
+        if self.league_info.matchup_table is not None:
+            views.append("mMatchup")
+        return views
+
+    def get_next_interval(self, now: datetime.datetime = None) -> float:
+        """ Seconds until the next poll. Each consecutive failure doubles the wait,
+            up to the idle interval.
+        """
+        interval = self.poll_interval if is_game_window(now) else self.idle_poll_interval
+        if self.failures > 0:
+            interval = min(
+                interval * 2 ** self.failures, max(interval, self.idle_poll_interval))
+        return interval
+
+    def _apply_payload(self, view: str, payload: dict):
+        if view == "mMatchup":
+            with self.league_info.lock: #Swapped in whole, like cached_responses
+                self.league_info.matchup_table = \
+                    self.league_info.matchup_table.update_season(payload)
+        else:
+            self.league_info.update_season(payload)
+
+def is_game_window(now: datetime.datetime = None) -> bool:
+    """ True while NFL games can be in progress. Naive datetimes are taken as local time. """
+    if now is None:
+        now = datetime.datetime.now(NFL_TIME_ZONE)
+    else:
+        now = now.astimezone(NFL_TIME_ZONE)
+    return any(
+        now.weekday() == weekday and first_hour <= now.hour < end_hour
+        for weekday, first_hour, end_hour in GAME_WINDOWS)
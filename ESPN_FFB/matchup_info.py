@@ -0,0 +1,166 @@
+import numpy as np
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import REGULAR_SEASON_WEEKS
+from ESPN_FFB.head_to_head import HeadToHead
+from ESPN_FFB.payload_projection import register_view_fields
+
+MATCHUP_DTYPE = np.dtype([
+    ('season', np.int16),
+    ('week', np.int8),
+    ('home_id', np.int16),
+    ('away_id', np.int16),
+    ('home_points', np.float32),
+    ('away_points', np.float32),
+    ('is_playoff', np.bool_)
+])
+
+register_view_fields("mMatchup", [
+    'seasonId',
+    'schedule[].matchupPeriodId', 'schedule[].playoffTierType', 'schedule[].winner',
+    'schedule[].home.teamId', 'schedule[].home.totalPoints',
+    'schedule[].away.teamId', 'schedule[].away.totalPoints'
+])
+
+class MatchupTable:
+    """ Every finished game of a league as one compact row per game.
+        Byes are left out. Regular season games that haven't been decided yet are kept
+        apart in remaining_games, with zero points, for simulating the rest of a season.
+    """
+
+    def __init__(self, games: np.ndarray = None, remaining_games: np.ndarray = None):
+        self.games = games if games is not None else np.zeros(0, dtype=MATCHUP_DTYPE)
+        self.remaining_games = remaining_games if remaining_games is not None \
+            else np.zeros(0, dtype=MATCHUP_DTYPE)
+        self._head_to_head = None
+
+    @classmethod
+    def from_responses(cls, responses: list):
+        """ Builds a table from mMatchup responses, one response per season. """
+        with instrumentation.span('matchup_table', 'aggregate', seasons=len(responses)):
+            season_games = [_format_season_games(response) for response in responses]
+            if len(season_games) == 0:
+                return cls()
+            remaining_games = [_format_remaining_games(response) for response in responses]
+            return cls(
+                _sort_games(np.concatenate(season_games)),
+                _sort_games(np.concatenate(remaining_games)))
+
+    def update_season(self, response: dict):
+        """ Returns a table with one season's games replaced by those in an mMatchup
+            response, e.g. after a week finishes, or this table if no game changed.
+            This table is never changed, so anyone still reading it keeps a consistent view.
+        """
+        season = response.get('seasonId', 0)
+        season_games = _format_season_games(response)
+        remaining_games = _format_remaining_games(response)
+        in_season = self.games['season'] == season
+        remaining_in_season = self.remaining_games['season'] == season
+        if np.array_equal(self.games[in_season], _sort_games(season_games)) and \
+                np.array_equal(
+                    self.remaining_games[remaining_in_season], _sort_games(remaining_games)):
+            return self
+
+        matchup_table = MatchupTable(self.games, _sort_games(np.concatenate(
+            (self.remaining_games[~remaining_in_season], remaining_games))))
+        matchup_table._head_to_head = self._head_to_head
+        if np.array_equal(self.games[in_season], _sort_games(season_games)):
+            return matchup_table
+        matchup_table.games = _sort_games(np.concatenate((self.games[~in_season], season_games)))
+        if self._head_to_head is not None:
+            matchup_table._head_to_head = self._head_to_head.copy()
+            matchup_table._head_to_head.update_season(season, season_games)
+        return matchup_table
+
+    def get_head_to_head(self) -> HeadToHead:
+        """ Built on first use, then carried over by update_season. """
+        if self._head_to_head is None:
+            self._head_to_head = HeadToHead.from_games(self.games)
+        return self._head_to_head
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def get_seasons(self) -> list:
+        return np.unique(self.games['season']).tolist()
+
+    def get_team_ids(self) -> list:
+        return np.union1d(self.games['home_id'], self.games['away_id']).tolist()
+
+    def get_season_range(self, first_season: int = None, last_season: int = None):
+        """ Returns a table holding only the games of an inclusive range of seasons. """
+        return MatchupTable(
+            self.games[_get_season_mask(self.games, first_season, last_season)],
+            self.remaining_games[
+                _get_season_mask(self.remaining_games, first_season, last_season)])
+
+    def get_team_results(self):
+        """ Returns (team_ids, margins, is_playoff) with two rows per game,
+            one from each team's point of view.
+        """
+        games = self.games
+        team_ids = np.concatenate((games['home_id'], games['away_id']))
+        margins = np.concatenate((
+            games['home_points'] - games['away_points'],
+            games['away_points'] - games['home_points']))
+        is_playoff = np.concatenate((games['is_playoff'], games['is_playoff']))
+        return team_ids, margins, is_playoff
+
+    def get_margin_distributions(self) -> dict:
+        """ Returns {team_id: (regular season margins, playoff margins)}. """
+        team_ids, margins, is_playoff = self.get_team_results()
+        order = np.argsort(team_ids, kind='stable')
+        team_ids, margins, is_playoff = team_ids[order], margins[order], is_playoff[order]
+
+        unique_team_ids, starts = np.unique(team_ids, return_index=True)
+        distributions = dict()
+        for team_id, team_margins, team_is_playoff in zip(
+                unique_team_ids.tolist(),
+                np.split(margins, starts[1:]),
+                np.split(is_playoff, starts[1:])):
+            distributions[team_id] = (
+                team_margins[~team_is_playoff], team_margins[team_is_playoff])
+        return distributions
+
+def _get_season_mask(games: np.ndarray, first_season: int, last_season: int) -> np.ndarray:
+    in_range = np.ones(len(games), dtype=bool)
+    if first_season is not None:
+        in_range &= games['season'] >= first_season
+    if last_season is not None:
+        in_range &= games['season'] <= last_season
+    return in_range
+
+def _sort_games(games: np.ndarray) -> np.ndarray:
+    return games[np.lexsort((games['week'], games['season']))]
+
+def _format_season_games(response: dict) -> np.ndarray:
+    season = response.get('seasonId', 0)
+    rows = [
+        (season, game['matchupPeriodId'],
+         game['home']['teamId'], game['away']['teamId'],
+         game['home']['totalPoints'], game['away']['totalPoints'],
+         _is_playoff_game(game))
+        for game in response.get('schedule', list()) if _is_finished_game(game)]
+    return np.array(rows, dtype=MATCHUP_DTYPE)
+
+def _format_remaining_games(response: dict) -> np.ndarray:
+    season = response.get('seasonId', 0)
+    rows = [
+        (season, game['matchupPeriodId'], game['home']['teamId'], game['away']['teamId'],
+         0.0, 0.0, False)
+        for game in response.get('schedule', list())
+        if 'home' in game and 'away' in game
+        and _is_finished_game(game) is False and _is_playoff_game(game) is False]
+    return np.array(rows, dtype=MATCHUP_DTYPE)
+
+def _is_finished_game(game: dict) -> bool:
+    if 'home' not in game or 'away' not in game: #Playoff byes only have a home team
+        return False
+    return game.get('winner', 'UNDECIDED') != 'UNDECIDED'
+
+def _is_playoff_game(game: dict) -> bool:
+    """ ESPN tags playoff games with a playoffTierType. Older payloads may not,
+        so fall back to the league's regular season length.
+    """
+    if 'playoffTierType' in game:
+        return game['playoffTierType'] != 'NONE'
+    return game['matchupPeriodId'] > REGULAR_SEASON_WEEKS
@@ -0,0 +1,194 @@
+import hashlib
+import json
+try:
+    import ijson #Optional: streams the body instead of loading it whole
+except ImportError:
+    ijson = None
+
+VIEW_FIELDS = dict() #view : set of dotted field paths, "[]" marks a list
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class PayloadError(ValueError):
+    """ The body isn't the JSON ESPN sends, e.g. an HTML error page or a cut off stream. """
+
+def register_view_fields(view: str, fields: list):
+    """ Declares the fields a consumer reads from a view. Every field any consumer
+        declared is kept; everything else is dropped while parsing.
+        Views nobody declared fields for are kept whole.
+    """
+    VIEW_FIELDS.setdefault(view, set()).update(fields)
+
+def get_view_fields(view: str) -> set:
+    return VIEW_FIELDS.get(view, set())
+
+def get_fields_hash(fields: set) -> str:
+    """ Identifies a field set, so a payload cached before more fields were declared
+        can be told apart from one projected to the current fields.
+    """
+    return hashlib.sha1('\n'.join(sorted(fields)).encode()).hexdigest()
+
+def get_view_fields_hash(view: str) -> str:
+    return get_fields_hash(get_view_fields(view))
+
+def get_registered_views() -> list:
+    """ Every view some consumer declared fields for, i.e. every view a refresh needs. """
+    return sorted(VIEW_FIELDS)
+
+def parse_response(response, view: str, is_list: bool = False) -> dict:
+    """ Parses a requests.Response down to the fields declared for its view.
+        is_list is for leagueHistory URLs, whose body is a list holding one season.
+        When ijson is installed the body is streamed, chunk by chunk if the response
+        was opened with stream=True.
+    """
+    return parse_fields(response, get_view_fields(view), is_list)
+
+def parse_views(response, views: list, is_list: bool = False) -> dict:
+    """ Parses a response requested with several views at once and splits it into
+        {view: payload}, each payload projected to its own view's fields.
+    """
+    view_fields = [get_view_fields(view) for view in views]
+    if any(len(fields) == 0 for fields in view_fields):
+        combined_fields = set() #Some view is kept whole, so the whole body is needed
+    else:
+        combined_fields = set().union(*view_fields)
+    payload = parse_fields(response, combined_fields, is_list)
+    return {view: project(payload, fields) for view, fields in zip(views, view_fields)}
+
+def parse_fields(response, fields: set, is_list: bool = False):
+    """ parse_response for callers that project to their own fields rather than a view's. """
+    if ijson is not None and len(fields) > 0:
+        payload = stream_project(_ChunkReader(response), fields, is_list)
+    else:
+        payload = json.loads(response.content)
+        if is_list:
+            payload = _get_history_season(payload)
+        payload = project(payload, fields)
+    return payload
+
+def project(payload, fields: set):
+    """ Returns a copy of an already parsed payload holding only the given fields. """
+    if len(fields) == 0:
+        return payload
+    return _project_tree(payload, _build_field_tree(fields))
+
+def stream_project(stream, fields: set, is_list: bool = False):
+    """ Builds only the wanted fields from ijson's event stream. Unwanted subtrees are
+        skipped as they stream past, so they are never turned into Python objects.
+    """
+    root_prefix = 'item' if is_list else ''
+    wanted_paths = _build_wanted_paths(fields, root_prefix)
+
+    root = list()
+    stack = [[root, None]]
+    skip_depth = 0
+    try:
+        for prefix, event, value in ijson.parse(stream, use_float=True):
+            if skip_depth > 0:
+                if event in ('start_map', 'start_array'):
+                    skip_depth += 1
+                elif event in ('end_map', 'end_array'):
+                    skip_depth -= 1
+                continue
+
+            if event == 'map_key':
+                stack[-1][1] = value
+            elif event in ('end_map', 'end_array'):
+                finished = stack.pop()[0]
+                _add_to_parent(stack[-1], finished)
+            elif _is_wanted(prefix, wanted_paths) is False:
+                if event in ('start_map', 'start_array'):
+                    skip_depth = 1
+            elif event == 'start_map':
+                stack.append([dict(), None])
+            elif event == 'start_array':
+                stack.append([list(), None])
+            else:
+                _add_to_parent(stack[-1], value)
+    except ijson.JSONError as error:
+        raise PayloadError(f'Malformed response body: {error}') from error
+
+    if len(root) == 0:
+        raise PayloadError('Empty response body')
+    return _get_history_season(root[0]) if is_list else root[0]
+
+class _ChunkReader:
+    """ File-like view over Response.iter_content, which also undoes gzip. """
+
+    def __init__(self, response):
+        self._chunks = response.iter_content(STREAM_CHUNK_SIZE)
+        self._buffer = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def _get_history_season(payload):
+    """ leagueHistory answers with a list holding the season, or an empty list if ESPN
+        has nothing for it.
+    """
+    if not isinstance(payload, list) or len(payload) == 0:
+        raise PayloadError('leagueHistory returned no season')
+    return payload[0]
+
+def _build_field_tree(fields: set) -> dict:
+    """ "teams[].record.overall.wins" becomes {'teams[]': {'record': {'overall': {'wins': {}}}}}.
+        An empty dict means keep the whole value.
+    """
+    tree = dict()
+    for field in fields:
+        node = tree
+        for key in field.split('.'):
+            node = node.setdefault(key, dict())
+    return tree
+
+def _project_tree(value, tree: dict):
+    if len(tree) == 0 or not isinstance(value, dict):
+        return value
+
+    projected = dict()
+    for key, subtree in tree.items():
+        if key.endswith('[]'):
+            items = value.get(key[:-2])
+            if isinstance(items, list):
+                projected[key[:-2]] = [_project_tree(item, subtree) for item in items]
+        elif key in value:
+            projected[key] = _project_tree(value[key], subtree)
+    return projected
+
+def _build_wanted_paths(fields: set, root_prefix: str):
+    """ Returns (paths to build, paths kept whole) in ijson's prefix notation. """
+    containers = {'', root_prefix}
+    leaves = set()
+    for field in fields:
+        path = root_prefix
+        for key in field.split('.'):
+            if key.endswith('[]'):
+                path = _join_prefix(path, key[:-2])
+                containers.add(path)
+                path = _join_prefix(path, 'item')
+            else:
+                path = _join_prefix(path, key)
+            containers.add(path)
+        leaves.add(path)
+    return containers, tuple(leaf + '.' for leaf in leaves)
+
+def _is_wanted(prefix: str, wanted_paths: tuple) -> bool:
+    containers, leaf_prefixes = wanted_paths
+    return prefix in containers or prefix.startswith(leaf_prefixes)
+
+def _join_prefix(prefix: str, key: str) -> str:
+    return f'{prefix}.{key}' if prefix else key
+
+def _add_to_parent(parent: list, value):
+    container, key = parent
+    if isinstance(container, dict):
+        container[key] = value
+    else:
+        container.append(value)
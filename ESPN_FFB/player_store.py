@@ -0,0 +1,269 @@
+""" Weekly player scoring for every fantasy team, kept as compact fixed-size chunks.
+
+Rows are keyed by (season, week, team_id, player_id). Rows are appended to the newest
+chunk; once a chunk is full it is frozen and, if the store has a directory, written to
+disk and memory mapped, so ingesting any number of seasons keeps only one chunk in memory.
+Player and team indexes map ids to row numbers, so per-player and per-franchise queries
+only touch their own rows. Replacing a week leaves its old rows behind as deleted; once
+they outnumber the live rows the store is compacted, so re-ingesting never grows it for good.
+"""
+import os
+import numpy as np
+from ESPN_FFB import instrumentation
+
+PLAYER_DTYPE = np.dtype([
+    ('season', np.int16),
+    ('week', np.int8),
+    ('team_id', np.int16),
+    ('player_id', np.int32),
+    ('lineup_slot', np.int8),
+    ('points', np.float32)
+])
+
+BOX_SCORE_FIELDS = { #Box score payloads are huge; only these fields are kept while parsing
+    'seasonId', 'scoringPeriodId',
+    'schedule[].home.teamId', 'schedule[].away.teamId',
+    'schedule[].home.rosterForCurrentScoringPeriod.entries[].playerId',
+    'schedule[].home.rosterForCurrentScoringPeriod.entries[].lineupSlotId',
+    'schedule[].home.rosterForCurrentScoringPeriod.entries[].playerPoolEntry.appliedStatTotal',
+    'schedule[].home.rosterForCurrentScoringPeriod.entries[].playerPoolEntry.player.fullName',
+    'schedule[].away.rosterForCurrentScoringPeriod.entries[].playerId',
+    'schedule[].away.rosterForCurrentScoringPeriod.entries[].lineupSlotId',
+    'schedule[].away.rosterForCurrentScoringPeriod.entries[].playerPoolEntry.appliedStatTotal',
+    'schedule[].away.rosterForCurrentScoringPeriod.entries[].playerPoolEntry.player.fullName'
+}
+BENCH_SLOTS = (20, 21) #ESPN's lineupSlotId for bench and injured reserve
+CHUNK_ROWS = 64 * 1024
+
+class PlayerStore:
+
+    def __init__(self, directory: str = None, chunk_rows: int = CHUNK_ROWS):
+        """ directory, if given, is where full chunks are written and memory mapped from. """
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.player_names = dict() #player_id : full name
+        self._chunks = [np.zeros(chunk_rows, dtype=PLAYER_DTYPE)]
+        self._deleted = [np.zeros(chunk_rows, dtype=np.bool_)]
+        self._row_count = 0 #Rows written, including deleted ones
+        self._deleted_count = 0
+        self._week_rows = dict() #(season, week) : (first row number, end row number)
+        self._player_index = dict() #player_id : list of row number arrays
+        self._team_index = dict() #team_id : list of row number arrays
+        self._generation = 0 #Bumped by each compaction, which writes its chunks to new files
+
+    def __len__(self) -> int:
+        return sum(stop - start for start, stop in self._week_rows.values())
+
+    def ingest_box_score(self, response: dict, season: int = None, week: int = None) -> int:
+        """ Adds one scoring period's box score, replacing any rows already stored for it.
+            Returns the number of rows added.
+        """
+        season = season if season is not None else response.get('seasonId', 0)
+        week = week if week is not None else response.get('scoringPeriodId', 0)
+        rows, player_names = format_box_score(response, season, week)
+        self.player_names.update(player_names)
+        with instrumentation.span('ingest_players', 'aggregate', season=season, week=week):
+            self.remove_week(season, week)
+            self._add_week(season, week, rows)
+            if self._deleted_count >= self.chunk_rows and \
+                    2 * self._deleted_count >= self._row_count:
+                self.compact()
+        return len(rows)
+
+    def remove_week(self, season: int, week: int):
+        """ Marks the week's rows deleted and drops them from the indexes. """
+        week_rows = self._week_rows.get((season, week))
+        if week_rows is None:
+            return
+        rows = self.get_week(season, week)
+        del self._week_rows[(season, week)]
+        _remove_from_index(self._player_index, rows['player_id'], *week_rows)
+        _remove_from_index(self._team_index, rows['team_id'], *week_rows)
+        chunk_indexes, offsets = np.divmod(np.arange(*week_rows), self.chunk_rows)
+        for chunk_index in np.unique(chunk_indexes).tolist():
+            self._deleted[chunk_index][offsets[chunk_indexes == chunk_index]] = True
+        self._deleted_count += len(rows)
+
+    def compact(self):
+        """ Rewrites every live week into new chunks, one week at a time, leaving out
+            deleted rows, and rebuilds the indexes. The new chunks go to a new generation
+            of files, since the old ones are still mapped while they are read.
+        """
+        with instrumentation.span('compact_players', 'aggregate', deleted=self._deleted_count):
+            chunks, week_rows = self._chunks, self._week_rows
+            self._generation += 1
+            self._chunks = [np.zeros(self.chunk_rows, dtype=PLAYER_DTYPE)]
+            self._deleted = [np.zeros(self.chunk_rows, dtype=np.bool_)]
+            self._row_count = 0
+            self._deleted_count = 0
+            self._week_rows = dict()
+            self._player_index = dict()
+            self._team_index = dict()
+            for (season, week), (start, stop) in sorted(week_rows.items()):
+                self._add_week(season, week, _read_rows(chunks, start, stop, self.chunk_rows))
+            del chunks #Unmaps the old files, which Windows won't delete while mapped
+            self._remove_chunk_files(self._generation - 1)
+
+    def get_weeks(self) -> list:
+        return sorted(self._week_rows)
+
+    def get_week(self, season: int, week: int) -> np.ndarray:
+        return self._gather(np.arange(*self._week_rows.get((season, week), (0, 0))))
+
+    def get_player_rows(self, player_id: int) -> np.ndarray:
+        """ Every week the player was on a fantasy roster, oldest first. """
+        return self._get_indexed_rows(self._player_index, player_id)
+
+    def get_team_rows(self, team_id: int) -> np.ndarray:
+        """ Every player week of a fantasy team, oldest first. """
+        return self._get_indexed_rows(self._team_index, team_id)
+
+    def get_player_totals(self, team_id: int = None, starters_only: bool = True) -> dict:
+        """ Returns {player_id: points}, for one franchise if team_id is given.
+            starters_only leaves out points scored on the bench or injured reserve.
+        """
+        rows = self.get_team_rows(team_id) if team_id is not None else self._get_all_rows()
+        if starters_only:
+            rows = rows[~np.isin(rows['lineup_slot'], BENCH_SLOTS)]
+        player_ids, inverse = np.unique(rows['player_id'], return_inverse=True)
+        totals = np.bincount(inverse, weights=rows['points'], minlength=len(player_ids))
+        return dict(zip(player_ids.tolist(), np.round(totals, 2).tolist()))
+
+    def get_top_players(self, starters_only: bool = True) -> dict:
+        """ Returns {team_id: (player_id, points)}: each franchise's highest scoring
+            player over every season, counting only points scored for that franchise.
+        """
+        top_players = dict()
+        for team_id in sorted(self._team_index):
+            totals = self.get_player_totals(team_id, starters_only)
+            if len(totals) > 0:
+                top_players[team_id] = max(totals.items(), key=lambda total: total[1])
+        return top_players
+
+    def get_player_name(self, player_id: int) -> str:
+        return self.player_names.get(player_id, f'Player {player_id}')
+
+    def _add_week(self, season: int, week: int, rows: np.ndarray):
+        row_numbers = self._append(rows)
+        self._week_rows[(season, week)] = (int(row_numbers[0]), int(row_numbers[-1]) + 1) \
+            if len(rows) > 0 else (0, 0)
+        _add_to_index(self._player_index, rows['player_id'], row_numbers)
+        _add_to_index(self._team_index, rows['team_id'], row_numbers)
+
+    def _append(self, rows: np.ndarray) -> np.ndarray:
+        row_numbers = np.arange(self._row_count, self._row_count + len(rows), dtype=np.int32)
+        written = 0
+        while written < len(rows):
+            offset = self._row_count % self.chunk_rows
+            count = min(self.chunk_rows - offset, len(rows) - written)
+            self._chunks[-1][offset:offset + count] = rows[written:written + count]
+            written += count
+            self._row_count += count
+            if self._row_count % self.chunk_rows == 0:
+                self._freeze_chunk()
+        return row_numbers
+
+    def _freeze_chunk(self):
+        """ Writes the full chunk out, if there is a directory, and starts a new one. """
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._chunk_path(len(self._chunks) - 1)
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'wb') as chunk_file:
+                np.save(chunk_file, self._chunks[-1])
+            os.replace(temporary_path, path)
+            self._chunks[-1] = np.load(path, mmap_mode='r')
+        self._chunks.append(np.zeros(self.chunk_rows, dtype=PLAYER_DTYPE))
+        self._deleted.append(np.zeros(self.chunk_rows, dtype=np.bool_))
+
+    def _remove_chunk_files(self, generation: int):
+        """ Deletes a generation's chunk files. One that can't be deleted yet is left behind. """
+        if self.directory is None:
+            return
+        chunk_index = 0
+        while os.path.exists(self._chunk_path(chunk_index, generation)):
+            try:
+                os.remove(self._chunk_path(chunk_index, generation))
+            except OSError:
+                pass
+            chunk_index += 1
+
+    def _chunk_path(self, chunk_index: int, generation: int = None) -> str:
+        generation = generation if generation is not None else self._generation
+        return os.path.join(self.directory, f'players_{generation}_{chunk_index}.npy')
+
+    def _get_indexed_rows(self, index: dict, key: int) -> np.ndarray:
+        row_numbers = index.get(key)
+        if row_numbers is None:
+            return np.zeros(0, dtype=PLAYER_DTYPE)
+        if len(row_numbers) > 1: #Merged on read, so later lookups are a single array
+            row_numbers[:] = [np.concatenate(row_numbers)]
+        return self._gather(row_numbers[0], skip_deleted=True)
+
+    def _get_all_rows(self) -> np.ndarray:
+        return self._gather(np.arange(self._row_count), skip_deleted=True)
+
+    def _gather(self, row_numbers: np.ndarray, skip_deleted: bool = False) -> np.ndarray:
+        """ Reads rows in row number order, one slice of one chunk at a time. """
+        row_numbers = np.sort(row_numbers)
+        chunk_indexes, offsets = np.divmod(row_numbers, self.chunk_rows)
+        parts = list()
+        for chunk_index in np.unique(chunk_indexes).tolist():
+            chunk_offsets = offsets[chunk_indexes == chunk_index]
+            if skip_deleted:
+                chunk_offsets = chunk_offsets[~self._deleted[chunk_index][chunk_offsets]]
+            parts.append(self._chunks[chunk_index][chunk_offsets])
+        if len(parts) == 0:
+            return np.zeros(0, dtype=PLAYER_DTYPE)
+        return np.concatenate(parts)
+
+def format_box_score(response: dict, season: int, week: int):
+    """ Returns (PLAYER_DTYPE rows, {player_id: name}) for both sides of every matchup
+        that has a roster for the scoring period.
+    """
+    rows = list()
+    player_names = dict()
+    for matchup in response.get('schedule', list()):
+        for side in ('home', 'away'):
+            team = matchup.get(side)
+            if team is None or 'rosterForCurrentScoringPeriod' not in team:
+                continue
+            for entry in team['rosterForCurrentScoringPeriod'].get('entries', list()):
+                player_pool_entry = entry.get('playerPoolEntry', dict())
+                rows.append((
+                    season, week, team['teamId'], entry['playerId'],
+                    entry.get('lineupSlotId', BENCH_SLOTS[0]),
+                    player_pool_entry.get('appliedStatTotal', 0.0)))
+                name = player_pool_entry.get('player', dict()).get('fullName')
+                if name is not None:
+                    player_names[entry['playerId']] = name
+    return np.array(rows, dtype=PLAYER_DTYPE), player_names
+
+def _add_to_index(index: dict, keys: np.ndarray, row_numbers: np.ndarray):
+    """ Appends each key's row numbers as one array, grouped with a single sort. """
+    order = np.argsort(keys, kind='stable')
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    for key, key_rows in zip(unique_keys.tolist(), np.split(row_numbers[order], starts[1:])):
+        index.setdefault(key, list()).append(key_rows)
+
+def _remove_from_index(index: dict, keys: np.ndarray, start: int, stop: int):
+    """ Drops row numbers start to stop from each key's rows, and keys left with none. """
+    for key in np.unique(keys).tolist():
+        row_numbers = np.concatenate(index[key])
+        row_numbers = row_numbers[(row_numbers < start) | (row_numbers >= stop)]
+        if len(row_numbers) > 0:
+            index[key] = [row_numbers]
+        else:
+            del index[key]
+
+def _read_rows(chunks: list, start: int, stop: int, chunk_rows: int) -> np.ndarray:
+    """ Copies the contiguous rows start to stop out of chunks. """
+    parts = list()
+    while start < stop:
+        chunk_index, offset = divmod(start, chunk_rows)
+        count = min(chunk_rows - offset, stop - start)
+        parts.append(chunks[chunk_index][offset:offset + count])
+        start += count
+    if len(parts) == 0:
+        return np.zeros(0, dtype=PLAYER_DTYPE)
+    return np.concatenate(parts)
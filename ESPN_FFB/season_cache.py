@@ -0,0 +1,133 @@
+import json
+import os
+import time
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.ffb_stats', 'cache')
+DEFAULT_ACTIVE_SEASON_TTL = 15 * 60 #Seconds before the active season is revalidated
+
+class CacheEntry:
+
+    def __init__(self, payload, etag: str = None, last_modified: str = None,
+                 fetched_at: float = 0.0, fields_hash: str = None):
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.fields_hash = fields_hash #Of the fields the payload was projected to
+
+    def matches_fields(self, fields_hash: str = None) -> bool:
+        return fields_hash is None or self.fields_hash == fields_hash
+
+    def to_dict(self) -> dict:
+        return {
+            'payload': self.payload,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'fetched_at': self.fetched_at,
+            'fields_hash': self.fields_hash
+        }
+
+class SeasonCache:
+    """ Persistent on-disk cache of ESPN responses keyed by (league_id, season, view).
+        Completed seasons are final once stored after the season ended, and never
+        requested again. The active season is served from disk until its TTL runs out,
+        then revalidated with a conditional request.
+    """
+
+    def __init__(self, directory: str = None, active_season_ttl: float = None):
+        if directory is None:
+            directory = os.environ.get('FFB_CACHE_DIR', DEFAULT_CACHE_DIRECTORY)
+        if active_season_ttl is None:
+            active_season_ttl = float(
+                os.environ.get('FFB_ACTIVE_SEASON_TTL', DEFAULT_ACTIVE_SEASON_TTL))
+        self.directory = directory
+        self.active_season_ttl = active_season_ttl
+
+    def get(self, league_id: int, season: int, view: str, fields_hash: str = None) -> CacheEntry:
+        """ Returns the stored entry, or None if nothing usable is on disk. An entry
+            projected to other fields than fields_hash, if given, is not usable.
+        """
+        try:
+            with open(self._entry_path(league_id, season, view), 'r') as entry_file:
+                stored = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        entry = CacheEntry(
+            stored.get('payload'), stored.get('etag'), stored.get('last_modified'),
+            stored.get('fetched_at', 0.0), stored.get('fields_hash'))
+        return entry if entry.matches_fields(fields_hash) else None
+
+    def put(self, league_id: int, season: int, view: str, payload,
+            etag: str = None, last_modified: str = None, fields_hash: str = None) -> CacheEntry:
+        entry = CacheEntry(payload, etag, last_modified, time.time(), fields_hash)
+        self._write_entry(league_id, season, view, entry)
+        return entry
+
+    def touch(self, league_id: int, season: int, view: str, entry: CacheEntry) -> CacheEntry:
+        """ Marks an entry as freshly validated, e.g. after ESPN answered 304 Not Modified. """
+        entry.fetched_at = time.time()
+        self._write_entry(league_id, season, view, entry)
+        return entry
+
+    def get_seasons(self, league_id: int, view: str) -> list:
+        """ Returns every season stored for a league and view, oldest first. """
+        suffix = f'_{view}.json'
+        return sorted(
+            int(file_name[:-len(suffix)])
+            for file_name in _list_directory(os.path.join(self.directory, str(league_id)))
+            if file_name.endswith(suffix) and file_name[:-len(suffix)].isdigit())
+
+    def is_fresh(self, entry: CacheEntry, is_active_season: bool,
+                 season_end: float = None) -> bool:
+        """ season_end is when a completed season stopped being the active one. An entry
+            fetched before then may be missing the last games, so it is revalidated once.
+        """
+        if entry is None:
+            return False
+        if is_active_season is False:
+            return season_end is None or entry.fetched_at >= season_end
+        return time.time() - entry.fetched_at < self.active_season_ttl
+
+    def clear(self, league_id: int = None, season: int = None):
+        """ Removes stored entries for a single league, or for every league if none is given.
+            season limits it to that season of the league.
+        """
+        if league_id is None:
+            league_ids = _list_directory(self.directory)
+        else:
+            league_ids = [str(league_id)]
+
+        for league in league_ids:
+            league_directory = os.path.join(self.directory, league)
+            for file_name in _list_directory(league_directory):
+                if season is None or file_name.startswith(f'{season}_'):
+                    os.remove(os.path.join(league_directory, file_name))
+
+    def _write_entry(self, league_id: int, season: int, view: str, entry: CacheEntry):
+        path = self._entry_path(league_id, season, view)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as entry_file:
+            json.dump(entry.to_dict(), entry_file)
+        os.replace(temporary_path, path) #Atomic, so readers never see half an entry
+
+    def _entry_path(self, league_id: int, season: int, view: str) -> str:
+        return os.path.join(self.directory, str(league_id), f'{season}_{view}.json')
+
+def conditional_headers(entry: CacheEntry) -> dict:
+    """ Returns the headers needed to revalidate a cached entry with ESPN. """
+    headers = dict()
+    if entry is None:
+        return headers
+    if entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+    return headers
+
+def _list_directory(directory: str) -> list:
+    try:
+        return os.listdir(directory)
+    except OSError:
+        return list()
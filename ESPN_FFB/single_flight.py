@@ -0,0 +1,49 @@
+""" Deduplicates concurrent work on the same key.
+
+The first caller to claim a key owns the work and must resolve it, success or not.
+Callers that claim the key while it is in flight get the owner's Future instead and
+wait on it, so two button clicks or two API requests for the same league share one
+sweep of ESPN. A key is forgotten once resolved; the next claim starts new work.
+"""
+import threading
+from concurrent.futures import Future, TimeoutError
+
+WAIT_INTERVAL = 0.1 #Seconds between checks of a waiter's cancel_event
+
+class SingleFlight:
+
+    def __init__(self):
+        self._futures = dict() #key : Future of the owner's result
+        self._lock = threading.Lock()
+
+    def claim(self, key) -> tuple:
+        """ Returns (Future, True) if the caller now owns key, otherwise the owner's
+            (Future, False).
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._futures[key] = future
+            return future, True
+
+    def resolve(self, key, result):
+        """ Hands result to every waiter and forgets key. """
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is not None:
+            future.set_result(result)
+
+    def get_keys(self) -> list:
+        with self._lock:
+            return list(self._futures)
+
+def wait_for(future: Future, cancel_event: threading.Event = None):
+    """ Returns the future's result, or None once cancel_event is set. """
+    while True:
+        try:
+            return future.result(WAIT_INTERVAL)
+        except TimeoutError:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
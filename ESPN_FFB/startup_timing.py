@@ -0,0 +1,70 @@
+""" Measures how long the application takes to open its window and what each import costs.
+
+    python -m ESPN_FFB.startup_timing [--module ESPN_FFB.ffb_stats] [--top 15]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+STARTUP_BUDGET_SECONDS = 1.0 #Time from launching main.py to the window being drawn
+IMPORT_BUDGET_SECONDS = 0.5 #Cumulative import time of ESPN_FFB.ffb_stats
+DEFERRED_MODULES = ['matplotlib', 'numpy', 'requests'] #Must not load before the window shows
+
+def get_import_costs(module: str = 'ESPN_FFB.ffb_stats') -> dict:
+    """ Imports module in a fresh interpreter under -X importtime.
+        Returns {module name: (self seconds, cumulative seconds)}.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True)
+    return parse_import_times(completed.stderr)
+
+def parse_import_times(output: str) -> dict:
+    """ Parses the "import time: self [us] | cumulative | imported package" lines. """
+    import_costs = dict()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        import_costs[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return import_costs
+
+def get_loaded_deferred_modules(import_costs: dict) -> list:
+    return [module for module in DEFERRED_MODULES if module in import_costs]
+
+def print_import_report(import_costs: dict, top: int = 15):
+    slowest = sorted(import_costs.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for name, (self_seconds, cumulative_seconds) in slowest:
+        print(f'{cumulative_seconds * 1000:>14.1f} {self_seconds * 1000:>10.1f}  {name}')
+
+def print_startup_report(startup_time: float):
+    """ startup_time is the time.perf_counter() value taken before ESPN_FFB was imported. """
+    elapsed = time.perf_counter() - startup_time
+    status = 'within' if elapsed <= STARTUP_BUDGET_SECONDS else 'OVER'
+    print(f'Window shown after {elapsed * 1000:.0f} ms '
+          f'({status} the {STARTUP_BUDGET_SECONDS * 1000:.0f} ms budget)')
+    loaded = [module for module in DEFERRED_MODULES if module in sys.modules]
+    if len(loaded) > 0:
+        print(f"Loaded before the window showed: {', '.join(loaded)}")
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='ESPN_FFB.ffb_stats')
+    parser.add_argument('--top', type=int, default=15)
+    parsed = parser.parse_args(arguments)
+
+    import_costs = get_import_costs(parsed.module)
+    print_import_report(import_costs, parsed.top)
+    total = import_costs.get(parsed.module, (0, 0))[1]
+    print(f'\n{parsed.module} imports in {total * 1000:.1f} ms '
+          f'(budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)')
+
+    loaded = get_loaded_deferred_modules(import_costs)
+    if len(loaded) > 0:
+        print(f"Imported eagerly but should be deferred: {', '.join(loaded)}")
+    return 0 if total <= IMPORT_BUDGET_SECONDS and len(loaded) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
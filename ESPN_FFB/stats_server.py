@@ -0,0 +1,446 @@
+""" Read-only HTTP API serving the numbers behind every chart as JSON.
+
+    python -m ESPN_FFB.stats_server [--host 127.0.0.1] [--port 8080] [LEAGUE_ID:FIRST_YEAR ...]
+
+Routes, all GET:
+    /leagues                                    the leagues this server answers for
+    /leagues/{league_id}                        seasons, teams and figure options of a league
+    /leagues/{league_id}/figures/{option}       one figure's values per team
+        ?first_season=YEAR&last_season=YEAR     limits the totals to a range of seasons
+    /cache                                      hits, misses and evictions of the league cache
+
+Bodies are built once from the season cache and kept in memory with an ETag until the
+league's data changes, so repeat requests never reach ESPN or the aggregation code.
+Requests for a league that isn't loaded yet wait on a single shared fetch.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import parse_qs, urlparse
+import requests
+from ESPN_FFB.axes_labels import AxesLabels
+from ESPN_FFB.constants import DEFAULT_FIRST_YEAR, DEFAULT_LEAGUE_ID
+from ESPN_FFB.figure_options import (FIGURE_OPTIONS, get_all_time_figure_options,
+                                     is_all_play_figure, is_head_to_head_figure,
+                                     is_luck_figure, is_matchup_figure,
+                                     is_playoff_odds_figure, is_win_loss_margin_figure)
+from ESPN_FFB.league_analytics import (DEFAULT_SIMULATIONS, PlayoffSimulation, ScoreMatrix,
+                                       get_playoff_odds)
+from ESPN_FFB.league_cache import LeagueCache
+from ESPN_FFB.league_registry import LeagueRegistry, parse_league_argument
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_REFRESH_SECONDS = 900 #How long a loaded league is served before it is refreshed
+MAX_REQUEST_HEAD_BYTES = 16 * 1024
+DEFAULT_MAX_CACHED_RESPONSES = 256 #Bodies kept in memory; season ranges are client chosen
+STATUS_REASONS = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 500: 'Internal Server Error', 502: 'Bad Gateway'
+}
+
+class StatsError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class CachedResponse:
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(',', ':')).encode()
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+
+class StatsServer:
+    """ Serves LeagueInfo aggregates for a fixed set of leagues.
+        leagues is {league_id: first_year}; by default the package's default league.
+        LeagueInfo is only touched on worker threads. Bodies are built under its lock,
+        which a refresh takes only to swap in what it fetched.
+    """
+
+    def __init__(self, leagues: dict = None, registry: LeagueRegistry = None,
+                 refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+                 max_cached_responses: int = DEFAULT_MAX_CACHED_RESPONSES):
+        self.leagues = leagues if leagues else {DEFAULT_LEAGUE_ID: DEFAULT_FIRST_YEAR}
+        self.registry = registry if registry is not None else LeagueRegistry()
+        self.refresh_seconds = refresh_seconds
+        self.max_cached_responses = max_cached_responses
+        self.port = None
+        self._server = None
+        self._responses = OrderedDict() #(league_id, figure_option, first, last) : body, LRU first
+        self._loads = dict() #(league_id, view) : in-flight asyncio.Task loading it
+        self._loaded_at = dict() #(league_id, view) : time.monotonic()
+        self._generations = {league_id: 0 for league_id in self.leagues} #Bumped on every reload
+        for league_id, first_year in self.leagues.items():
+            self.registry.register(league_id, first_year)
+        self._league_list = CachedResponse({'leagues': [
+            {'league_id': league_id, 'first_year': first_year}
+            for league_id, first_year in self.leagues.items()]})
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """ Starts accepting connections. Port 0 picks a free port, see self.port. """
+        self._server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_REQUEST_HEAD_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter):
+        """ HTTP/1.1 with keep-alive, so a client can reuse one connection. """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                try:
+                    method, target, version, headers = _parse_request_head(head)
+                except ValueError:
+                    writer.write(_format_response(400, _error_body('Malformed request'), False))
+                    break
+
+                status, response = await self.respond(
+                    method, target, headers.get('if-none-match'))
+                keep_alive = version == 'HTTP/1.1' and \
+                    headers.get('connection', '').lower() != 'close'
+                writer.write(_format_response(status, response, keep_alive))
+                await writer.drain()
+                if keep_alive is False:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, method: str, target: str, if_none_match: str = None):
+        """ Returns (status, CachedResponse). 304s carry the response for its ETag only. """
+        if method != 'GET':
+            return 405, _error_body('Only GET is supported')
+        try:
+            response = await self.get(target)
+        except StatsError as error:
+            return error.status, _error_body(str(error))
+        except requests.exceptions.RequestException as error: #ESPN failed, not this server
+            traceback.print_exc()
+            return 502, _error_body(f'Request to ESPN failed: {error}')
+        except Exception: #Answered rather than dropping the connection with no reply
+            traceback.print_exc()
+            return 500, _error_body('Internal server error')
+        if if_none_match is not None and response.etag in if_none_match:
+            return 304, response
+        return 200, response
+
+    async def get(self, target: str) -> CachedResponse:
+        url = urlparse(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = parse_qs(url.query)
+
+        if parts == ['leagues']:
+            return self._league_list
+        if parts == ['cache'] and isinstance(self.registry.season_cache, LeagueCache):
+            return CachedResponse(self.registry.season_cache.get_stats()) #Never kept
+        if len(parts) == 2 and parts[0] == 'leagues':
+            return await self.get_league(_parse_int(parts[1], 'league id'))
+        if len(parts) == 4 and parts[0] == 'leagues' and parts[2] == 'figures':
+            return await self.get_figure(
+                _parse_int(parts[1], 'league id'),
+                _parse_int(parts[3], 'figure option'),
+                _get_season_argument(query, 'first_season'),
+                _get_season_argument(query, 'last_season'))
+        raise StatsError(404, f'No route for {url.path}')
+
+    async def get_league(self, league_id: int) -> CachedResponse:
+        key = (league_id, None, None, None)
+        await self._ensure_loaded(league_id, ["mTeam"])
+        return await self._get_response(key, _build_league_payload)
+
+    async def get_figure(self, league_id: int, figure_option: int, first_season: int = None,
+                         last_season: int = None) -> CachedResponse:
+        if figure_option not in FIGURE_OPTIONS:
+            raise StatsError(404, f'Unknown figure option {figure_option}')
+        key = (league_id, figure_option, first_season, last_season)
+        views = ["mTeam", "mMatchup"] if is_matchup_figure(figure_option) else ["mTeam"]
+        await self._ensure_loaded(league_id, views)
+
+        build_payload = _build_playoff_odds_payload \
+            if is_playoff_odds_figure(figure_option) else _build_figure_payload
+        return await self._get_response(
+            key, build_payload, figure_option, first_season, last_season)
+
+    async def _ensure_loaded(self, league_id: int, views: list):
+        """ Waits for the first load of a league's views. Once loaded they are served as
+            is, and refreshed in the background after refresh_seconds.
+        """
+        if league_id not in self.leagues:
+            raise StatsError(404, f'League {league_id} is not served here')
+
+        now = time.monotonic()
+        missing_views = [view for view in views if (league_id, view) not in self._loaded_at]
+        stale_views = [
+            view for view in views if view not in missing_views
+            and now - self._loaded_at[(league_id, view)] > self.refresh_seconds]
+        if len(missing_views) > 0 and await self._load(league_id, missing_views) is False:
+            raise StatsError(502, f'Unable to retrieve league {league_id} from ESPN')
+        if len(stale_views) > 0:
+            self._start_load(league_id, stale_views)
+
+    async def _load(self, league_id: int, views: list) -> bool:
+        results = await asyncio.shield(asyncio.gather(*self._start_load(league_id, views)))
+        return all(results)
+
+    def _start_load(self, league_id: int, views: list) -> list:
+        """ Returns the tasks loading views. A view already being loaded shares that
+            task; the rest are fetched together, one request per season, in a new one.
+        """
+        new_views = [view for view in views if (league_id, view) not in self._loads]
+        tasks = [self._loads[(league_id, view)] for view in views if view not in new_views]
+        if len(new_views) > 0:
+            task = asyncio.ensure_future(self._run_load(league_id, new_views))
+            for view in new_views:
+                key = (league_id, view)
+                self._loads[key] = task
+                task.add_done_callback(lambda _, key=key: self._loads.pop(key, None))
+            task.add_done_callback(_report_load_failure) #Background loads have no awaiter
+            tasks.append(task)
+        return tasks
+
+    async def _run_load(self, league_id: int, views: list) -> bool:
+        success = await asyncio.get_running_loop().run_in_executor(
+            None, self._refresh_league, league_id, views)
+        if success:
+            loaded_at = time.monotonic()
+            for view in views:
+                self._loaded_at[(league_id, view)] = loaded_at
+            self._generations[league_id] += 1
+            for key in [key for key in self._responses if key[0] == league_id]:
+                del self._responses[key]
+            for view in views:
+                await self._precompute(league_id, view)
+        return success
+
+    async def _precompute(self, league_id: int, view: str):
+        """ Builds the full history bodies of a freshly loaded view ahead of any request.
+            Playoff odds are simulated, so they wait until someone asks for them.
+        """
+        if view == "mMatchup":
+            figure_options = [
+                figure_option for figure_option in FIGURE_OPTIONS
+                if isinstance(figure_option, int) and is_matchup_figure(figure_option)
+                and is_playoff_odds_figure(figure_option) is False]
+        else:
+            await self._get_response((league_id, None, None, None), _build_league_payload)
+            figure_options = get_all_time_figure_options()
+
+        for figure_option in figure_options:
+            await self._get_response(
+                (league_id, figure_option, None, None), _build_figure_payload,
+                figure_option, None, None)
+
+    def _refresh_league(self, league_id: int, views: list) -> bool:
+        """ Nothing is locked while ESPN is fetched; the registry swaps the result into
+            the league under league_info.lock.
+        """
+        return self.registry.refresh([league_id], views)[league_id]
+
+    async def _get_response(self, key: tuple, build_payload, *arguments) -> CachedResponse:
+        """ Serves key from memory, building it on a worker thread the first time.
+            Past max_cached_responses the least recently served body is dropped.
+        """
+        response = self._responses.get(key)
+        if response is not None:
+            self._responses.move_to_end(key)
+            return response
+
+        league_id = key[0]
+        generation = self._generations[league_id]
+
+        def build() -> CachedResponse:
+            return CachedResponse(build_payload(self.registry.get(league_id), *arguments))
+        response = await asyncio.get_running_loop().run_in_executor(None, build)
+        if self._generations[league_id] == generation: #Not built from data reloaded since
+            self._responses[key] = response
+            while len(self._responses) > self.max_cached_responses:
+                self._responses.popitem(last=False)
+        return response
+
+def _report_load_failure(task: asyncio.Task):
+    if task.cancelled() is False and task.exception() is not None:
+        print('Loading league data failed', file=sys.stderr)
+        traceback.print_exception(task.exception())
+
+def _locked(build_payload):
+    """ Builds holding league_info.lock, so a body never mixes two refreshes. """
+    @wraps(build_payload)
+    def locked(league_info, *arguments):
+        with league_info.lock:
+            return build_payload(league_info, *arguments)
+    return locked
+
+@_locked
+def _build_league_payload(league_info) -> dict:
+    return {
+        'league_id': league_info.league_id,
+        'first_year': league_info.first_year,
+        'seasons': league_info.get_seasons(),
+        'teams': [
+            {'team_id': team_id, 'name': name}
+            for team_id, name in league_info.get_team_names().items()],
+        'figure_options': [
+            {'figure_option': figure_option, 'title': FIGURE_OPTIONS.get(figure_option)}
+            for figure_option in FIGURE_OPTIONS if isinstance(figure_option, int)]}
+
+@_locked
+def _build_figure_payload(league_info, figure_option: int, first_season: int,
+                          last_season: int) -> dict:
+    payload = _get_figure_payload_head(league_info, figure_option, first_season, last_season)
+    team_names = league_info.get_team_names()
+
+    if is_win_loss_margin_figure(figure_option):
+        distributions = league_info.matchup_table.get_season_range(
+            first_season, last_season).get_margin_distributions()
+        payload['teams'] = [
+            {'team_id': team_id, 'name': team_names.get(team_id, f'Team {team_id}'),
+             'regular': regular.tolist(), 'playoff': playoff.tolist()}
+            for team_id, (regular, playoff) in sorted(distributions.items())]
+        return payload
+
+    if is_head_to_head_figure(figure_option):
+        head_to_head = league_info.matchup_table.get_season_range(
+            first_season, last_season).get_head_to_head()
+        games_played = head_to_head.get_games_played()
+        payload['teams'] = [
+            {'team_id': team_id, 'name': team_names.get(team_id, f'Team {team_id}'),
+             'opponents': [
+                 dict(opponent_id=opponent_id,
+                      **head_to_head.get_record(team_id, opponent_id))
+                 for column, opponent_id in enumerate(head_to_head.team_ids)
+                 if games_played[row, column] > 0]}
+            for row, team_id in enumerate(head_to_head.team_ids)]
+        return payload
+
+    if is_all_play_figure(figure_option) or is_luck_figure(figure_option):
+        score_matrix = ScoreMatrix.from_games(league_info.matchup_table.get_season_range(
+            first_season, last_season).games)
+        records = score_matrix.get_all_play_records()
+        actual_wins = score_matrix.get_actual_wins()
+        expected_wins = score_matrix.get_expected_wins()
+        payload['teams'] = [
+            {'team_id': team_id, 'name': team_names.get(team_id, f'Team {team_id}'),
+             'all_play': dict(zip(['wins', 'losses', 'ties'], records[index].tolist())),
+             'actual_wins': float(actual_wins[index]),
+             'expected_wins': round(float(expected_wins[index]), 3),
+             'luck': round(float(actual_wins[index] - expected_wins[index]), 3)}
+            for index, team_id in enumerate(score_matrix.team_ids)]
+        return payload
+
+    if figure_option not in get_all_time_figure_options():
+        raise StatsError(404, f'Figure option {figure_option} has no per team values')
+    axes_labels = AxesLabels(figure_option)
+    figure_heights = league_info.get_figure_heights(figure_option, first_season, last_season)
+    payload['x_labels'] = axes_labels.x_labels
+    payload['y_label'] = axes_labels.y_label
+    payload['teams'] = [
+        {'team_id': team_id, 'name': team_names[team_id], 'values': values}
+        for team_id, values in zip(league_info.get_team_ids(), figure_heights)]
+    return payload
+
+def _build_playoff_odds_payload(league_info, figure_option: int, first_season: int,
+                                last_season: int) -> dict:
+    """ Holds league_info.lock only to read the schedule, not while simulating. """
+    with league_info.lock:
+        payload = _get_figure_payload_head(league_info, figure_option, first_season, last_season)
+        team_names = league_info.get_team_names()
+        simulation = PlayoffSimulation.from_matchup_table(league_info.matchup_table, last_season)
+    playoff_odds = get_playoff_odds(simulation)
+    payload['season'] = simulation.season
+    payload['simulations'] = DEFAULT_SIMULATIONS
+    payload['teams'] = [
+        {'team_id': team_id, 'name': team_names.get(team_id, f'Team {team_id}'),
+         'wins': float(simulation.wins[index]),
+         'playoff_odds': round(float(playoff_odds[index]), 2)}
+        for index, team_id in enumerate(simulation.team_ids)]
+    return payload
+
+def _get_figure_payload_head(league_info, figure_option: int, first_season: int,
+                             last_season: int) -> dict:
+    seasons = [
+        season for season in league_info.get_seasons()
+        if (first_season is None or season >= first_season)
+        and (last_season is None or season <= last_season)]
+    return {
+        'league_id': league_info.league_id,
+        'figure_option': figure_option,
+        'title': FIGURE_OPTIONS.get(figure_option),
+        'seasons': seasons}
+
+def _parse_request_head(head: bytes):
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, version = lines[0].split(' ')
+    headers = dict()
+    for line in lines[1:]:
+        if line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+def _format_response(status: int, response: CachedResponse, keep_alive: bool) -> bytes:
+    headers = [f'HTTP/1.1 {status} {STATUS_REASONS.get(status, "")}']
+    body = b''
+    if response is not None:
+        headers.append(f'ETag: {response.etag}')
+        if status != 304:
+            body = response.body
+            headers.append('Content-Type: application/json')
+    headers.append(f'Content-Length: {len(body)}')
+    headers.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body
+
+def _error_body(message: str) -> CachedResponse:
+    return CachedResponse({'error': message})
+
+def _parse_int(value: str, name: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise StatsError(400, f'Expected a number for {name}, got "{value}"')
+
+def _get_season_argument(query: dict, name: str) -> int:
+    values = query.get(name)
+    return _parse_int(values[0], name) if values else None
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        'leagues', nargs='*', type=parse_league_argument, metavar='LEAGUE_ID:FIRST_YEAR',
+        help='Leagues to serve. Defaults to the package default league.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        '--refresh-seconds', type=float, default=DEFAULT_REFRESH_SECONDS,
+        help='How long a loaded league is served before it is refreshed in the background.')
+    parsed = parser.parse_args(arguments)
+
+    stats_server = StatsServer(dict(parsed.leagues), refresh_seconds=parsed.refresh_seconds)
+    print(f'Serving league stats on http://{parsed.host}:{parsed.port}', file=sys.stderr)
+    try:
+        asyncio.run(stats_server.serve_forever(parsed.host, parsed.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,33 @@
 import datetime
 import os
-from multiprocessing import Pool
+from functools import partial
 from sys import exc_info
-import requests
+from ESPN_FFB import instrumentation
+from ESPN_FFB.espn_fetcher import ESPNFetcher, SeasonRequest, get_default_fetcher
+from ESPN_FFB.league_cache import get_default_league_cache
 from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.payload_projection import get_view_fields_hash, parse_response
+from ESPN_FFB.season_cache import SeasonCache, conditional_headers
 
 class URLInfo:
 
-    def __init__(self, view: str, league_info: LeagueInfo):
+    def __init__(self, view: str, league_info: LeagueInfo, season_cache: SeasonCache = None,
+                 fetcher: ESPNFetcher = None, api_host: str = None, cookies: list = None):
+        """ api_host replaces ESPN's scheme and host, e.g. to point at a local stand-in server.
+            cookies is [SWID, espn_s2]; by default they are read from cookies.txt.
+        """
+        self.api_host = api_host
+        self.seasons = self._get_seasons(league_info)
         self.urls = self._get_urls(league_info)
         self.view = view
-
-        cookies = self._get_cookies()
+        self.league_id = league_info.league_id
+        self.season_cache = season_cache if season_cache is not None \
+            else get_default_league_cache()
+        self.fetcher = fetcher if fetcher is not None else get_default_fetcher()
+        self.failed_seasons = list()
+
+        if cookies is None:
+            cookies = self._get_cookies()
         self.swid = cookies[0].strip()
         self.espn_s2 = cookies[1].strip()
 
@@ -34,25 +50,34 @@ class URLInfo:
         If no year is supplied, will start at the current year.
         """
         urls = list()
+        for season in self._get_seasons(league_info, year):
+            if len(urls) < 2: #Adding this check because 2 years currently use active url
+                urls.append(self._construct_url_current(league_info.league_id, season))
+            else:
+                urls.append(self._construct_url_historical(league_info.league_id, season))
+        return urls
+
+    def _get_seasons(self, league_info: LeagueInfo,
+                     year: int = datetime.datetime.now().year) -> list:
+        """ Returns the seasons to request, newest first, in the same order as _get_urls. """
+        seasons = list()
         if year < league_info.first_year:
-            return urls
+            return seasons
 
         if _is_year_active(year) is False:
             year -= 1
         while year >= league_info.first_year:
-            if len(urls) < 2: #Adding this check because 2 years currently use active url
-                urls.append(self._construct_url_current(league_info.league_id, year))
-            else:
-                urls.append(self._construct_url_historical(league_info.league_id, year))
+            seasons.append(year)
             year -= 1
-        return urls
+        return seasons
 
     def _construct_url_current(self, league_id: int, year: int) -> str:
         """
             Constructs "active" URLs for ESPN fantasy football.
             Active URLs appear to be used for the last 2 seasons.
         """
-        return "http://fantasy.espn.com/apis/v3/games/ffl/seasons" \
+        host = self.api_host or "http://fantasy.espn.com"
+        return f"{host}/apis/v3/games/ffl/seasons" \
         f"/{year}/segments/0/leagues/{league_id}"
 
     def _construct_url_historical(self, league_id: int, year: int) -> str:
@@ -60,37 +85,133 @@ class URLInfo:
             Constructs "historical" URLs for ESPN fantasy football.
             Historical URLs appear to be used for seasons more than 2 years back.
         """
-        return "https://fantasy.espn.com/apis/v3/games/ffl/leagueHistory" \
+        host = self.api_host or "https://fantasy.espn.com"
+        return f"{host}/apis/v3/games/ffl/leagueHistory" \
             f"/{league_id}?seasonId={year}"
 
-    def get_formatted_espn_data(self):
-        responses, all_requests_successful = self._request_espn_data()
-        parsed_response = list()
-        for response in responses:
-            if 'leagueHistory' in response.url:
-                response = response.json()[0]
-            else:
-                response = response.json()
-            parsed_response.append(response)
+    def get_formatted_espn_data(self, progress_callback=None, cancel_event=None):
+        """ Returns one parsed response per season, newest first. Seasons that are already
+            on disk are served from the season cache; only missing or stale ones hit ESPN.
 
-        return parsed_response, all_requests_successful
+            Seasons that fail are listed in failed_seasons. The ones that succeeded are still
+            written to the season cache, so a retry only requests what is missing.
 
-    def _request_espn_data(self):
-        success = True
-        process_pool = Pool()
-        try:
-            responses = process_pool.map(self._get_single_espn_response, self.urls)
-        except requests.exceptions.ConnectionError:
-            success = False
-        return responses, success
-
-    def _get_single_espn_response(self, url: str) -> list:
-        response = requests.get(
-            url,
+            progress_callback(completed, total) is called once per finished season.
+        """
+        with instrumentation.span(
+                'fetch', 'stage', league_id=self.league_id, view=self.view) as attributes:
+            parsed_response, success = self._get_formatted_espn_data(
+                progress_callback, cancel_event)
+            attributes['seasons'] = len(self.seasons)
+            attributes['failed_seasons'] = len(self.failed_seasons)
+        return parsed_response, success
+
+    def _get_formatted_espn_data(self, progress_callback=None, cancel_event=None):
+        pending_requests = self.get_pending_requests()
+        total = len(self.seasons)
+        completed = [total - len(pending_requests)]
+
+        def on_result(_):
+            completed[0] += 1
+            progress_callback(completed[0], total)
+
+        if progress_callback is not None:
+            progress_callback(completed[0], total)
+        fetch_results = self._request_espn_data(
+            pending_requests,
+            on_result if progress_callback is not None else None,
+            cancel_event)
+        return self.collect_responses(fetch_results)
+
+    def get_pending_requests(self) -> list:
+        """ Returns a SeasonRequest for every season the season cache can't serve.
+            Callers that batch several leagues send these themselves and hand the
+            results to collect_responses, in the same order.
+        """
+        self._parsed_response = [None] * len(self.urls)
+        self._cached_entries = dict()
+        pending_requests = list()
+
+        for index, season in enumerate(self.seasons):
+            entry = self.season_cache.get(
+                self.league_id, season, self.view, get_view_fields_hash(self.view))
+            if self.season_cache.is_fresh(
+                    entry, _is_active_season(season), _get_season_end(season)):
+                instrumentation.count('cache.hit')
+                self._parsed_response[index] = entry.payload
+                continue
+            instrumentation.count('cache.miss')
+            self._cached_entries[index] = entry
+            pending_requests.append(self._build_season_request(index, entry))
+        return pending_requests
+
+    def collect_responses(self, fetch_results: list):
+        parsed_response = self._parsed_response
+        for index, fetch_result in zip(self._cached_entries, fetch_results):
+            if fetch_result.success:
+                parsed_response[index] = self._store_response(
+                    self.seasons[index], fetch_result, self._cached_entries.get(index))
+
+        self.failed_seasons = [
+            self.seasons[index] for index, response in enumerate(parsed_response)
+            if response is None]
+        parsed_response = [response for response in parsed_response if response is not None]
+        return parsed_response, len(self.failed_seasons) == 0
+
+    def _build_season_request(self, index: int, cached_entry) -> SeasonRequest:
+        return SeasonRequest(
+            self.seasons[index],
+            self.urls[index],
             params={"view": self.view},
+            headers=conditional_headers(cached_entry),
             cookies={"SWID": self.swid,
-                     "espn_s2": self.espn_s2})
-        return response
+                     "espn_s2": self.espn_s2},
+            parser=partial(
+                parse_response, view=self.view,
+                is_list='leagueHistory' in self.urls[index]))
+
+    def _store_response(self, season: int, fetch_result, cached_entry):
+        """ Payloads arrive already projected to the fields this view's consumers read. """
+        response = fetch_result.response
+        if response.status_code == 304 and cached_entry is not None:
+            instrumentation.count('cache.revalidated')
+            return self.season_cache.touch(
+                self.league_id, season, self.view, cached_entry).payload
+        if response.status_code != 200:
+            return None
+
+        payload = fetch_result.payload
+        self.season_cache.put(
+            self.league_id, season, self.view, payload,
+            response.headers.get('ETag'), response.headers.get('Last-Modified'),
+            get_view_fields_hash(self.view))
+        return payload
+
+    def _request_espn_data(self, pending_requests: list, on_result=None,
+                           cancel_event=None) -> list:
+        if len(pending_requests) == 0:
+            return list()
+        return self.fetcher.fetch(pending_requests, on_result, cancel_event)
+
+def _get_current_season() -> int:
+    """ Returns the newest season ESPN has data for. Before the NFL starts this is last year. """
+    year = datetime.date.today().year
+    if _is_year_active(year) is False:
+        year -= 1
+    return year
+
+def _is_active_season(season: int) -> bool:
+    """ Only the newest season can still change. Every older season is final. """
+    return season >= _get_current_season()
+
+def _get_season_end(season: int) -> float:
+    """ Returns when season stopped being active, as a timestamp: the start of the next
+        NFL season. None while season is still active.
+    """
+    if _is_active_season(season):
+        return None
+    next_year = season + 1
+    return datetime.datetime(next_year, 9, _get_first_september_monday(next_year) + 6).timestamp()
 
 def _is_year_active(year: int) -> bool:
     """ NFL seasons start the weekend after the first Monday of September.
@@ -0,0 +1,59 @@
+from matplotlib.figure import Figure
+import numpy as np
+from ESPN_FFB import instrumentation
+from ESPN_FFB.constants import AXES_LABELS, FIGURE_SIZE
+from ESPN_FFB.figure_options import FIGURE_OPTIONS, get_figure_title
+from ESPN_FFB.league_info import LeagueInfo
+
+def draw_win_loss_margin_graph(figure: Figure, league_info: LeagueInfo,
+                               first_season: int = None, last_season: int = None) -> Figure:
+    """ Draws the chart from already loaded history onto figure, replacing what was there.
+        first_season and last_season limit the chart to an inclusive range of seasons.
+    """
+    figure.clear()
+    matchup_table = league_info.matchup_table.get_season_range(first_season, last_season)
+    prepare_margin_figure(
+        matchup_table.get_margin_distributions(), league_info.get_team_names(), figure)
+    figure.axes[0].set_title(get_figure_title(
+        FIGURE_OPTIONS.get("Win/Loss Margins"), first_season, last_season))
+    return figure
+
+def prepare_margin_figure(margin_distributions: dict, team_names: dict,
+                          figure: Figure = None) -> Figure:
+    """ Draws a regular season and a playoff box per team, side by side.
+        A new standalone figure is created unless one is given.
+    """
+    figure_option = FIGURE_OPTIONS.get("Win/Loss Margins")
+    with instrumentation.span('render', 'render', figure_option=figure_option):
+        if figure is None:
+            figure = Figure(figsize=FIGURE_SIZE)
+        _draw_margin_boxes(figure, margin_distributions, team_names)
+        return figure
+
+def _draw_margin_boxes(figure: Figure, margin_distributions: dict, team_names: dict):
+    team_ids = sorted(margin_distributions)
+    positions = np.arange(len(team_ids))
+    axes = figure.add_subplot()
+
+    if len(team_ids) > 0: #No finished games yet, e.g. pre-season: labelled empty axes
+        regular_boxes = generate_boxes(
+            axes, [margin_distributions[team][0] for team in team_ids], positions - 0.2,
+            'tab:blue')
+        playoff_boxes = generate_boxes(
+            axes, [margin_distributions[team][1] for team in team_ids], positions + 0.2,
+            'tab:orange')
+        axes.legend(
+            [regular_boxes['boxes'][0], playoff_boxes['boxes'][0]], ['Regular', 'Playoff'],
+            fontsize='medium', shadow=True, title='Games', title_fontsize='large')
+
+    axes.axhline(0, ls='--', color='gray')
+    axes.set_title(FIGURE_OPTIONS.get("Win/Loss Margins"))
+    axes.set_ylabel(AXES_LABELS.get(3))
+    axes.set_xticks(positions)
+    axes.set_xticklabels([team_names.get(team, f'Team {team}') for team in team_ids])
+    figure.tight_layout()
+
+def generate_boxes(axes, margins: list, positions, color: str) -> dict:
+    return axes.boxplot(
+        margins, positions=positions, widths=0.35, patch_artist=True,
+        boxprops={'facecolor': color, 'alpha': 0.7}, medianprops={'color': 'black'})
@@ -0,0 +1,5 @@
+import sys
+import ESPN_FFB.batch_render as batch_render
+
+if __name__ == "__main__":
+    sys.exit(batch_render.main())
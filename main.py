@@ -1,4 +1,7 @@
+import sys
+import time
+STARTUP_TIME = time.perf_counter()
 import ESPN_FFB.ffb_stats as FFB
 
 if __name__ == "__main__":
-    FFB.start_application()
+    FFB.start_application(STARTUP_TIME if '--startup-timing' in sys.argv else None)
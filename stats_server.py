@@ -0,0 +1,5 @@
+import sys
+import ESPN_FFB.stats_server as stats_server
+
+if __name__ == "__main__":
+    sys.exit(stats_server.main())
@@ -0,0 +1,138 @@
+""" Times the fetch/parse, aggregate and render stages against synthetic leagues of growing size.
+
+    python -m test.benchmark_FFB [--latency 0.05] [--repeat 5] [--json bench_output.json]
+
+Fetches go to a local SyntheticESPNServer, so the numbers are reproducible offline.
+"""
+import argparse
+import json
+import tempfile
+import time
+import matplotlib
+matplotlib.use('Agg')
+from ESPN_FFB.all_time_standings import prepare_figure
+from ESPN_FFB.axes_labels import AxesLabels
+from ESPN_FFB.espn_fetcher import ESPNFetcher
+from ESPN_FFB.figure_options import get_all_time_figure_options
+from ESPN_FFB.league_info import LeagueInfo
+from ESPN_FFB.matchup_info import MatchupTable
+from ESPN_FFB.season_cache import SeasonCache
+from ESPN_FFB.url_info import URLInfo, _get_current_season
+from test.synthetic_league import SyntheticESPNServer, SyntheticLeague
+
+LEAGUE_SIZES = [ #(teams, seasons, weeks)
+    (8, 5, 14),
+    (12, 10, 14),
+    (16, 25, 17),
+    (16, 60, 17)
+]
+
+def time_stage(stage, repeat: int) -> float:
+    """ Best of repeat runs of stage(), in milliseconds. """
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def benchmark_league_size(team_count: int, season_count: int, week_count: int,
+                          latency: float, repeat: int) -> dict:
+    league = SyntheticLeague(
+        team_count, season_count, week_count, last_season=_get_current_season())
+    league_info = LeagueInfo(league.league_id, league.first_season)
+    fetcher = ESPNFetcher()
+    results = {'teams': team_count, 'seasons': season_count, 'weeks': week_count}
+
+    with SyntheticESPNServer([league], latency) as server, \
+            tempfile.TemporaryDirectory() as cache_directory:
+
+        def fetch_cold():
+            url_info = URLInfo(
+                "mTeam", league_info, SeasonCache(tempfile.mkdtemp(dir=cache_directory)),
+                fetcher, server.api_host, ['', ''])
+            return url_info.get_formatted_espn_data()
+
+        warm_cache = SeasonCache(cache_directory)
+        URLInfo("mTeam", league_info, warm_cache, fetcher, server.api_host, ['', '']) \
+            .get_formatted_espn_data()
+
+        def fetch_warm():
+            url_info = URLInfo(
+                "mTeam", league_info, warm_cache, fetcher, server.api_host, ['', ''])
+            return url_info.get_formatted_espn_data()
+
+        results['fetch_parse_cold_ms'] = time_stage(fetch_cold, repeat)
+        results['fetch_parse_warm_ms'] = time_stage(fetch_warm, repeat)
+        results['requests_served'] = server.request_count
+    fetcher.close()
+
+    responses = league.get_responses("mTeam")
+
+    def aggregate_cold():
+        fresh_league_info = LeagueInfo(league.league_id, league.first_season)
+        fresh_league_info.cached_responses = responses
+        for figure_option in get_all_time_figure_options():
+            fresh_league_info.get_figure_heights(figure_option)
+
+    league_info.cached_responses = responses
+
+    def aggregate_warm():
+        for figure_option in get_all_time_figure_options():
+            league_info.get_figure_heights(figure_option)
+
+    results['aggregate_cold_ms'] = time_stage(aggregate_cold, repeat)
+    results['aggregate_warm_ms'] = time_stage(aggregate_warm, repeat)
+
+    def season_range():
+        for figure_option in get_all_time_figure_options():
+            league_info.get_figure_heights(
+                figure_option, league.first_season + 1, league.last_season - 1)
+
+    results['season_range_ms'] = time_stage(season_range, repeat)
+
+    matchup_responses = league.get_responses("mMatchup")
+    results['matchup_table_ms'] = time_stage(
+        lambda: MatchupTable.from_responses(matchup_responses).get_margin_distributions(), repeat)
+
+    team_names = list(league_info.get_team_names().values())
+    figure_heights = {
+        figure_option: league_info.get_figure_heights(figure_option)
+        for figure_option in get_all_time_figure_options()}
+
+    def render():
+        for figure_option, heights in figure_heights.items():
+            figure = prepare_figure(figure_option, heights, AxesLabels(figure_option), team_names)
+            figure.canvas.draw()
+
+    results['render_ms'] = time_stage(render, repeat)
+    return results
+
+def print_results(all_results: list):
+    columns = [key for key in all_results[0]]
+    print(' '.join(f'{column:>20}' for column in columns))
+    for results in all_results:
+        print(' '.join(
+            f'{results[column]:>20.2f}' if isinstance(results[column], float)
+            else f'{results[column]:>20}' for column in columns))
+
+def main(arguments: list = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Seconds the stand-in server waits before every response.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this file.')
+    parsed = parser.parse_args(arguments)
+
+    all_results = [
+        benchmark_league_size(team_count, season_count, week_count, parsed.latency, parsed.repeat)
+        for team_count, season_count, week_count in LEAGUE_SIZES]
+    print_results(all_results)
+
+    if parsed.json_path:
+        with open(parsed.json_path, 'w') as json_file:
+            json.dump(all_results, json_file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIRST_NAMES = [
+    "DJ", "Nick", "Tim", "Joe", "Davey", "Jason", "Ben", "Drew", "Luke", "Jack", "Tony", "Dano",
+    "Sam", "Alex", "Chris", "Pat", "Max", "Lee", "Jo", "Kim"
+]
+ROSTER_SIZE = 8
+STARTER_COUNT = 6
+
+class SyntheticLeague:
+    """ ESPN shaped mTeam and mMatchup payloads for team_count teams x season_count
+        seasons x week_count weeks. Records in mTeam agree with the mMatchup schedule.
+        The same seed always produces the same league.
+    """
+
+    def __init__(self, team_count: int = 12, season_count: int = 10, week_count: int = 14,
+                 league_id: int = 1, last_season: int = 2023, seed: int = 0):
+        self.team_count = team_count
+        self.season_count = season_count
+        self.week_count = week_count
+        self.league_id = league_id
+        self.last_season = last_season
+        self.first_season = last_season - season_count + 1
+
+        generator = random.Random(seed)
+        self.payloads = {"mTeam": dict(), "mMatchup": dict()}
+        for season in range(self.first_season, last_season + 1):
+            schedule = self._generate_schedule(season, generator)
+            self.payloads["mMatchup"][season] = {
+                'id': league_id, 'seasonId': season, 'schedule': schedule}
+            self.payloads["mTeam"][season] = self._generate_teams(season, schedule)
+
+    def get_payload(self, season: int, view: str) -> dict:
+        return self.payloads[view][season]
+
+    def get_box_score(self, season: int, week: int) -> dict:
+        """ An mBoxscore payload for one scoring period: ROSTER_SIZE players per team,
+            the first STARTER_COUNT of them starting. Players keep their team every season.
+        """
+        generator = random.Random(season * 100 + week)
+        schedule = list()
+        for game in self.payloads["mMatchup"][season]['schedule']:
+            if game['matchupPeriodId'] != week:
+                continue
+            schedule.append({
+                'id': game['id'],
+                'home': _generate_roster(game['home']['teamId'], generator),
+                'away': _generate_roster(game['away']['teamId'], generator)})
+        return {'id': self.league_id, 'seasonId': season, 'scoringPeriodId': week,
+                'schedule': schedule}
+
+    def get_responses(self, view: str = "mTeam") -> list:
+        """ Newest season first, like URLInfo.get_formatted_espn_data. """
+        return [self.payloads[view][season]
+                for season in range(self.last_season, self.first_season - 1, -1)]
+
+    def _generate_schedule(self, season: int, generator: random.Random) -> list:
+        team_ids = list(range(1, self.team_count + 1))
+        schedule = list()
+        for week in range(1, self.week_count + 1):
+            pairings = _round_robin_week(team_ids, week - 1)
+            for home_id, away_id in pairings:
+                home_points = round(generator.gauss(110, 25), 2)
+                away_points = round(generator.gauss(110, 25), 2)
+                schedule.append({
+                    'id': len(schedule) + 1,
+                    'matchupPeriodId': week,
+                    'playoffTierType': 'NONE',
+                    'winner': _get_winner(home_points, away_points),
+                    'home': {'teamId': home_id, 'totalPoints': home_points},
+                    'away': {'teamId': away_id, 'totalPoints': away_points}})
+        return schedule
+
+    def _generate_teams(self, season: int, schedule: list) -> dict:
+        records = {
+            team_id: {'wins': 0, 'losses': 0, 'ties': 0, 'pointsFor': 0.0, 'pointsAgainst': 0.0}
+            for team_id in range(1, self.team_count + 1)}
+        for game in schedule:
+            _add_game(records[game['home']['teamId']], game['home'], game['away'])
+            _add_game(records[game['away']['teamId']], game['away'], game['home'])
+
+        members = list()
+        teams = list()
+        for team_id, record in records.items():
+            member_id = f'{{MEMBER-{team_id}}}'
+            members.append({
+                'id': member_id,
+                'firstName': FIRST_NAMES[(team_id - 1) % len(FIRST_NAMES)],
+                'lastName': f'Owner{team_id}'})
+            record['pointsFor'] = round(record['pointsFor'], 2)
+            record['pointsAgainst'] = round(record['pointsAgainst'], 2)
+            teams.append({
+                'id': team_id,
+                'location': 'Team',
+                'nickname': str(team_id),
+                'primaryOwner': member_id,
+                'record': {'overall': record}})
+        return {'id': self.league_id, 'seasonId': season, 'members': members, 'teams': teams}
+
+class SyntheticESPNServer:
+    """ Local stand-in for ESPN's API that serves SyntheticLeague payloads.
+        Every response waits latency seconds first, to mimic a real round-trip.
+        Responses carry an ETag, and a matching If-None-Match gets 304 Not Modified.
+        Pass api_host to URLInfo to point it here.
+    """
+
+    def __init__(self, leagues: list, latency: float = 0.0):
+        self.leagues = {league.league_id: league for league in leagues}
+        self.latency = latency
+        self.request_count = 0
+        self.not_modified_count = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._build_handler())
+        self._server.daemon_threads = True
+        self.api_host = f'http://127.0.0.1:{self._server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _find_payload(self, path: str, query: dict):
+        current = re.match(r'/apis/v3/games/ffl/seasons/(\d+)/segments/0/leagues/(\d+)$', path)
+        historical = re.match(r'/apis/v3/games/ffl/leagueHistory/(\d+)$', path)
+        if current:
+            season, league_id = int(current.group(1)), int(current.group(2))
+        elif historical and 'seasonId' in query:
+            season, league_id = int(query['seasonId'][0]), int(historical.group(1))
+        else:
+            return None
+
+        league = self.leagues.get(league_id)
+        views = query.get('view', ["mTeam"])
+        if league is None or season not in league.payloads["mTeam"]:
+            return None
+        if views == ["mBoxscore"]:
+            payload = league.get_box_score(season, int(query.get('scoringPeriodId', [1])[0]))
+            return [payload] if historical else payload
+
+        payload = dict()
+        for view in views:
+            payload.update(league.get_payload(season, view))
+        return [payload] if historical else payload
+
+    def _build_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                server.request_count += 1
+                time.sleep(server.latency)
+                url = urlparse(self.path)
+                payload = server._find_payload(url.path, parse_qs(url.query))
+                if payload is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                body = json.dumps(payload).encode()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    server.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+def _generate_roster(team_id: int, generator: random.Random) -> dict:
+    entries = list()
+    for slot in range(ROSTER_SIZE):
+        player_id = team_id * 100 + slot
+        entries.append({
+            'playerId': player_id,
+            'lineupSlotId': slot if slot < STARTER_COUNT else 20,
+            'playerPoolEntry': {
+                'appliedStatTotal': round(max(generator.gauss(10, 6), 0), 2),
+                'player': {'id': player_id, 'fullName': f'Player {team_id}-{slot}'}}})
+    return {'teamId': team_id, 'rosterForCurrentScoringPeriod': {'entries': entries}}
+
+def _round_robin_week(team_ids: list, round_index: int) -> list:
+    """ Circle method pairings. With an odd team count one team sits out each week. """
+    rotation = list(team_ids)
+    if len(rotation) % 2 == 1:
+        rotation.append(None)
+    fixed, rotating = rotation[0], rotation[1:]
+    shift = round_index % len(rotating)
+    rotation = [fixed] + rotating[shift:] + rotating[:shift]
+
+    half = len(rotation) // 2
+    pairings = zip(rotation[:half], reversed(rotation[half:]))
+    return [(home, away) for home, away in pairings if home is not None and away is not None]
+
+def _get_winner(home_points: float, away_points: float) -> str:
+    if home_points > away_points:
+        return 'HOME'
+    if away_points > home_points:
+        return 'AWAY'
+    return 'TIE'
+
+def _add_game(record: dict, team: dict, opponent: dict):
+    if team['totalPoints'] > opponent['totalPoints']:
+        record['wins'] += 1
+    elif team['totalPoints'] < opponent['totalPoints']:
+        record['losses'] += 1
+    else:
+        record['ties'] += 1
+    record['pointsFor'] += team['totalPoints']
+    record['pointsAgainst'] += opponent['totalPoints']
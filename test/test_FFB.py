@@ -2,9 +2,56 @@ import unittest
 import os
 import datetime
 import json
+import copy
+import io
+import contextlib
+import struct
+import tempfile
+import threading
+import time
+import asyncio
+from functools import partial
+import requests
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.figure import Figure
 import main
 from ESPN_FFB.axes_labels import AxesLabels
-from ESPN_FFB.url_info import URLInfo, _is_year_active, _is_september_date_after_nfl_start
+from ESPN_FFB.url_info import (URLInfo, _is_year_active, _is_september_date_after_nfl_start,
+                               _is_active_season, _get_current_season, _get_season_end)
+from ESPN_FFB.season_cache import SeasonCache, conditional_headers
+from ESPN_FFB.league_cache import LeagueCache, get_payload_size
+from ESPN_FFB.espn_fetcher import ESPNFetcher, FetchCancelled, SeasonRequest
+from ESPN_FFB.background_worker import BackgroundWorker
+from ESPN_FFB import instrumentation, startup_timing
+from test.synthetic_league import SyntheticESPNServer, SyntheticLeague
+from ESPN_FFB import payload_projection
+from ESPN_FFB.payload_projection import (PayloadError, get_fields_hash, get_view_fields,
+                                         parse_fields, project, stream_project)
+from ESPN_FFB.batch_render import RenderJob, render_league
+from ESPN_FFB.figure_options import get_all_time_figure_options
+from ESPN_FFB.league_registry import LeagueRegistry
+from ESPN_FFB.fetch_planner import FetchPlanner, apply_responses
+from ESPN_FFB.single_flight import SingleFlight, wait_for
+from ESPN_FFB.league_history import load_player_history
+from ESPN_FFB import league_export
+from ESPN_FFB.league_export import (EXPORT_TABLES, ExportError, export_cached_league,
+                                    export_league, get_table_path)
+from ESPN_FFB.player_store import PlayerStore
+from ESPN_FFB import stats_server
+from ESPN_FFB.stats_server import StatsServer
+from ESPN_FFB.live_season import LiveSeasonPoller, is_game_window
+from ESPN_FFB.league_snapshot import (LeagueSnapshot, SnapshotError, build_snapshot,
+                                      verify_snapshot, write_snapshot)
+from ESPN_FFB.all_time_standings import draw_all_time_graph, prepare_figure, get_all_time_chart
+from ESPN_FFB.matchup_info import MatchupTable
+from ESPN_FFB.head_to_head_heatmap import prepare_head_to_head_figure
+from ESPN_FFB.league_analytics import (DEFAULT_BATCH_SIZE, DEFAULT_SIMULATIONS, PlayoffSimulation,
+                                       ScoreMatrix, get_playoff_odds, get_simulation_pool)
+from ESPN_FFB.analytics_charts import prepare_luck_figure, simulate_playoff_odds
+from ESPN_FFB.win_loss_margin import draw_win_loss_margin_graph, prepare_margin_figure
 from ESPN_FFB.league_info import LeagueInfo
 from ESPN_FFB.constants import STATS_TAGS, AXES_LABELS, ESPN_ID_TO_TEAM
 from ESPN_FFB.figure_options import FIGURE_OPTIONS
@@ -17,6 +64,35 @@ def get_sample_json():
     open_file.close()
     return sample_json
 
+def get_sample_figure_heights(figure_option: int) -> list:
+    league_info = LeagueInfo()
+    league_info.cached_responses = get_sample_json()
+    return league_info.get_figure_heights(figure_option)
+
+def get_sample_matchup_json(season: int = 2019):
+    """ A four team season: two regular season weeks, a playoff week with a bye
+        and an undecided game.
+    """
+    def game(week, home_id, home_points, away_id=None, away_points=0.0,
+             playoff_tier='NONE', winner=None):
+        matchup = {
+            'matchupPeriodId': week,
+            'playoffTierType': playoff_tier,
+            'home': {'teamId': home_id, 'totalPoints': home_points}}
+        if away_id is not None:
+            matchup['away'] = {'teamId': away_id, 'totalPoints': away_points}
+        if winner is None:
+            winner = 'HOME' if home_points > away_points else 'AWAY'
+        matchup['winner'] = winner
+        return matchup
+
+    return {'seasonId': season, 'schedule': [
+        game(1, 1, 100.0, 2, 90.0), game(1, 3, 80.0, 4, 120.5),
+        game(2, 1, 70.0, 3, 75.0), game(2, 2, 110.0, 4, 95.0),
+        game(15, 1, 101.0, 4, 99.0, 'WINNERS_BRACKET'),
+        game(15, 2, 0.0, playoff_tier='WINNERS_BRACKET', winner='UNDECIDED'),
+        game(16, 1, 0.0, 4, 0.0, 'WINNERS_BRACKET', 'UNDECIDED')]}
+
 class ApplicationWindowTests(unittest.TestCase):
 
     def setUp(self):
@@ -50,6 +126,47 @@ class ApplicationWindowTests(unittest.TestCase):
                     "League info is not returning the right number " \
                     "of bar heights for Points figures.")
 
+    def test_adjusted_figure_heights(self):
+        raw_records = self.league_info.get_figure_heights(FIGURE_OPTIONS.get("All Time Record"))
+        adjusted_records = self.league_info.get_figure_heights(
+            FIGURE_OPTIONS.get("All Time Record - Adjusted (%)"))
+        raw_points = self.league_info.get_figure_heights(FIGURE_OPTIONS.get("All Time Points"))
+        adjusted_points = self.league_info.get_figure_heights(
+            FIGURE_OPTIONS.get("All Time Points - Adjusted (Per Game)"))
+
+        for team in ESPN_ID_TO_TEAM:
+            games_played = sum(raw_records[team - 1])
+            self.assertAlmostEqual(sum(adjusted_records[team - 1]), 100, delta=0.2)
+            self.assertEqual(
+                adjusted_points[team - 1][0], round(raw_points[team - 1][0] / games_played, 1))
+
+    def test_incremental_season_updates(self):
+        all_time_record = FIGURE_OPTIONS.get("All Time Record")
+        single_season = self.league_info.get_figure_heights(all_time_record)
+
+        previous_season = copy.deepcopy(self.league_info.cached_responses[0])
+        previous_season['seasonId'] -= 1
+        self.assertTrue(self.league_info.update_season(previous_season))
+        two_seasons = self.league_info.get_figure_heights(all_time_record)
+        self.assertEqual(two_seasons[0], [2 * stat for stat in single_season[0]])
+
+        replacement = copy.deepcopy(previous_season)
+        replacement['teams'][0]['record']['overall']['wins'] += 1
+        self.assertTrue(self.league_info.update_season(replacement))
+        self.assertFalse(self.league_info.update_season(copy.deepcopy(replacement)))
+        self.assertEqual(
+            self.league_info.get_figure_heights(all_time_record)[0][0], two_seasons[0][0] + 1)
+        self.assertEqual(len(self.league_info.cached_responses), 2)
+
+        self.league_info.cached_responses = get_sample_json()
+        self.assertEqual(self.league_info.get_figure_heights(all_time_record), single_season)
+
+    def test_team_names_from_payload(self):
+        team_names = self.league_info.get_team_names()
+        self.assertEqual(self.league_info.get_team_count(), 12)
+        self.assertEqual(team_names.get(2), "Nick")
+        self.assertEqual(team_names.get(9), "Luke")
+
     def test_axes_labels(self):
         raw_data_figures = [FIGURE_OPTIONS.get(0), FIGURE_OPTIONS.get(1)]
         season_adjusted_figures = [FIGURE_OPTIONS.get(2), FIGURE_OPTIONS.get(3)]
@@ -131,5 +248,1318 @@ class ApplicationWindowTests(unittest.TestCase):
                 _is_september_date_after_nfl_start(date),
                 f"Date {date} is before NFL start, but your code disagrees.")
 
+class SeasonCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.season_cache = SeasonCache(self.cache_directory.name, active_season_ttl=60)
+
+    def tearDown(self):
+        self.cache_directory.cleanup()
+
+    def test_round_trip(self):
+        payload = get_sample_json()[0]
+        self.season_cache.put(368182, 2019, "mTeam", payload, etag='"abc"')
+
+        entry = self.season_cache.get(368182, 2019, "mTeam")
+        self.assertEqual(entry.payload, payload)
+        self.assertEqual(conditional_headers(entry), {'If-None-Match': '"abc"'})
+        self.assertIsNone(self.season_cache.get(368182, 2019, "mMatchup"))
+
+    def test_completed_seasons_never_expire(self):
+        entry = self.season_cache.put(368182, 2015, "mTeam", {})
+        entry.fetched_at = time.time() - 10 * 365 * 24 * 60 * 60
+        self.assertTrue(self.season_cache.is_fresh(entry, is_active_season=False))
+        self.assertFalse(self.season_cache.is_fresh(entry, is_active_season=True))
+
+    def test_completed_season_fetched_mid_season_is_revalidated(self):
+        season = _get_current_season() - 1
+        season_end = _get_season_end(season)
+        self.assertIsNone(_get_season_end(season + 1))
+
+        entry = self.season_cache.put(368182, season, "mTeam", {}, etag='"abc"')
+        entry.fetched_at = season_end - 60
+        self.assertFalse(self.season_cache.is_fresh(entry, False, season_end))
+        entry = self.season_cache.touch(368182, season, "mTeam", entry) #ESPN answered 304
+        self.assertTrue(self.season_cache.is_fresh(entry, False, season_end))
+
+    def test_clear_single_league(self):
+        self.season_cache.put(1, 2019, "mTeam", {})
+        self.season_cache.put(2, 2019, "mTeam", {})
+        self.season_cache.clear(1)
+        self.assertIsNone(self.season_cache.get(1, 2019, "mTeam"))
+        self.assertIsNotNone(self.season_cache.get(2, 2019, "mTeam"))
+
+    def test_only_newest_season_is_active(self):
+        current_season = _get_current_season()
+        self.assertTrue(_is_active_season(current_season))
+        self.assertFalse(_is_active_season(current_season - 1))
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """ Answers 503 to the first request for /flaky, then 200. /down always fails.
+        /limited answers 429 with an hour long Retry-After first. /html and /empty_history
+        answer 200 with a body that isn't a season.
+    """
+    attempts = dict()
+
+    def do_GET(self):
+        attempt = FlakyHandler.attempts.get(self.path, 0)
+        FlakyHandler.attempts[self.path] = attempt + 1
+        if self.path == '/limited' and attempt == 0:
+            body = b'{"error": "rate limited"}'
+            self.send_response(429)
+            self.send_header('Retry-After', '3600')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path in ('/html', '/empty_history'):
+            body = b'<html>Service Unavailable' if self.path == '/html' else b'[]'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path == '/down' or (self.path == '/flaky' and attempt == 0):
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class LeagueCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.season_cache = SeasonCache(self.cache_directory.name)
+        self.payload = {'seasonId': 2019, 'teams': [{'id': team_id} for team_id in range(12)]}
+        self.payload_size = get_payload_size(self.payload)
+
+    def tearDown(self):
+        self.cache_directory.cleanup()
+
+    def test_entries_projected_to_other_fields_miss(self):
+        fields_hash = get_fields_hash({'seasonId', 'teams[].id'})
+        new_fields_hash = get_fields_hash({'seasonId', 'teams[].id', 'teams[].abbrev'})
+        league_cache = LeagueCache(self.season_cache)
+        league_cache.put(1, 2019, "mTeam", self.payload, fields_hash=fields_hash)
+
+        self.assertIsNotNone(league_cache.get(1, 2019, "mTeam", fields_hash))
+        self.assertIsNone(league_cache.get(1, 2019, "mTeam", new_fields_hash))
+        self.assertIsNone(self.season_cache.get(1, 2019, "mTeam", new_fields_hash))
+        self.assertEqual(league_cache.get_stats()['misses'], 1)
+
+    def test_hits_and_misses(self):
+        self.season_cache.put(1, 2019, "mTeam", self.payload)
+        league_cache = LeagueCache(self.season_cache)
+        self.assertEqual(league_cache.get(1, 2019, "mTeam").payload, self.payload)
+        self.assertIs(
+            league_cache.get(1, 2019, "mTeam"), league_cache.get(1, 2019, "mTeam"))
+        self.assertIsNone(league_cache.get(1, 2018, "mTeam"))
+
+        stats = league_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+        self.assertEqual(stats['size'], self.payload_size)
+
+    def test_least_recently_used_league_is_evicted(self):
+        league_cache = LeagueCache(self.season_cache, memory_budget=int(self.payload_size * 2.5))
+        league_cache.put(1, 2019, "mTeam", self.payload)
+        league_cache.put(2, 2019, "mTeam", self.payload)
+        league_cache.get(1, 2019, "mTeam")
+        league_cache.put(3, 2019, "mTeam", self.payload)
+
+        stats = league_cache.get_stats()
+        self.assertEqual((stats['evictions'], stats['leagues']), (1, 2))
+        self.assertEqual(league_cache.get_league_size(2), 0)
+        self.assertLessEqual(stats['size'], league_cache.memory_budget)
+        self.assertEqual(league_cache.get(2, 2019, "mTeam").payload, self.payload) #From disk
+
+    def test_clearing_one_season(self):
+        league_cache = LeagueCache(self.season_cache)
+        for season in (2018, 2019):
+            league_cache.put(1, season, "mTeam", self.payload)
+        league_cache.put(2, 2019, "mTeam", self.payload)
+
+        league_cache.clear(1, 2019)
+        self.assertEqual(league_cache.get_seasons(1, "mTeam"), [2018])
+        self.assertIsNone(league_cache.get(1, 2019, "mTeam"))
+        self.assertIsNotNone(league_cache.get(2, 2019, "mTeam"))
+        self.assertEqual(league_cache.get_stats()['size'], 2 * self.payload_size)
+
+        registry = LeagueRegistry(league_cache, cookies=['', ''])
+        stats = json.loads(asyncio.run(StatsServer(registry=registry).get('/cache')).body)
+        self.assertEqual(stats['leagues'], 2)
+
+class ESPNFetcherTests(unittest.TestCase):
+
+    def setUp(self):
+        FlakyHandler.attempts = dict()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.fetcher = ESPNFetcher(max_workers=2, max_retries=2, backoff_seconds=0.01)
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_partial_failure_keeps_successful_seasons(self):
+        results = self.fetcher.fetch([
+            SeasonRequest(2019, f'{self.base_url}/flaky'),
+            SeasonRequest(2018, f'{self.base_url}/down'),
+            SeasonRequest(2017, f'{self.base_url}/ok')])
+
+        self.assertEqual([result.season for result in results], [2019, 2018, 2017])
+        self.assertEqual([result.success for result in results], [True, False, True])
+        self.assertEqual(results[0].response.json(), {'path': '/flaky'})
+        self.assertEqual(FlakyHandler.attempts.get('/down'), 3)
+
+    def test_retry_after_is_capped_and_responses_closed(self):
+        fetcher = ESPNFetcher(max_workers=1, max_retries=1, max_backoff_seconds=0.05)
+        responses = list()
+        session_get = fetcher.session.get
+
+        def get(*args, **kwargs):
+            responses.append(session_get(*args, **kwargs))
+            return responses[-1]
+        fetcher.session.get = get
+
+        started = time.monotonic()
+        result = fetcher.fetch_single(SeasonRequest(
+            2019, f'{self.base_url}/limited', parser=lambda response: response.json()))
+        fetcher.close()
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(result.payload, {'path': '/limited'})
+        self.assertEqual(responses[0].status_code, 429)
+        self.assertTrue(responses[0].raw.closed)
+
+    def test_bodies_that_are_not_a_season_fail_only_their_season(self):
+        fields = {'path'}
+        results = self.fetcher.fetch([
+            SeasonRequest(2019, f'{self.base_url}/html', parser=partial(
+                parse_fields, fields=fields)),
+            SeasonRequest(2018, f'{self.base_url}/empty_history', parser=partial(
+                parse_fields, fields=fields, is_list=True)),
+            SeasonRequest(2017, f'{self.base_url}/ok', parser=partial(
+                parse_fields, fields=fields))])
+
+        self.assertEqual([result.success for result in results], [False, False, True])
+        self.assertIsInstance(results[0].error, PayloadError)
+        self.assertIsInstance(results[1].error, PayloadError)
+        self.assertEqual(results[2].payload, {'path': '/ok'})
+
+    def test_progress_and_cancellation(self):
+        finished_seasons = list()
+        results = self.fetcher.fetch(
+            [SeasonRequest(2019, f'{self.base_url}/ok')],
+            on_result=lambda result: finished_seasons.append(result.season))
+        self.assertEqual(finished_seasons, [2019])
+        self.assertTrue(results[0].success)
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        results = self.fetcher.fetch(
+            [SeasonRequest(season, f'{self.base_url}/down') for season in range(2010, 2020)],
+            cancel_event=cancel_event)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(isinstance(result.error, FetchCancelled) for result in results))
+
+class BatchRenderTests(unittest.TestCase):
+
+    def test_render_league(self):
+        league_info = LeagueInfo()
+        league_info.cached_responses = get_sample_json()
+        figure_heights = {
+            figure_option: league_info.get_figure_heights(figure_option)
+            for figure_option in get_all_time_figure_options()}
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            job = RenderJob(
+                league_info.league_id, figure_heights, league_info.get_team_names(),
+                output_directory, ['png', 'svg'], True,
+                MatchupTable.from_responses([get_sample_matchup_json()]).get_margin_distributions())
+            league_id, written_files = render_league(job)
+
+            self.assertEqual(league_id, league_info.league_id)
+            self.assertEqual(len(written_files), 2 * (len(figure_heights) + 1) + 1)
+            self.assertIn(os.path.join(output_directory, 'all_time_record.png'), written_files)
+            for path in written_files:
+                self.assertGreater(os.path.getsize(path), 0)
+
+class AllTimeChartTests(unittest.TestCase):
+
+    def test_chart_family_is_reused(self):
+        league_info = LeagueInfo()
+        league_info.cached_responses = get_sample_json()
+        team_names = list(league_info.get_team_names().values())
+        figure = Figure()
+
+        raw_option = FIGURE_OPTIONS.get("All Time Record")
+        adjusted_option = FIGURE_OPTIONS.get("All Time Record - Adjusted (%)")
+        raw_chart = get_all_time_chart(
+            figure, raw_option, league_info.get_figure_heights(raw_option),
+            AxesLabels(raw_option), team_names)
+        adjusted_heights = league_info.get_figure_heights(adjusted_option)
+        adjusted_chart = get_all_time_chart(
+            figure, adjusted_option, adjusted_heights, AxesLabels(adjusted_option), team_names,
+            raw_chart)
+
+        self.assertIs(adjusted_chart, raw_chart)
+        self.assertEqual(adjusted_chart.axes.get_title(), FIGURE_OPTIONS.get(adjusted_option))
+        self.assertEqual(
+            [rect.get_height() for rect in adjusted_chart.bars[0]], adjusted_heights[0])
+        self.assertEqual(adjusted_chart.labels[0][0].get_text(), str(adjusted_heights[0][0]))
+        self.assertFalse(adjusted_chart.labels[0][2].get_visible()) #No ties
+
+        points_option = FIGURE_OPTIONS.get("All Time Points")
+        points_chart = get_all_time_chart(
+            figure, points_option, league_info.get_figure_heights(points_option),
+            AxesLabels(points_option), team_names, adjusted_chart)
+        self.assertIsNot(points_chart, raw_chart)
+
+        renamed_chart = get_all_time_chart(
+            figure, points_option, league_info.get_figure_heights(points_option),
+            AxesLabels(points_option), team_names[::-1], points_chart)
+        self.assertIsNot(renamed_chart, points_chart)
+
+    def test_switching_charts_keeps_one_figure(self):
+        league_info = LeagueInfo()
+        league_info.cached_responses = get_sample_json()
+        league_info.matchup_table = MatchupTable.from_responses(
+            [get_sample_matchup_json(2019), get_sample_matchup_json(2018)])
+        figure = Figure()
+
+        chart = None
+        for _ in range(3):
+            for figure_option in get_all_time_figure_options():
+                chart = draw_all_time_graph(figure, league_info, figure_option, chart)
+            draw_win_loss_margin_graph(figure, league_info)
+            chart = None
+
+        self.assertEqual(len(figure.axes), 1)
+        self.assertEqual(plt.get_fignums(), []) #Nothing was handed to pyplot
+
+class LeagueRegistryTests(unittest.TestCase):
+
+    def test_register(self):
+        league_registry = LeagueRegistry(SeasonCache(tempfile.gettempdir()))
+        first_league = league_registry.register(1, 2015)
+        self.assertIs(league_registry.register(1, 2015), first_league)
+        league_registry.register(2, 2018)
+
+        self.assertEqual(league_registry.get_league_ids(), [1, 2])
+        self.assertEqual(league_registry.register(1, 2012).first_year, 2012)
+        league_registry.unregister(2)
+        self.assertIsNone(league_registry.get(2))
+
+    def test_bar_layout_any_team_count(self):
+        figure_option = FIGURE_OPTIONS.get("All Time Points")
+        for team_count in [8, 10, 14, 16]:
+            figure_heights = [[100 + team, 90 + team] for team in range(team_count)]
+            team_names = [f'Team {team}' for team in range(team_count)]
+            figure = prepare_figure(
+                figure_option, figure_heights, AxesLabels(figure_option), team_names)
+
+            bars = [patch for patch in figure.axes[0].patches]
+            self.assertEqual(len(bars), 2 * team_count)
+            first_group = sorted(bars, key=lambda bar: bar.get_x())[:team_count]
+            group_left = first_group[0].get_x()
+            group_right = first_group[-1].get_x() + first_group[-1].get_width()
+            self.assertAlmostEqual((group_left + group_right) / 2, 0)
+
+class MatchupTableTests(unittest.TestCase):
+
+    def setUp(self):
+        self.matchup_table = MatchupTable.from_responses(
+            [get_sample_matchup_json(2019), get_sample_matchup_json(2018)])
+
+    def test_finished_games_only(self):
+        self.assertEqual(len(self.matchup_table), 10)
+        self.assertEqual(self.matchup_table.get_seasons(), [2018, 2019])
+        self.assertEqual(self.matchup_table.get_team_ids(), [1, 2, 3, 4])
+        self.assertEqual(self.matchup_table.games['season'][0], 2018)
+
+    def test_margin_distributions(self):
+        distributions = self.matchup_table.get_margin_distributions()
+        regular_margins, playoff_margins = distributions.get(1)
+        self.assertEqual(sorted(regular_margins.tolist()), [-5.0, -5.0, 10.0, 10.0])
+        self.assertEqual(playoff_margins.tolist(), [2.0, 2.0])
+        self.assertEqual(len(distributions.get(3)[1]), 0)
+
+        figure = prepare_margin_figure(distributions, {1: "DJ", 2: "Nick"})
+        self.assertEqual(
+            [label.get_text() for label in figure.axes[0].get_xticklabels()],
+            ["DJ", "Nick", "Team 3", "Team 4"])
+
+    def test_margin_figure_without_games(self):
+        league_info = LeagueInfo()
+        league_info.cached_responses = get_sample_json()
+        league_info.matchup_table = self.matchup_table
+        figure = Figure()
+        draw_win_loss_margin_graph(figure, league_info, 1990, 1990)
+        self.assertEqual(len(figure.axes), 1)
+        self.assertIsNone(figure.axes[0].get_legend())
+
+        axes = prepare_margin_figure(dict(), dict()).axes[0]
+        self.assertEqual(axes.get_ylabel(), AXES_LABELS.get(3))
+        self.assertIsNone(axes.get_legend())
+
+class HeadToHeadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.matchup_table = MatchupTable.from_responses(
+            [get_sample_matchup_json(2019), get_sample_matchup_json(2018)])
+
+    def test_pair_records(self):
+        head_to_head = self.matchup_table.get_head_to_head()
+        self.assertEqual(head_to_head.get_record(1, 2), {
+            'wins': 2, 'losses': 0, 'ties': 0, 'point_differential': 20.0})
+        self.assertEqual(head_to_head.get_record(2, 1)['losses'], 2)
+        self.assertEqual(head_to_head.get_record(1, 4, playoff=True)['wins'], 2)
+        self.assertEqual(head_to_head.get_record(1, 4, playoff=False)['wins'], 0)
+        self.assertEqual(head_to_head.get_record(1, 99)['wins'], 0)
+        self.assertTrue(np.isnan(head_to_head.get_win_percentages()[0, 0]))
+
+    def test_finished_week_returns_a_new_table(self):
+        head_to_head = self.matchup_table.get_head_to_head()
+        results = head_to_head.results.copy()
+        games = self.matchup_table.games.copy()
+        season = get_sample_matchup_json(2019)
+        season['schedule'][-1]['home']['totalPoints'] = 90.0
+        season['schedule'][-1]['away']['totalPoints'] = 95.0
+        season['schedule'][-1]['winner'] = 'AWAY'
+
+        updated = self.matchup_table.update_season(season)
+        self.assertIsNot(updated, self.matchup_table)
+        self.assertIs(updated.update_season(season), updated)
+        self.assertTrue(np.array_equal(self.matchup_table.games, games))
+        self.assertTrue(np.array_equal(head_to_head.results, results))
+        self.assertEqual(head_to_head.get_record(4, 1, playoff=True)['wins'], 0)
+        self.assertEqual(updated.get_head_to_head().get_record(4, 1, playoff=True)['wins'], 1)
+
+        rebuilt = MatchupTable.from_responses([season, get_sample_matchup_json(2018)])
+        self.assertTrue(np.array_equal(rebuilt.games, updated.games))
+        self.assertTrue(np.array_equal(
+            rebuilt.get_head_to_head().results, updated.get_head_to_head().results))
+
+    def test_heatmap_labels_records(self):
+        figure = prepare_head_to_head_figure(
+            self.matchup_table.get_head_to_head(), {1: "DJ", 2: "Nick"})
+        labels = [text.get_text() for text in figure.axes[0].texts]
+        self.assertEqual(len(labels), 10) #Five pairings, each seen from both sides
+        self.assertIn('2-0', labels)
+
+class LeagueAnalyticsTests(unittest.TestCase):
+
+    def setUp(self):
+        league = SyntheticLeague(team_count=8, season_count=3, week_count=10)
+        responses = league.get_responses("mMatchup")
+        live_season = copy.deepcopy(responses[0])
+        for game in live_season['schedule']:
+            if game['matchupPeriodId'] > 7:
+                game['winner'] = 'UNDECIDED'
+        self.matchup_table = MatchupTable.from_responses([live_season] + responses[1:])
+
+    def test_all_play_matches_pairwise_loop(self):
+        score_matrix = ScoreMatrix.from_games(self.matchup_table.games)
+        expected_records = np.zeros((len(score_matrix.team_ids), 3))
+        for week_scores in score_matrix.scores:
+            for team, score in enumerate(week_scores):
+                for opponent, opponent_score in enumerate(week_scores):
+                    if team != opponent and not np.isnan(score) and not np.isnan(opponent_score):
+                        expected_records[team] += [
+                            score > opponent_score, score < opponent_score,
+                            score == opponent_score]
+
+        self.assertTrue(np.array_equal(score_matrix.get_all_play_records(), expected_records))
+        self.assertEqual(score_matrix.get_actual_wins().sum(), (3 * 10 - 3) * 4)
+        self.assertAlmostEqual(score_matrix.get_luck().sum(), 0)
+        figure = prepare_luck_figure(score_matrix, {1: "DJ"})
+        self.assertEqual(len(figure.axes[0].patches), 8)
+
+    def test_playoff_odds_are_seeded(self):
+        simulation = PlayoffSimulation.from_matchup_table(self.matchup_table)
+        self.assertEqual(len(self.matchup_table.remaining_games), 3 * 4)
+        self.assertEqual(simulation.wins.sum(), 7 * 4)
+
+        odds = get_playoff_odds(simulation, 8000, seed=7, batch_size=2000, max_workers=1)
+        self.assertAlmostEqual(odds.sum(), 100 * simulation.playoff_team_count)
+        self.assertTrue(np.array_equal(
+            odds, get_playoff_odds(simulation, 8000, seed=7, batch_size=2000, max_workers=2)))
+        self.assertIs(get_simulation_pool(2), get_simulation_pool(2)) #Shared, not per call
+        self.assertFalse(np.array_equal(
+            odds, get_playoff_odds(simulation, 8000, seed=8, batch_size=2000, max_workers=1)))
+
+    def test_default_odds_are_simulated_in_batches(self):
+        self.assertGreater(DEFAULT_SIMULATIONS // DEFAULT_BATCH_SIZE, 1)
+        league_info = LeagueInfo()
+        league_info.cached_responses = get_sample_json()
+        league_info.matchup_table = self.matchup_table
+        simulation, odds, team_names = simulate_playoff_odds(league_info)
+
+        self.assertTrue(np.array_equal(odds, get_playoff_odds(simulation, max_workers=1)))
+        self.assertEqual(team_names, league_info.get_team_names())
+
+    def test_finished_season_odds_follow_standings(self):
+        season = self.matchup_table.get_seasons()[0]
+        simulation = PlayoffSimulation.from_matchup_table(self.matchup_table, season)
+        odds = get_playoff_odds(simulation, 100)
+
+        standings = np.lexsort((simulation.points_for, simulation.wins))
+        self.assertEqual(set(np.flatnonzero(odds == 100)), set(standings[-4:].tolist()))
+        self.assertEqual(odds.sum(), 400)
+
+class ManualRoot:
+    """ Stands in for Tk: after() callbacks only run when the test pumps them. """
+
+    def __init__(self):
+        self.callbacks = list()
+
+    def after(self, _, callback):
+        self.callbacks.append(callback)
+
+    def pump(self):
+        callbacks, self.callbacks = self.callbacks, list()
+        for callback in callbacks:
+            callback()
+
+class BackgroundWorkerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = ManualRoot()
+        self.worker = BackgroundWorker(self.root, poll_interval=1)
+
+    def pump_until_idle(self):
+        deadline = time.time() + 5
+        while self.worker.is_busy() and time.time() < deadline:
+            self.root.pump()
+            time.sleep(0.01)
+
+    def test_results_and_progress_reach_main_thread(self):
+        main_thread = threading.current_thread()
+        events = list()
+
+        def work(progress_callback, cancel_event):
+            progress_callback(1, 2)
+            progress_callback(2, 2)
+            return 'loaded'
+
+        self.worker.submit(
+            work,
+            on_done=lambda result, error: events.append(
+                ('done', result, error, threading.current_thread() is main_thread)),
+            on_progress=lambda completed, total: events.append(('progress', completed, total)))
+        self.pump_until_idle()
+
+        self.assertEqual(events, [
+            ('progress', 1, 2), ('progress', 2, 2), ('done', 'loaded', None, True)])
+
+    def test_cancelled_tasks_never_report(self):
+        started = threading.Event()
+        release = threading.Event()
+        events = list()
+
+        def slow_work(progress_callback, cancel_event):
+            started.set()
+            release.wait(5)
+            return 'stale'
+
+        self.worker.submit(slow_work, on_done=lambda *result: events.append(result))
+        self.worker.submit(lambda *_: 'queued', on_done=lambda *result: events.append(result))
+        started.wait(5)
+        self.worker.cancel_all()
+        release.set()
+        self.pump_until_idle()
+
+        self.assertEqual(events, list())
+        self.assertFalse(self.worker.is_busy())
+
+    def test_failing_callback_keeps_polling(self):
+        events = list()
+        self.root.report_callback_exception = lambda *error: events.append(error[0])
+
+        def fail(result, error):
+            raise ValueError('chart failed')
+
+        self.worker.submit(lambda *_: 'first', on_done=fail)
+        self.pump_until_idle()
+        self.worker.submit(lambda *_: 'second', on_done=lambda *result: events.append(result))
+        self.pump_until_idle()
+
+        self.assertEqual(events, [ValueError, ('second', None)])
+
+class StartupTimingTests(unittest.TestCase):
+
+    def test_window_module_defers_heavy_imports(self):
+        import_costs = startup_timing.get_import_costs('ESPN_FFB.ffb_stats')
+        self.assertEqual(startup_timing.get_loaded_deferred_modules(import_costs), [])
+        self.assertLessEqual(
+            import_costs['ESPN_FFB.ffb_stats'][1], startup_timing.IMPORT_BUDGET_SECONDS)
+
+    def test_parse_import_times(self):
+        output = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   numpy.core\n"
+                  "import time:      3000 |       3120 | numpy\n")
+        self.assertEqual(startup_timing.parse_import_times(output), {
+            'numpy.core': (0.00012, 0.00012), 'numpy': (0.003, 0.00312)})
+
+class SyntheticLeagueTests(unittest.TestCase):
+
+    def test_records_match_schedule(self):
+        league = SyntheticLeague(team_count=10, season_count=3, week_count=13)
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        league_info.cached_responses = league.get_responses("mTeam")
+        matchup_table = MatchupTable.from_responses(league.get_responses("mMatchup"))
+
+        self.assertEqual(league_info.get_team_count(), 10)
+        self.assertEqual(len(matchup_table), 3 * 13 * 5)
+        all_time_record = league_info.get_figure_heights(FIGURE_OPTIONS.get("All Time Record"))
+        for team_id, (regular_margins, _) in matchup_table.get_margin_distributions().items():
+            self.assertEqual(all_time_record[team_id - 1][0], int((regular_margins > 0).sum()))
+
+    def test_season_ranges_match_summed_seasons(self):
+        league = SyntheticLeague(team_count=6, season_count=6, last_season=2023)
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        league_info.cached_responses = league.get_responses("mTeam")
+        figure_option = FIGURE_OPTIONS.get("All Time Points")
+
+        def summed_seasons(first_season, last_season):
+            season_info = LeagueInfo(league.league_id, first_season)
+            season_info.cached_responses = [
+                league.get_payload(season, "mTeam")
+                for season in range(first_season, last_season + 1)]
+            return season_info.get_figure_heights(figure_option)
+
+        for first_season, last_season in [(2018, 2023), (2019, 2021), (2023, 2023)]:
+            self.assertEqual(
+                league_info.get_figure_heights(figure_option, first_season, last_season),
+                summed_seasons(first_season, last_season))
+        self.assertEqual(
+            league_info.get_figure_heights(figure_option, 2030, 2031), [[0, 0]] * 6)
+
+        replaced_season = copy.deepcopy(league.get_payload(2020, "mTeam"))
+        replaced_season['teams'][0]['record']['overall']['pointsFor'] += 50
+        league_info.update_season(replaced_season)
+        self.assertEqual(
+            league_info.get_figure_heights(figure_option, 2020, 2020)[0][0],
+            summed_seasons(2020, 2020)[0][0] + 50)
+
+    def test_warm_start_makes_at_most_one_request(self):
+        league = SyntheticLeague(season_count=4, last_season=_get_current_season())
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        fetcher = ESPNFetcher(max_workers=2)
+
+        with SyntheticESPNServer([league]) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            def load():
+                url_info = URLInfo(
+                    "mTeam", league_info, SeasonCache(cache_directory, active_season_ttl=0),
+                    fetcher, server.api_host, ['', ''])
+                return url_info.get_formatted_espn_data()
+
+            cold_responses, success = load()
+            self.assertTrue(success)
+            self.assertEqual(server.request_count, 4)
+
+            warm_responses, success = load()
+            self.assertTrue(success)
+            self.assertEqual(server.request_count, 5)
+            self.assertEqual(warm_responses, cold_responses)
+        fetcher.close()
+
+class FetchPlannerTests(unittest.TestCase):
+
+    def test_one_request_per_season_for_every_view(self):
+        league = SyntheticLeague(
+            team_count=4, season_count=4, week_count=3, last_season=_get_current_season())
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        fetcher = ESPNFetcher(max_workers=2)
+
+        with SyntheticESPNServer([league]) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            season_cache = SeasonCache(cache_directory)
+
+            def fetch(views=None):
+                return FetchPlanner(
+                    league_info, views, season_cache, fetcher, server.api_host,
+                    ['', '']).get_formatted_espn_data()
+
+            responses, success = fetch(["mTeam", "mMatchup"])
+            self.assertTrue(success)
+            self.assertEqual(server.request_count, 4)
+            self.assertEqual(len(responses["mTeam"]), 4)
+            self.assertTrue(np.array_equal(
+                MatchupTable.from_responses(responses["mMatchup"][:1]).games,
+                MatchupTable.from_responses(
+                    [league.get_payload(league.last_season, "mMatchup")]).games))
+            self.assertNotIn('schedule', responses["mTeam"][0])
+            self.assertNotIn('teams', responses["mMatchup"][0])
+
+            fetch(["mTeam", "mMatchup"])
+            self.assertEqual(server.request_count, 4)
+
+            os.remove(season_cache._entry_path(league.league_id, league.first_season, "mMatchup"))
+            responses, success = fetch(["mTeam", "mMatchup"])
+            self.assertTrue(success)
+            self.assertEqual(server.request_count, 5)
+            self.assertEqual(
+                MatchupTable.from_responses(responses["mMatchup"]).get_seasons(),
+                list(range(league.first_season, league.last_season + 1)))
+        fetcher.close()
+
+class PlayerStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.league = SyntheticLeague(team_count=4, season_count=3, week_count=5, last_season=2020)
+
+    def _ingest_league(self, player_store: PlayerStore):
+        for season in range(self.league.first_season, self.league.last_season + 1):
+            for week in range(1, self.league.week_count + 1):
+                player_store.ingest_box_score(self.league.get_box_score(season, week))
+
+    def test_indexes_match_a_full_scan(self):
+        with tempfile.TemporaryDirectory() as directory:
+            player_store = PlayerStore(directory, chunk_rows=50)
+            self._ingest_league(player_store)
+            self.assertEqual(len(player_store), 3 * 5 * 4 * 8)
+            self.assertGreater(len(os.listdir(directory)), 0)
+
+            all_rows = player_store._get_all_rows()
+            self.assertTrue(np.array_equal(
+                player_store.get_player_rows(201), all_rows[all_rows['player_id'] == 201]))
+            self.assertTrue(np.array_equal(
+                player_store.get_team_rows(3), all_rows[all_rows['team_id'] == 3]))
+            self.assertEqual(player_store.get_player_name(201), 'Player 2-1')
+
+    def test_replacing_a_week(self):
+        player_store = PlayerStore(chunk_rows=50)
+        self._ingest_league(player_store)
+        box_score = self.league.get_box_score(2019, 2)
+        for matchup in box_score['schedule']:
+            matchup['home']['rosterForCurrentScoringPeriod']['entries'] = list()
+        player_store.ingest_box_score(box_score)
+
+        self.assertEqual(len(player_store.get_week(2019, 2)), 2 * 8)
+        self.assertEqual(len(player_store.get_player_rows(100)), 3 * 5 - 1)
+        self.assertEqual(len(player_store), 3 * 5 * 4 * 8 - 2 * 8)
+
+    def test_replaced_weeks_are_compacted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            player_store = PlayerStore(directory, chunk_rows=50)
+            self._ingest_league(player_store)
+            for _ in range(20):
+                player_store.ingest_box_score(self.league.get_box_score(2019, 2))
+
+            self.assertEqual(len(player_store), 3 * 5 * 4 * 8)
+            self.assertLessEqual(player_store._row_count, 2 * len(player_store) + 50)
+            all_rows = player_store._get_all_rows()
+            self.assertEqual(len(all_rows), len(player_store))
+            self.assertTrue(np.array_equal(
+                player_store.get_player_rows(201), all_rows[all_rows['player_id'] == 201]))
+            self.assertEqual(
+                sum(len(rows) for rows in player_store._player_index[201]),
+                len(player_store.get_player_rows(201)))
+            self.assertEqual(sorted(os.listdir(directory)), sorted(
+                os.path.basename(player_store._chunk_path(chunk_index))
+                for chunk_index in range(len(player_store._chunks) - 1)))
+
+    def test_top_players_count_only_starters(self):
+        player_store = PlayerStore()
+        self._ingest_league(player_store)
+        rows = player_store.get_team_rows(1)
+        starter_rows = rows[rows['lineup_slot'] < 20]
+        totals = {
+            player_id: starter_rows['points'][starter_rows['player_id'] == player_id].sum()
+            for player_id in np.unique(starter_rows['player_id']).tolist()}
+        player_id, points = player_store.get_top_players()[1]
+        self.assertEqual(player_id, max(totals, key=totals.get))
+        self.assertAlmostEqual(points, totals[player_id], places=2)
+        self.assertNotIn(106, player_store.get_player_totals(1))
+
+    def test_load_player_history(self):
+        league_info = LeagueInfo(self.league.league_id, self.league.first_season)
+        league_info.cached_responses = self.league.get_responses("mTeam")
+        league_info.matchup_table = MatchupTable.from_responses(
+            self.league.get_responses("mMatchup"))
+        fetcher = ESPNFetcher(max_workers=2)
+
+        with SyntheticESPNServer([self.league]) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            url_info = URLInfo(
+                "mBoxscore", league_info, SeasonCache(cache_directory), fetcher,
+                server.api_host, ['', ''])
+            player_store = PlayerStore()
+            self.assertTrue(load_player_history(league_info, player_store, url_info))
+            self.assertEqual(server.request_count, 3 * 5)
+            self.assertEqual(len(player_store), 3 * 5 * 4 * 8)
+            expected_store = PlayerStore()
+            expected_store.ingest_box_score(self.league.get_box_score(2019, 3))
+            self.assertTrue(np.array_equal(
+                player_store.get_week(2019, 3), expected_store.get_week(2019, 3)))
+
+            reloaded_store = PlayerStore()
+            self.assertTrue(load_player_history(league_info, reloaded_store, url_info))
+            self.assertEqual(server.request_count, 3 * 5)
+            self.assertEqual(len(reloaded_store), len(player_store))
+        fetcher.close()
+
+    def test_unchanged_active_season_weeks_are_skipped(self):
+        league = SyntheticLeague(
+            team_count=4, season_count=1, week_count=3, last_season=_get_current_season())
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        league_info.cached_responses = league.get_responses("mTeam")
+        league_info.matchup_table = MatchupTable.from_responses(league.get_responses("mMatchup"))
+        fetcher = ESPNFetcher(max_workers=2)
+
+        with SyntheticESPNServer([league]) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            url_info = URLInfo(
+                "mBoxscore", league_info, SeasonCache(cache_directory, active_season_ttl=0),
+                fetcher, server.api_host, ['', ''])
+            player_store = PlayerStore()
+            self.assertTrue(load_player_history(league_info, player_store, url_info))
+            row_count = player_store._row_count
+            self.assertTrue(load_player_history(league_info, player_store, url_info))
+            self.assertEqual(server.request_count, 2 * 3) #Revalidated, but not re-ingested
+            self.assertEqual(player_store._row_count, row_count)
+        fetcher.close()
+
+class LeagueExportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.league = SyntheticLeague(team_count=4, season_count=3, week_count=4, last_season=2020)
+        self.league_info = LeagueInfo(self.league.league_id, self.league.first_season)
+        self.league_info.cached_responses = self.league.get_responses("mTeam")
+        self.league_info.matchup_table = MatchupTable.from_responses(
+            self.league.get_responses("mMatchup"))
+
+    def test_only_new_seasons_are_appended(self):
+        with tempfile.TemporaryDirectory() as directory:
+            older_seasons = LeagueInfo(self.league.league_id, self.league.first_season)
+            older_seasons.cached_responses = self.league.get_responses("mTeam")[1:]
+            older_seasons.matchup_table = MatchupTable.from_responses(
+                self.league.get_responses("mMatchup")[1:])
+            self.assertEqual(len(export_league(older_seasons, directory)), 2 * 3)
+
+            written_paths = export_league(self.league_info, directory)
+            self.assertEqual(written_paths, [
+                get_table_path(directory, self.league.league_id, table, 2020, 'csv')
+                for table in EXPORT_TABLES])
+            self.assertEqual(export_league(self.league_info, directory), list())
+
+            with open(get_table_path(directory, 1, 'team_seasons', 2019, 'csv')) as table_file:
+                rows = table_file.read().splitlines()
+            self.assertEqual(
+                rows[0], 'season,team_id,team,wins,losses,ties,pointsFor,pointsAgainst')
+            self.assertEqual(len(rows), 1 + 4)
+            with open(get_table_path(directory, 1, 'matchups', 2019, 'csv')) as table_file:
+                self.assertEqual(len(table_file.read().splitlines()), 1 + 4 * 2)
+
+    def test_cached_export_matches_loaded_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            season_cache = SeasonCache(os.path.join(directory, 'cache'))
+            for season in range(self.league.first_season, self.league.last_season + 1):
+                for view in ("mTeam", "mMatchup"):
+                    season_cache.put(
+                        self.league.league_id, season, view, self.league.get_payload(season, view))
+
+            loaded_paths = export_league(self.league_info, os.path.join(directory, 'loaded'))
+            cached_paths = export_cached_league(
+                self.league.league_id, self.league.first_season,
+                os.path.join(directory, 'cached'), season_cache=season_cache)
+            self.assertEqual(len(cached_paths), len(loaded_paths))
+            for loaded_path, cached_path in zip(loaded_paths, cached_paths):
+                with open(loaded_path) as loaded_file, open(cached_path) as cached_file:
+                    self.assertEqual(loaded_file.read(), cached_file.read())
+
+    def test_unreadable_cache_entry_fails_the_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            season_cache = SeasonCache(os.path.join(directory, 'cache'))
+            season_cache.put(
+                self.league.league_id, self.league.first_season, "mTeam",
+                self.league.get_payload(self.league.first_season, "mTeam"))
+            with open(season_cache._entry_path(
+                    self.league.league_id, self.league.first_season, "mTeam"), 'w') as entry_file:
+                entry_file.write('{"payload": ')
+            self.assertRaises(
+                ExportError, export_cached_league, self.league.league_id,
+                self.league.first_season, os.path.join(directory, 'cached'),
+                season_cache=season_cache)
+
+    def test_arrow_formats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            if league_export.pyarrow is None:
+                self.assertRaises(ExportError, export_league, self.league_info, directory, 'parquet')
+                return
+            export_league(self.league_info, directory, 'parquet')
+            export_league(self.league_info, directory, 'arrow')
+            table = league_export.pyarrow.parquet.read_table(
+                get_table_path(directory, 1, 'matchups', 2019, 'parquet'))
+            self.assertEqual(table.num_rows, 4 * 2)
+
+class ConcurrencyTests(unittest.TestCase):
+
+    def test_concurrent_planners_share_one_fetch(self):
+        league = SyntheticLeague(
+            team_count=4, season_count=3, week_count=3, last_season=_get_current_season())
+        fetcher = ESPNFetcher(max_workers=4)
+
+        with SyntheticESPNServer([league], latency=0.2) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            season_cache = SeasonCache(cache_directory)
+            results = [None] * 4
+
+            def fetch(index: int):
+                league_info = LeagueInfo(league.league_id, league.first_season)
+                results[index] = FetchPlanner(
+                    league_info, ["mTeam", "mMatchup"], season_cache, fetcher,
+                    server.api_host, ['', '']).get_formatted_espn_data()
+
+            threads = [threading.Thread(target=fetch, args=(index,)) for index in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(server.request_count, 3)
+            for responses, success in results:
+                self.assertTrue(success)
+                self.assertEqual(responses, results[0][0])
+        fetcher.close()
+
+    def test_single_flight(self):
+        single_flight = SingleFlight()
+        future, is_owner = single_flight.claim('key')
+        shared_future, is_shared_owner = single_flight.claim('key')
+        self.assertTrue(is_owner)
+        self.assertFalse(is_shared_owner)
+        self.assertIs(shared_future, future)
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        self.assertIsNone(wait_for(shared_future, cancel_event))
+        single_flight.resolve('key', 'payload')
+        self.assertEqual(wait_for(shared_future), 'payload')
+        self.assertEqual(single_flight.get_keys(), list())
+        self.assertTrue(single_flight.claim('key')[1])
+
+    def test_readers_see_whole_refreshes(self):
+        league = SyntheticLeague(team_count=4, season_count=3, week_count=3)
+        other_league = SyntheticLeague(team_count=4, season_count=3, week_count=3, seed=1)
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        refreshes = [
+            {"mTeam": source.get_responses("mTeam"), "mMatchup": source.get_responses("mMatchup")}
+            for source in (league, other_league)]
+        expected = list()
+        for responses in refreshes:
+            apply_responses(league_info, responses)
+            expected.append((league_info.get_figure_heights(0), len(league_info.matchup_table)))
+
+        stop = threading.Event()
+
+        def refresh():
+            index = 0
+            while not stop.is_set():
+                apply_responses(league_info, refreshes[index % 2])
+                index += 1
+
+        writer = threading.Thread(target=refresh)
+        writer.start()
+        try:
+            for _ in range(200):
+                with league_info.lock:
+                    snapshot = (
+                        league_info.get_figure_heights(0), len(league_info.matchup_table))
+                self.assertIn(snapshot, expected)
+        finally:
+            stop.set()
+            writer.join()
+
+class LiveSeasonTests(unittest.TestCase):
+
+    def test_polls_only_the_active_season(self):
+        league = SyntheticLeague(team_count=4, season_count=3, last_season=_get_current_season())
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        fetcher = ESPNFetcher(max_workers=2)
+        figure_option = FIGURE_OPTIONS.get("All Time Points")
+
+        with SyntheticESPNServer([league]) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            season_cache = SeasonCache(cache_directory)
+            planner = FetchPlanner(
+                league_info, ["mTeam", "mMatchup"], season_cache, fetcher, server.api_host,
+                ['', ''])
+            apply_responses(league_info, planner.get_formatted_espn_data()[0])
+            poller = LiveSeasonPoller(
+                league_info, season_cache, fetcher, server.api_host, ['', ''])
+            request_count = server.request_count
+            matchup_table = league_info.matchup_table
+
+            self.assertFalse(poller.poll()) #Both views revalidated by one request
+            self.assertEqual(server.request_count, request_count + 1)
+            self.assertEqual(server.not_modified_count, 1)
+
+            points_before = league_info.get_figure_heights(figure_option)[0][0]
+            live_payload = copy.deepcopy(league.get_payload(league.last_season, "mTeam"))
+            live_payload['teams'][0]['record']['overall']['pointsFor'] += 50
+            league.payloads["mTeam"][league.last_season] = live_payload
+
+            self.assertTrue(poller.poll())
+            self.assertEqual(server.request_count, request_count + 2)
+            self.assertEqual(
+                league_info.get_figure_heights(figure_option)[0][0], points_before + 50)
+            self.assertIs(league_info.matchup_table, matchup_table)
+            cached_payload = season_cache.get(league.league_id, league.last_season, "mTeam").payload
+            self.assertEqual(
+                cached_payload['teams'][0]['record']['overall']['pointsFor'],
+                live_payload['teams'][0]['record']['overall']['pointsFor'])
+        fetcher.close()
+
+    def test_backs_off_outside_game_windows(self):
+        eastern = datetime.timezone(datetime.timedelta(hours=-4))
+        sunday_afternoon = datetime.datetime(2023, 10, 8, 15, tzinfo=eastern)
+        wednesday_morning = datetime.datetime(2023, 10, 11, 9, tzinfo=eastern)
+        self.assertTrue(is_game_window(sunday_afternoon))
+        self.assertFalse(is_game_window(wednesday_morning))
+
+        poller = LiveSeasonPoller(LeagueInfo(), poll_interval=60, idle_poll_interval=3600)
+        self.assertEqual(poller.get_next_interval(sunday_afternoon), 60)
+        self.assertEqual(poller.get_next_interval(wednesday_morning), 3600)
+        poller.failures = 2
+        self.assertEqual(poller.get_next_interval(sunday_afternoon), 240)
+        poller.failures = 10
+        self.assertEqual(poller.get_next_interval(sunday_afternoon), 3600)
+
+class LeagueSnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.season_cache = SeasonCache(os.path.join(self.directory.name, 'cache'))
+        self.snapshot_path = os.path.join(self.directory.name, 'leagues.ffbsnap')
+        self.league = SyntheticLeague(team_count=8, season_count=4, last_season=2023)
+        for season in range(self.league.first_season, self.league.last_season + 1):
+            for view in ("mTeam", "mMatchup"):
+                self.season_cache.put(
+                    self.league.league_id, season, view, self.league.get_payload(season, view))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_matches_json_path(self):
+        (expected,) = build_snapshot(
+            self.snapshot_path, {self.league.league_id: self.league.first_season},
+            self.season_cache)
+
+        with LeagueSnapshot(self.snapshot_path) as snapshot:
+            self.assertEqual(snapshot.get_league_ids(), [self.league.league_id])
+            restored = snapshot.load_league(self.league.league_id)
+            for figure_option in get_all_time_figure_options():
+                self.assertEqual(
+                    restored.get_figure_heights(figure_option),
+                    expected.get_figure_heights(figure_option))
+            self.assertEqual(
+                restored.get_figure_heights(FIGURE_OPTIONS.get("All Time Points"), 2021, 2022),
+                expected.get_figure_heights(FIGURE_OPTIONS.get("All Time Points"), 2021, 2022))
+            self.assertEqual(restored.get_team_names(), expected.get_team_names())
+            self.assertEqual(len(restored.matchup_table), len(expected.matchup_table))
+
+        self.assertEqual(verify_snapshot(self.snapshot_path, self.season_cache), [])
+
+    def test_round_trip_with_empty_last_column(self):
+        league = SyntheticLeague(team_count=6, season_count=3, last_season=2020)
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        league_info.cached_responses = league.get_responses("mTeam")
+        league_info.matchup_table = MatchupTable.from_responses(league.get_responses("mMatchup"))
+        self.assertNotEqual(league_info.matchup_table.games.nbytes % 64, 0)
+        self.assertEqual(len(league_info.matchup_table.remaining_games), 0)
+        write_snapshot(self.snapshot_path, [league_info])
+
+        with LeagueSnapshot(self.snapshot_path) as snapshot:
+            restored = snapshot.load_league(league.league_id)
+            self.assertTrue(np.array_equal(
+                restored.matchup_table.games, league_info.matchup_table.games))
+            self.assertEqual(len(restored.matchup_table.remaining_games), 0)
+
+    def test_verify_reports_stale_snapshot(self):
+        build_snapshot(
+            self.snapshot_path, {self.league.league_id: self.league.first_season},
+            self.season_cache)
+        payload = copy.deepcopy(self.league.get_payload(2023, "mTeam"))
+        payload['teams'][0]['record']['overall']['pointsFor'] += 50
+        self.season_cache.put(self.league.league_id, 2023, "mTeam", payload)
+
+        self.assertNotEqual(verify_snapshot(self.snapshot_path, self.season_cache), [])
+
+    def test_rejects_older_versions(self):
+        build_snapshot(
+            self.snapshot_path, {self.league.league_id: self.league.first_season},
+            self.season_cache)
+        with open(self.snapshot_path, 'r+b') as snapshot_file:
+            snapshot_file.seek(8) #Past the magic
+            snapshot_file.write(struct.pack('<I', 1))
+        with self.assertRaises(SnapshotError):
+            LeagueSnapshot(self.snapshot_path)
+
+    def test_rejects_other_files(self):
+        with open(self.snapshot_path, 'wb') as snapshot_file:
+            snapshot_file.write(b'{"not": "a snapshot"}')
+        with self.assertRaises(SnapshotError):
+            LeagueSnapshot(self.snapshot_path)
+
+    def test_rejects_corrupt_headers(self):
+        build_snapshot(
+            self.snapshot_path, {self.league.league_id: self.league.first_season},
+            self.season_cache)
+        with open(self.snapshot_path, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+        header_end = 16 + struct.unpack_from('<I', data, 12)[0]
+        for corrupt in (data[:header_end - 10], data[:16] + b'\xff' + data[17:], b''):
+            with open(self.snapshot_path, 'wb') as snapshot_file:
+                snapshot_file.write(corrupt)
+            with self.assertRaises(SnapshotError):
+                LeagueSnapshot(self.snapshot_path)
+
+class InstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        instrumentation.get_recorder().clear()
+        instrumentation.enable()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.get_recorder().clear()
+
+    def test_fetch_and_aggregate_are_traced(self):
+        league = SyntheticLeague(team_count=4, season_count=3, last_season=_get_current_season())
+        league_info = LeagueInfo(league.league_id, league.first_season)
+        fetcher = ESPNFetcher(max_workers=2)
+
+        with SyntheticESPNServer([league]) as server, \
+                tempfile.TemporaryDirectory() as cache_directory:
+            url_info = URLInfo(
+                "mTeam", league_info, SeasonCache(cache_directory), fetcher,
+                server.api_host, ['', ''])
+            league_info.cached_responses, _ = url_info.get_formatted_espn_data()
+            url_info.get_formatted_espn_data()
+        fetcher.close()
+
+        recorder = instrumentation.get_recorder()
+        span_names = [span.name for span in recorder.spans]
+        self.assertEqual(span_names.count('request'), 3)
+        self.assertEqual(span_names.count('parse'), 3)
+        self.assertEqual(span_names.count('fetch'), 2)
+        self.assertIn('aggregate', span_names)
+        self.assertEqual(recorder.counters['cache.miss'], 3)
+        self.assertEqual(recorder.counters['cache.hit'], 3)
+        request_spans = [span for span in recorder.spans if span.name == 'request']
+        self.assertTrue(all(span.attributes['bytes'] > 0 for span in request_spans))
+
+    def test_export_formats(self):
+        with instrumentation.span('render', 'render', figure_option=0):
+            instrumentation.count('cache.hit')
+
+        with tempfile.TemporaryDirectory() as trace_directory:
+            jsonl_path = os.path.join(trace_directory, 'trace.jsonl')
+            chrome_path = os.path.join(trace_directory, 'trace.json')
+            instrumentation.export(jsonl_path)
+            instrumentation.export(chrome_path)
+
+            with open(jsonl_path) as trace_file:
+                lines = [json.loads(line) for line in trace_file]
+            with open(chrome_path) as trace_file:
+                trace_events = json.load(trace_file)['traceEvents']
+
+        self.assertEqual([line['type'] for line in lines], ['span', 'counter'])
+        self.assertEqual(lines[0]['attributes'], {'figure_option': 0})
+        self.assertEqual(
+            sorted(event['ph'] for event in trace_events), ['C', 'M', 'X'])
+
+    def test_disabled_records_nothing(self):
+        instrumentation.disable()
+        with instrumentation.span('render', 'render'):
+            instrumentation.count('cache.hit')
+        self.assertEqual(instrumentation.get_recorder().spans, [])
+        self.assertEqual(instrumentation.get_recorder().counters, {})
+
+def http_get(port: int, target: str, headers: dict = None):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET', target, headers=headers or dict())
+    response = connection.getresponse()
+    result = response.status, response.getheader('ETag'), response.read()
+    connection.close()
+    return result
+
+class StatsServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.league = SyntheticLeague(
+            team_count=4, season_count=3, last_season=_get_current_season())
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.espn_server = SyntheticESPNServer([self.league], latency=0.05).__enter__()
+        self.fetcher = ESPNFetcher(max_workers=2)
+        registry = LeagueRegistry(
+            SeasonCache(self.cache_directory.name), self.fetcher, self.espn_server.api_host,
+            ['', ''])
+        self.stats_server = StatsServer(
+            {self.league.league_id: self.league.first_season}, registry)
+
+    def tearDown(self):
+        self.espn_server.__exit__()
+        self.fetcher.close()
+        self.cache_directory.cleanup()
+
+    def test_concurrent_cold_requests_share_one_fetch(self):
+        target = f'/leagues/{self.league.league_id}/figures/0'
+
+        async def request_together():
+            return await asyncio.gather(*[self.stats_server.get(target) for _ in range(10)])
+
+        responses = asyncio.run(request_together())
+        self.assertEqual(self.espn_server.request_count, 3)
+        self.assertEqual(len({response.etag for response in responses}), 1)
+
+        league_info = LeagueInfo(self.league.league_id, self.league.first_season)
+        league_info.cached_responses = self.league.get_responses("mTeam")
+        values = [team['values'] for team in json.loads(responses[0].body)['teams']]
+        self.assertEqual(values, league_info.get_figure_heights(0))
+
+    def test_matchup_figure_fetches_both_views_together(self):
+        target = f'/leagues/{self.league.league_id}/figures/4'
+        response = asyncio.run(self.stats_server.get(target))
+        self.assertEqual(self.espn_server.request_count, 3) #One request per season
+        self.assertEqual(len(json.loads(response.body)['teams']), 4)
+
+    def test_playoff_odds_simulate_without_the_league_lock(self):
+        league_id = self.league.league_id
+        asyncio.run(self.stats_server.get(f'/leagues/{league_id}/figures/4'))
+        self.assertNotIn((league_id, 8, None, None), self.stats_server._responses)
+
+        league_info = self.stats_server.registry.get(league_id)
+        lock_was_free = list()
+
+        def try_lock():
+            lock_was_free.append(league_info.lock.acquire(blocking=False))
+            if lock_was_free[-1]:
+                league_info.lock.release()
+
+        def get_playoff_odds(simulation):
+            other_thread = threading.Thread(target=try_lock) #The RLock is reentrant here
+            other_thread.start()
+            other_thread.join()
+            return original_get_playoff_odds(simulation)
+
+        original_get_playoff_odds = stats_server.get_playoff_odds
+        stats_server.get_playoff_odds = get_playoff_odds
+        try:
+            response = asyncio.run(self.stats_server.get(f'/leagues/{league_id}/figures/8'))
+        finally:
+            stats_server.get_playoff_odds = original_get_playoff_odds
+        self.assertEqual(lock_was_free, [True])
+        self.assertEqual(len(json.loads(response.body)['teams']), 4)
+
+    def test_cached_bodies_are_bounded(self):
+        league_id = self.league.league_id
+        self.stats_server.max_cached_responses = 3
+        full_history = f'/leagues/{league_id}/figures/0'
+
+        async def request_ranges():
+            for first_season in range(1900, 1910):
+                await self.stats_server.get(full_history)
+                await self.stats_server.get(f'{full_history}?first_season={first_season}')
+
+        asyncio.run(request_ranges())
+        self.assertEqual(len(self.stats_server._responses), 3)
+        self.assertIn((league_id, 0, None, None), self.stats_server._responses)
+        self.assertIn((league_id, 0, 1909, None), self.stats_server._responses)
+
+    def test_unexpected_errors_are_answered(self):
+        target = f'/leagues/{self.league.league_id}/figures/0'
+
+        def fail_with(exception):
+            def refresh_league(*_):
+                raise exception
+            self.stats_server._refresh_league = refresh_league
+            with contextlib.redirect_stderr(io.StringIO()):
+                return asyncio.run(self.stats_server.respond('GET', target))
+
+        status, response = fail_with(RuntimeError('cookies.txt is missing'))
+        self.assertEqual(status, 500)
+        self.assertEqual(json.loads(response.body), {'error': 'Internal server error'})
+        status, _ = fail_with(requests.exceptions.ConnectionError('ESPN is down'))
+        self.assertEqual(status, 502)
+
+    def test_http_etags_and_season_ranges(self):
+        league_id = self.league.league_id
+        last_season = self.league.last_season
+
+        async def exercise():
+            await self.stats_server.start('127.0.0.1', 0)
+            port = self.stats_server.port
+            loop = asyncio.get_running_loop()
+            results = dict()
+            results['first'] = await loop.run_in_executor(
+                None, http_get, port, f'/leagues/{league_id}/figures/2')
+            results['repeat'] = await loop.run_in_executor(
+                None, http_get, port, f'/leagues/{league_id}/figures/2',
+                {'If-None-Match': results['first'][1]})
+            results['range'] = await loop.run_in_executor(
+                None, http_get, port,
+                f'/leagues/{league_id}/figures/2?first_season={last_season}')
+            results['unknown'] = await loop.run_in_executor(
+                None, http_get, port, '/leagues/999/figures/2')
+            await self.stats_server.close()
+            return results
+
+        results = asyncio.run(exercise())
+        self.assertEqual(results['first'][0], 200)
+        self.assertEqual(results['repeat'][:2], (304, results['first'][1]))
+        self.assertEqual(results['repeat'][2], b'')
+        self.assertEqual(results['unknown'][0], 404)
+
+        league_info = LeagueInfo(league_id, self.league.first_season)
+        league_info.cached_responses = self.league.get_responses("mTeam")
+        ranged = json.loads(results['range'][2])
+        self.assertEqual(ranged['seasons'], [last_season])
+        self.assertEqual(
+            [team['values'] for team in ranged['teams']],
+            league_info.get_figure_heights(2, last_season, last_season))
+
+class PayloadProjectionTests(unittest.TestCase):
+
+    def test_projection_keeps_declared_fields(self):
+        sample_json = get_sample_json()[0]
+        projected = project(sample_json, get_view_fields("mTeam"))
+
+        self.assertNotIn('draftDetail', projected)
+        self.assertEqual(set(projected['teams'][0]['record']), {'overall'})
+        self.assertNotIn('gamesBack', projected['teams'][0]['record']['overall'])
+
+        league_info = LeagueInfo()
+        league_info.cached_responses = [projected]
+        for figure_option in get_all_time_figure_options():
+            self.assertEqual(
+                league_info.get_figure_heights(figure_option),
+                get_sample_figure_heights(figure_option))
+        self.assertEqual(league_info.get_team_names().get(3), "Tim")
+
+    @unittest.skipIf(payload_projection.ijson is None, "ijson is not installed")
+    def test_stream_projection_matches_projection(self):
+        sample_json = get_sample_json()[0]
+        fields = get_view_fields("mTeam")
+        expected = project(sample_json, fields)
+
+        body = json.dumps(sample_json).encode()
+        self.assertEqual(stream_project(io.BytesIO(body), fields), expected)
+        history_body = json.dumps([sample_json]).encode()
+        self.assertEqual(stream_project(io.BytesIO(history_body), fields, is_list=True), expected)
+
 if __name__ == "__main__":
     unittest.main()